@@ -18,16 +18,20 @@ app.use(express.json());
 app.use(morgan('dev'));
 
 
-app.use((req, res, next) => {
-  // 0 = no timeout
-  req.setTimeout(0);
-  res.setTimeout(0);
-  next();
-});
-
 // ────────────────────────────────────────────────────────────────
 // Config
 const PORT = process.env.PORT || 4000;
+// Pipeline wall-clock budget (seconds) passed to main.py --deadline; the child is
+// killed after deadline + grace, and HTTP timeouts are sized to match.
+const PIPELINE_DEADLINE_S = parseFloat(process.env.PIPELINE_DEADLINE_S || '120');
+const PIPELINE_GRACE_S = parseFloat(process.env.PIPELINE_GRACE_S || '15');
+const REQUEST_TIMEOUT_MS = (PIPELINE_DEADLINE_S + PIPELINE_GRACE_S + 15) * 1000;
+
+app.use((req, res, next) => {
+  req.setTimeout(REQUEST_TIMEOUT_MS);
+  res.setTimeout(REQUEST_TIMEOUT_MS);
+  next();
+});
 const ROOT_DIR = path.resolve(__dirname, '..'); // repo root
 const RESULTS_PRIMARY = path.join(ROOT_DIR, 'results'); // Python writes here
 const RESULTS_FALLBACK = path.join(ROOT_DIR, 'results'); // older path, just in case
@@ -191,9 +195,22 @@ app.get('/api/predictions', async (req, res) => {
 });
 
 // GET /api/run?ticker=PLTR&period=6mo&horizon=7&use_lstm=true
+// GET /api/run?ticker=PLTR&horizons=1,5,7,30   (one pipeline run, one result file per horizon)
+// GET /api/run?ticker=PLTR&deadline=30           (seconds; capped at PIPELINE_DEADLINE_S)
 app.get('/api/run', async (req, res) => {
   const { ticker = 'PLTR', period = '6mo' } = req.query;
+  const requested = parseFloat(req.query.deadline || String(PIPELINE_DEADLINE_S));
+  const deadline = Math.min(
+    isFinite(requested) && requested > 0 ? requested : PIPELINE_DEADLINE_S,
+    PIPELINE_DEADLINE_S
+  );
   const horizon = parseInt(req.query.horizon || '7', 10);
+  const horizons = req.query.horizons
+    ? String(req.query.horizons)
+        .split(',')
+        .map((h) => parseInt(h, 10))
+        .filter((h) => Number.isInteger(h) && h > 0)
+    : [horizon];
   const use_lstm = String(req.query.use_lstm || 'false') === 'true';
 
   const args = [
@@ -202,13 +219,20 @@ app.get('/api/run', async (req, res) => {
     ticker,
     '--period',
     String(period),
-    '--horizon',
-    String(horizon),
+    '--horizons',
+    horizons.join(','),
+    '--deadline',
+    String(deadline),
   ];
   if (use_lstm) args.push('--use_lstm');
 
   const logs = [];
   const child = spawn(PYTHON, args, { cwd: ROOT_DIR });
+  // Python degrades on its own to meet --deadline; this is the hard backstop.
+  const killTimer = setTimeout(() => {
+    logs.push(`\n[server] pipeline exceeded ${deadline + PIPELINE_GRACE_S}s, killing it\n`);
+    child.kill('SIGKILL');
+  }, (deadline + PIPELINE_GRACE_S) * 1000);
 
   child.stdout.on('data', (d) => {
     const s = d.toString();
@@ -222,12 +246,14 @@ app.get('/api/run', async (req, res) => {
   });
 
   child.on('error', (err) => {
+    clearTimeout(killTimer);
     return res
       .status(500)
       .json({ error: `Failed to start Python: ${err.message}`, logs: logs.join('') });
   });
 
   child.on('close', async (code) => {
+    clearTimeout(killTimer);
     if (code !== 0) {
       return res.status(500).json({
         error: `Python exited with code ${code}`,
@@ -245,22 +271,39 @@ app.get('/api/run', async (req, res) => {
     // Import whatever models exist without failing the whole request
     const imported = {};
     const models = ['ensemble', 'sarimax', 'lstm', 'xgb'];
-    for (const m of models) {
-      imported[m] = await importForecastCsv({ ticker, horizon, model: m }).catch(
-        (e) => ({ error: e.message })
-      );
+    for (const h of horizons) {
+      const key = horizons.length > 1 ? (m) => `${m}_${h}d` : (m) => m;
+      for (const m of models) {
+        imported[key(m)] = await importForecastCsv({ ticker, horizon: h, model: m }).catch(
+          (e) => ({ error: e.message })
+        );
+      }
+    }
+
+    // What was skipped/cut short/served from cache to meet the deadline
+    let report = null;
+    for (const dir of RESULTS_DIRS) {
+      const file = path.join(dir, `${safeFilePart(ticker.toUpperCase())}_run_report.json`);
+      if (fs.existsSync(file)) {
+        try {
+          report = JSON.parse(fs.readFileSync(file, 'utf8'));
+        } catch (e) {
+          report = { error: e.message };
+        }
+        break;
+      }
     }
 
-    res.json({ message: 'Pipeline completed', imported, logs: logs.join('') });
+    res.json({ message: 'Pipeline completed', imported, report, logs: logs.join('') });
   });
 });
 
 // ────────────────────────────────────────────────────────────────
-app.listen(PORT, () => {
+const server = app.listen(PORT, () => {
   console.log(`🚀 Server listening on http://localhost:${PORT}`);
   console.log(`Root dir:     ${ROOT_DIR}`);
   console.log(`Results dirs: ${RESULTS_DIRS.join(' , ')}`);
 });
 
-server.requestTimeout = 0;     // default ~5min → disable
-server.headersTimeout = 0;     // default ~60s  → disable
+server.requestTimeout = REQUEST_TIMEOUT_MS; // bounded by the pipeline deadline
+server.headersTimeout = 60000;
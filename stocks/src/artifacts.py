@@ -0,0 +1,500 @@
+"""
+Versioned, pickle-free model artifacts.
+
+Layout (one directory per ticker and model kind, e.g. models/AAPL_xgb/; that path is a
+symlink to the current version under models/AAPL_xgb.versions/, swapped atomically on save.
+Where symlinks are not allowed (Windows without developer mode) the current version is named
+by the pointer file models/AAPL_xgb.versions/CURRENT instead, also replaced atomically):
+    booster.ubj      native XGBoost binary model            (kind = xgb)
+    model.keras      native Keras model                     (kind = lstm)
+    *.npy            scaler parameters as plain float arrays (np.load(..., mmap_mode='r'))
+    meta.json        feature names, window/horizon, params
+    manifest.json    format/version + sha256 and size of every file above
+
+Loaders never unpickle; they verify checksums against the manifest before use.
+"""
+import os
+import sys
+import json
+import glob
+import shutil
+import hashlib
+import logging
+import tempfile
+import uuid
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models'))
+
+ARTIFACT_FORMAT  = 'predictrade-artifact'
+ARTIFACT_VERSION = 1
+MANIFEST_NAME    = 'manifest.json'
+META_NAME        = 'meta.json'
+CURRENT_NAME     = 'CURRENT'   # pointer file naming the current version when symlinks are unavailable
+KEEP_VERSIONS    = 2   # current + previous, for readers that resolved the link before a swap
+
+_SYMLINKS = None   # None until the first save finds out whether this platform allows them
+
+
+class ArtifactError(RuntimeError):
+    pass
+
+
+class AffineScaler:
+    """
+    Minimal stand-in for fitted sklearn scalers: transform(X) = (X - center) / scale.
+    Covers RobustScaler, StandardScaler and MinMaxScaler without importing sklearn.
+    """
+
+    def __init__(self, center: np.ndarray, scale: np.ndarray, feature_names=None):
+        self.center = center
+        self.scale = scale
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+    @classmethod
+    def identity(cls, n_features: int, feature_names=None):
+        return cls(np.zeros(n_features), np.ones(n_features), feature_names)
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        """Extract (center, scale) from a fitted Robust/Standard/MinMax scaler."""
+        n = int(getattr(scaler, 'n_features_in_', 0) or 0)
+        names = getattr(scaler, 'feature_names_in_', None)
+        if hasattr(scaler, 'min_') and hasattr(scaler, 'data_range_'):  # MinMaxScaler: X * s + m
+            s = np.asarray(scaler.scale_, dtype=float)
+            center = -np.asarray(scaler.min_, dtype=float) / s
+            return cls(center, 1.0 / s, names)
+        if hasattr(scaler, 'center_'):  # RobustScaler
+            center = scaler.center_ if getattr(scaler, 'with_centering', True) else None
+        else:                           # StandardScaler
+            center = scaler.mean_ if getattr(scaler, 'with_mean', True) else None
+        scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else None
+        n = n or len(center if center is not None else scale)
+        center = np.zeros(n) if center is None else np.asarray(center, dtype=float)
+        scale = np.ones(n) if scale is None else np.asarray(scale, dtype=float)
+        return cls(center, scale, names)
+
+    def transform(self, X) -> np.ndarray:
+        return (np.asarray(X, dtype=float) - self.center) / self.scale
+
+    def inverse_transform(self, X) -> np.ndarray:
+        return np.asarray(X, dtype=float) * self.scale + self.center
+
+
+def artifact_dir(ticker: str, kind: str, models_dir: str = MODELS_DIR) -> str:
+    return os.path.join(models_dir, f"{ticker}_{kind}")
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def resolve_artifact(path: str) -> str:
+    """The version directory path currently points at (symlink, else the CURRENT pointer file,
+    else path itself). Readers resolve once and read every file from the result, so a
+    concurrent save can't mix files of two versions."""
+    if os.path.islink(path):
+        return os.path.realpath(path)
+    try:
+        with open(os.path.join(f"{path}.versions", CURRENT_NAME)) as f:
+            return os.path.join(f"{path}.versions", f.read().strip())
+    except FileNotFoundError:
+        return path
+
+
+def artifact_exists(ticker: str, kind: str, models_dir: str = MODELS_DIR) -> bool:
+    """True if ticker has a (non-legacy) artifact of this kind."""
+    return os.path.exists(os.path.join(resolve_artifact(artifact_dir(ticker, kind, models_dir)), MANIFEST_NAME))
+
+
+def _read_version(link: str, read):
+    """
+    read(version_dir) on the version link points at. A burst of saves can prune that version
+    while it is being read; then the link has moved on and the read is retried on the new one.
+    """
+    for attempt in range(3):
+        path = resolve_artifact(link)
+        try:
+            return read(path)
+        except Exception:
+            if attempt == 2 or resolve_artifact(link) == path:
+                raise
+
+
+def _write_pointer(out_dir: str, version_dir: str):
+    """Atomically point versions/CURRENT at version_dir (rename of a fresh file over the old)."""
+    versions = f"{out_dir}.versions"
+    tmp = os.path.join(versions, f".{CURRENT_NAME}-{uuid.uuid4().hex}")
+    with open(tmp, 'w') as f:
+        f.write(os.path.basename(version_dir))
+    for attempt in range(5):
+        try:
+            os.replace(tmp, os.path.join(versions, CURRENT_NAME))
+            return
+        except PermissionError:  # Windows: a reader has CURRENT open for a moment
+            if attempt == 4:
+                os.remove(tmp)
+                raise
+            time.sleep(0.05)
+
+
+def _repoint(out_dir: str, version_dir: str):
+    """Atomically make out_dir a symlink to version_dir (rename of a fresh link over the old),
+    or write the CURRENT pointer file where the platform doesn't allow symlinks."""
+    global _SYMLINKS
+    parent = os.path.dirname(out_dir)
+    link = None
+    if _SYMLINKS is not False:
+        link = os.path.join(parent, f".{os.path.basename(out_dir)}.link-{uuid.uuid4().hex}")
+        try:
+            os.symlink(os.path.relpath(version_dir, parent), link)
+            _SYMLINKS = True
+        except (OSError, NotImplementedError) as e:
+            log.warning(f"[!] Symlinks unavailable ({e}); model versions are tracked in {CURRENT_NAME} files")
+            _SYMLINKS, link = False, None
+    if link is None:
+        _write_pointer(out_dir, version_dir)
+    if os.path.isdir(out_dir) and not os.path.islink(out_dir):
+        # artifact written before versioning: move it aside once, it stays readable meanwhile
+        # (with a pointer file, readers have already moved on to the new version)
+        os.replace(out_dir, os.path.join(f"{out_dir}.versions", f"legacy-{uuid.uuid4().hex}"))
+    if link is not None:
+        os.replace(link, out_dir)
+
+
+def _prune_versions(out_dir: str, current: str, keep: int = KEEP_VERSIONS):
+    """Delete versions older than current beyond the keep-1 most recent ones. Newer
+    directories may be another writer's save in progress and are left alone."""
+    versions = f"{out_dir}.versions"
+    cur_mtime = os.path.getmtime(current)
+    older = [p for p in (os.path.join(versions, n) for n in os.listdir(versions))
+             if p != current and os.path.isdir(p) and os.path.getmtime(p) <= cur_mtime]
+    older.sort(key=os.path.getmtime, reverse=True)
+    for p in older[keep - 1:]:
+        shutil.rmtree(p, ignore_errors=True)
+
+
+def _write_artifact(out_dir: str, kind: str, ticker: str, meta: dict, arrays: dict, write_model) -> str:
+    """
+    Write everything into a fresh version directory (manifest last), then atomically repoint
+    the out_dir symlink at it: concurrent readers see the old or the new artifact, never a
+    missing or half-written one. The previous version is kept for readers still on it.
+    """
+    versions = f"{out_dir}.versions"
+    os.makedirs(versions, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    tmp_dir = tempfile.mkdtemp(prefix=f"{stamp}-", dir=versions)
+    os.chmod(tmp_dir, 0o755)
+
+    files = []
+    if write_model is not None:
+        files.append(write_model(tmp_dir))
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(arr, dtype=float), allow_pickle=False)
+        files.append(f"{name}.npy")
+    with open(os.path.join(tmp_dir, META_NAME), 'w') as f:
+        json.dump(meta, f, indent=2)
+    files.append(META_NAME)
+
+    manifest = {
+        'format':  ARTIFACT_FORMAT,
+        'version': ARTIFACT_VERSION,
+        'kind':    kind,
+        'ticker':  ticker,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'files': {
+            name: {'sha256': _sha256(os.path.join(tmp_dir, name)),
+                   'bytes':  os.path.getsize(os.path.join(tmp_dir, name))}
+            for name in files
+        },
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    _repoint(out_dir, tmp_dir)
+    _prune_versions(out_dir, tmp_dir)
+    return out_dir
+
+
+def read_manifest(path: str, kind: str = None, verify: bool = True) -> dict:
+    """Read and validate an artifact manifest; optionally verify every file's checksum."""
+    mpath = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(mpath):
+        raise ArtifactError(f"No manifest in {path}")
+    with open(mpath) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise ArtifactError(f"{path}: not a {ARTIFACT_FORMAT} directory")
+    if int(manifest.get('version', -1)) > ARTIFACT_VERSION:
+        raise ArtifactError(f"{path}: artifact version {manifest.get('version')} is newer than supported {ARTIFACT_VERSION}")
+    if kind is not None and manifest.get('kind') != kind:
+        raise ArtifactError(f"{path}: expected kind '{kind}', found '{manifest.get('kind')}'")
+    if verify:
+        for name, info in manifest['files'].items():
+            fpath = os.path.join(path, name)
+            if not os.path.exists(fpath) or os.path.getsize(fpath) != info['bytes'] or _sha256(fpath) != info['sha256']:
+                raise ArtifactError(f"{path}: checksum mismatch for {name}")
+    return manifest
+
+
+def _load_array(path: str, name: str, mmap: bool = True) -> np.ndarray:
+    return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None, allow_pickle=False)
+
+
+def _load_meta(path: str) -> dict:
+    with open(os.path.join(path, META_NAME)) as f:
+        return json.load(f)
+
+
+# ────────────────────────────────────────────────────────────────
+# XGB
+
+def save_xgb_artifact(ticker: str, model, scaler, feature_names, params: dict = None,
+                      feature_set: str = None, models_dir: str = MODELS_DIR, extra_meta: dict = None) -> str:
+    """Write the XGB booster (native .ubj), scaler arrays and metadata (plus extra_meta) for one ticker."""
+    feature_names = list(feature_names)
+    if scaler is None:
+        aff = AffineScaler.identity(len(feature_names))
+    elif isinstance(scaler, AffineScaler):
+        aff = scaler
+    else:
+        aff = AffineScaler.from_sklearn(scaler)
+
+    def _write_booster(tmp_dir):
+        model.get_booster().save_model(os.path.join(tmp_dir, 'booster.ubj'))
+        return 'booster.ubj'
+
+    meta = {
+        'feature_names': feature_names,
+        'feature_set': feature_set,
+        'scaler': type(scaler).__name__ if scaler is not None else None,
+        'params': params if params is not None else _json_params(model),
+        **(extra_meta or {}),
+    }
+    return _write_artifact(artifact_dir(ticker, 'xgb', models_dir), 'xgb', ticker, meta,
+                           {'scaler_center': aff.center, 'scaler_scale': aff.scale}, _write_booster)
+
+
+def load_xgb_artifact(ticker: str, verify: bool = True, mmap: bool = True, models_dir: str = MODELS_DIR) -> dict:
+    """Load an XGB artifact into the same {'model','scaler','feature_names'} shape as the old pickle bundle."""
+    from xgboost import XGBRegressor
+
+    def read(path):
+        manifest = read_manifest(path, kind='xgb', verify=verify)
+        meta = _load_meta(path)
+        model = XGBRegressor()
+        model.load_model(os.path.join(path, 'booster.ubj'))
+        scaler = AffineScaler(_load_array(path, 'scaler_center', mmap), _load_array(path, 'scaler_scale', mmap),
+                              meta['feature_names'])
+        return {'model': model, 'scaler': scaler, 'feature_names': meta['feature_names'],
+                'meta': meta, 'manifest': manifest}
+    return _read_version(artifact_dir(ticker, 'xgb', models_dir), read)
+
+
+def has_model(ticker: str, kind: str, models_dir: str = MODELS_DIR) -> bool:
+    """True if a usable model exists for ticker: artifact directory or legacy file."""
+    if artifact_exists(ticker, kind, models_dir):
+        return True
+    legacy = f"{ticker}_model.pkl" if kind == 'xgb' else f"{ticker}_lstm.pkl"
+    return os.path.exists(os.path.join(models_dir, legacy))
+
+
+def load_xgb_bundle(ticker: str, models_dir: str = MODELS_DIR) -> dict:
+    """Prefer the artifact directory; fall back to the legacy {ticker}_model.pkl bundle."""
+    if artifact_exists(ticker, 'xgb', models_dir):
+        return load_xgb_artifact(ticker, models_dir=models_dir)
+    import joblib
+    path = os.path.join(models_dir, f"{ticker}_model.pkl")
+    if os.path.exists(path):
+        warn_legacy(path)
+    return _legacy_xgb_bundle(joblib.load(path))
+
+
+def warn_legacy(path: str):
+    """Deprecation warning for loading a legacy pickle."""
+    log.warning(f"[!] Loading legacy pickle {path}: pickled models are deprecated and will stop loading; "
+                f"convert them with `python artifacts.py --convert`")
+
+
+def _legacy_xgb_bundle(obj) -> dict:
+    if isinstance(obj, dict):
+        return obj
+    # oldest format: bare XGBRegressor, no scaler
+    names = list(obj.get_booster().feature_names or [])
+    return {'model': obj, 'scaler': AffineScaler.identity(len(names), names), 'feature_names': names}
+
+
+def _json_params(model) -> dict:
+    try:
+        params = model.get_params()
+    except Exception:
+        return {}
+    return {k: v for k, v in params.items() if isinstance(v, (int, float, str, bool)) or v is None}
+
+
+# ────────────────────────────────────────────────────────────────
+# LSTM
+
+def save_lstm_artifact(ticker: str, keras_path: str, scaler, meta: dict, target_scaler=None,
+                       models_dir: str = MODELS_DIR) -> str:
+    """Copy the native .keras file next to the scaler arrays and window/horizon metadata."""
+    arrays = {}
+    if scaler is not None:
+        aff = AffineScaler.from_sklearn(scaler)
+        arrays['scaler_center'], arrays['scaler_scale'] = aff.center, aff.scale
+    if target_scaler is not None:
+        aff = AffineScaler.from_sklearn(target_scaler)
+        arrays['target_center'], arrays['target_scale'] = aff.center, aff.scale
+
+    def _copy_model(tmp_dir):
+        shutil.copyfile(keras_path, os.path.join(tmp_dir, 'model.keras'))
+        return 'model.keras'
+
+    return _write_artifact(artifact_dir(ticker, 'lstm', models_dir), 'lstm', ticker, dict(meta), arrays, _copy_model)
+
+
+def load_lstm_artifact(ticker: str, verify: bool = True, mmap: bool = True, models_dir: str = MODELS_DIR) -> dict:
+    """Return {'model_path','scaler','meta'}; the Keras model itself is loaded by the caller."""
+    def read(path):
+        manifest = read_manifest(path, kind='lstm', verify=verify)
+        meta = _load_meta(path)
+        scaler = None
+        if 'scaler_center.npy' in manifest['files']:
+            scaler = AffineScaler(_load_array(path, 'scaler_center', mmap), _load_array(path, 'scaler_scale', mmap))
+        target_scaler = None
+        if 'target_center.npy' in manifest['files']:
+            target_scaler = AffineScaler(_load_array(path, 'target_center', mmap),
+                                         _load_array(path, 'target_scale', mmap))
+        return {'model_path': os.path.join(path, 'model.keras'), 'scaler': scaler,
+                'target_scaler': target_scaler, 'meta': meta, 'manifest': manifest}
+    return _read_version(artifact_dir(ticker, 'lstm', models_dir), read)
+
+
+# ────────────────────────────────────────────────────────────────
+# Conversion of existing models/ contents
+
+def convert_models_dir(models_dir: str = MODELS_DIR, remove_stale: bool = False) -> dict:
+    """
+    Convert legacy pickles in models/ into artifact directories.
+      {T}_model.pkl                                -> {T}_xgb/
+      {T}_lstm.pkl + {T}_lstm.keras                -> {T}_lstm/
+      {T}_lstm_feat/target_scaler.pkl + .keras     -> {T}_lstm/ (legacy, window unknown)
+    {T}_lstm.h5 next to a .keras file is reported as stale (and deleted with remove_stale).
+    """
+    import joblib
+
+    report = {'xgb': [], 'lstm': [], 'stale': [], 'failed': []}
+
+    for pkl in sorted(glob.glob(os.path.join(models_dir, '*_model.pkl'))):
+        ticker = os.path.basename(pkl)[:-len('_model.pkl')]
+        try:
+            b = _legacy_xgb_bundle(joblib.load(pkl))
+            save_xgb_artifact(ticker, b['model'], b.get('scaler'), b['feature_names'], models_dir=models_dir)
+            report['xgb'].append(ticker)
+        except Exception as e:
+            report['failed'].append((os.path.basename(pkl), str(e)))
+
+    for keras_path in sorted(glob.glob(os.path.join(models_dir, '*_lstm.keras'))):
+        ticker = os.path.basename(keras_path)[:-len('_lstm.keras')]
+        meta_pkl = os.path.join(models_dir, f"{ticker}_lstm.pkl")
+        feat_pkl = os.path.join(models_dir, f"{ticker}_lstm_feat_scaler.pkl")
+        tgt_pkl  = os.path.join(models_dir, f"{ticker}_lstm_target_scaler.pkl")
+        try:
+            if os.path.exists(meta_pkl):
+                data = joblib.load(meta_pkl)
+                save_lstm_artifact(ticker, keras_path, data['scaler'], data['meta'], models_dir=models_dir)
+            elif os.path.exists(feat_pkl):
+                tgt = joblib.load(tgt_pkl) if os.path.exists(tgt_pkl) else None
+                save_lstm_artifact(ticker, keras_path, joblib.load(feat_pkl), {'legacy': True},
+                                   target_scaler=tgt, models_dir=models_dir)
+            else:
+                report['failed'].append((os.path.basename(keras_path), 'no scaler/meta pickle found'))
+                continue
+            report['lstm'].append(ticker)
+        except Exception as e:
+            report['failed'].append((os.path.basename(keras_path), str(e)))
+
+        h5 = os.path.join(models_dir, f"{ticker}_lstm.h5")
+        if os.path.exists(h5):
+            report['stale'].append(os.path.basename(h5))
+            if remove_stale:
+                os.remove(h5)
+
+    return report
+
+
+# ────────────────────────────────────────────────────────────────
+# Cold-load benchmark
+
+def _load_all(fmt: str, tickers, models_dir: str):
+    if fmt == 'pickle':
+        import joblib
+        for t in tickers:
+            _legacy_xgb_bundle(joblib.load(os.path.join(models_dir, f"{t}_model.pkl")))
+    else:
+        for t in tickers:
+            load_xgb_artifact(t, models_dir=models_dir)
+
+
+def benchmark_cold_load(tickers, models_dir: str = MODELS_DIR, repeats: int = 3) -> dict:
+    """
+    Time loading every ticker's XGB model in a fresh interpreter (imports included),
+    once from the legacy pickles and once from the artifacts. Reports best-of-N seconds.
+    """
+    results = {}
+    for fmt in ('pickle', 'artifact'):
+        best = float('inf')
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--_load', fmt,
+                            '--models_dir', models_dir, *tickers], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - t0)
+        results[fmt] = best
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description="Convert/benchmark model artifacts")
+    ap.add_argument('--convert', action='store_true', help="Convert legacy pickles in models/")
+    ap.add_argument('--remove_stale', action='store_true', help="Delete stale .h5 duplicates while converting")
+    ap.add_argument('--bench', action='store_true', help="Cold-load benchmark: pickle vs artifact")
+    ap.add_argument('--models_dir', default=MODELS_DIR)
+    ap.add_argument('--_load', choices=['pickle', 'artifact'], help=argparse.SUPPRESS)
+    ap.add_argument('tickers', nargs='*')
+    args = ap.parse_args()
+    from utils import setup_logging
+    setup_logging()
+
+    if args._load:
+        _load_all(args._load, args.tickers, args.models_dir)
+        sys.exit(0)
+
+    if args.convert:
+        rep = convert_models_dir(args.models_dir, remove_stale=args.remove_stale)
+        log.info(f"[✓] Converted XGB: {rep['xgb']}")
+        log.info(f"[✓] Converted LSTM: {rep['lstm']}")
+        if rep['stale']:
+            log.info(f"[i] Stale duplicates{' removed' if args.remove_stale else ''}: {rep['stale']}")
+        for name, err in rep['failed']:
+            log.warning(f"[!] {name}: {err}")
+
+    if args.bench:
+        tickers = args.tickers or sorted(
+            t for t in (os.path.basename(p)[:-len('_model.pkl')]
+                        for p in glob.glob(os.path.join(args.models_dir, '*_model.pkl')))
+            if artifact_exists(t, 'xgb', args.models_dir)
+        )
+        res = benchmark_cold_load(tickers, args.models_dir)
+        log.info(f"[✓] Cold load of {len(tickers)} XGB models: pickle={res['pickle']:.3f}s, artifact={res['artifact']:.3f}s")
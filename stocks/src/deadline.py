@@ -0,0 +1,127 @@
+import logging
+import os
+import json
+import time
+import threading
+import contextvars
+
+from utils import RESULTS_DIR, safe_ticker
+
+log = logging.getLogger(__name__)
+
+# Share of the total deadline each stage may use, measured from pipeline start.
+# Model stages run concurrently, so these overlap rather than add up.
+STAGE_SHARES = {
+    'fetch':   0.20,
+    'sarimax': 0.50,
+    'xgb':     0.60,
+    'lstm':    0.80,
+}
+ENSEMBLE_RESERVE = 0.05  # always keep this much of the deadline for the ensemble + report
+
+# Below these many seconds of stage budget the step is skipped or served from cache.
+MIN_SECONDS = {
+    'xgb_train':  5.0,
+    'xgb_eval':   1.0,
+    'mc':         3.0,
+    'lstm_train': 20.0,
+}
+
+
+class Deadline:
+    """Wall-clock budget for one pipeline run; seconds=None means unlimited."""
+
+    def __init__(self, seconds: float = None):
+        self.seconds = seconds
+        self.start = time.perf_counter()
+        self.end = None if seconds is None else self.start + seconds * (1 - ENSEMBLE_RESERVE)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def remaining(self) -> float:
+        if self.end is None:
+            return float('inf')
+        return max(0.0, self.end - time.perf_counter())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def stage_remaining(self, stage: str) -> float:
+        """Seconds left for `stage`: its share of the deadline, capped by the overall end."""
+        if self.seconds is None:
+            return float('inf')
+        stage_end = self.start + self.seconds * STAGE_SHARES.get(stage, 1.0)
+        return max(0.0, min(stage_end, self.end) - time.perf_counter())
+
+    def stage_budget(self, stage: str):
+        """Like stage_remaining but None when unlimited (for max_seconds-style arguments)."""
+        left = self.stage_remaining(stage)
+        return None if left == float('inf') else left
+
+
+class DegradationLog:
+    """Thread-safe record of what was skipped, cut short or served from cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events = []
+
+    def note(self, stage: str, action: str, detail: str = ''):
+        with self._lock:
+            self.events.append({'stage': stage, 'action': action, 'detail': detail})
+        log.warning(f"[!] {stage}: {action}{f' ({detail})' if detail else ''}")
+
+
+# Log that library code can report into without threading it through every call (like
+# logging). A context variable, so concurrent in-process runs each see their own log;
+# run_stages copies the caller's context into every stage thread.
+_ACTIVE = contextvars.ContextVar('degradation_log', default=None)
+
+
+def activate(log: DegradationLog):
+    """Install log for the current context; returns a token for deactivate()."""
+    return _ACTIVE.set(log)
+
+
+def deactivate(token):
+    _ACTIVE.reset(token)
+
+
+def note(stage: str, action: str, detail: str = ''):
+    """Record into the active run's log; outside a run (plain CLI use) just log a warning."""
+    active = _ACTIVE.get()
+    if active is not None:
+        active.note(stage, action, detail)
+    else:
+        log.warning(f"[!] {stage}: {action}{f' ({detail})' if detail else ''}")
+
+
+def build_run_report(ticker: str, deadline: Deadline, log: DegradationLog, timings: dict,
+                     errors: dict, ensemble_models, horizons) -> dict:
+    """Machine-readable summary of one run: stage timings/status and every degradation."""
+    report = {
+        'ticker': ticker,
+        'deadline_seconds': deadline.seconds,
+        'elapsed_seconds': round(deadline.elapsed(), 3),
+        'horizons': list(horizons),
+        'stages': {name: {'seconds': round(t, 3), 'status': 'failed' if name in errors else 'ok'}
+                   for name, t in timings.items()},
+        'degraded': list(log.events),
+        'ensemble_models': list(ensemble_models),
+    }
+    for name, err in errors.items():
+        report['stages'].setdefault(name, {'seconds': 0.0})
+        report['stages'][name]['status'] = ('skipped' if str(err).startswith('skipped') else
+                                            'timed_out' if isinstance(err, TimeoutError) else 'failed')
+        report['stages'][name]['error'] = str(err)
+    return report
+
+
+def write_run_report(ticker: str, report: dict) -> str:
+    """results/{SAFE}_run_report.json."""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{safe_ticker(ticker)}_run_report.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
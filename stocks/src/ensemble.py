@@ -1,6 +1,9 @@
+import logging
 import os
 import pandas as pd
-from utils import RESULTS_DIR, safe_ticker
+from utils import RESULTS_DIR, safe_ticker, save_forecast
+
+log = logging.getLogger(__name__)
 
 def _load_series(path: str, value_col: str = 'forecast_close'):
     if not os.path.exists(path):
@@ -8,11 +11,31 @@ def _load_series(path: str, value_col: str = 'forecast_close'):
     df = pd.read_csv(path)
     return df[['date', value_col]].rename(columns={value_col: os.path.splitext(os.path.basename(path))[0]})
 
-def fit_and_predict_ensemble(ticker: str, horizon: int = 7) -> pd.DataFrame:
+def average_forecasts(ticker: str, forecasts: dict) -> pd.DataFrame:
+    """Mean forecast_close over in-memory model forecasts ({model: DataFrame}) on their common dates."""
+    frames = []
+    for model, df in forecasts.items():
+        if df is not None:
+            df = df[['date','forecast_close']].rename(columns={'forecast_close': model})
+            frames.append(df.set_index('date'))
+    if not frames:
+        log.warning("[!] No model forecasts found to ensemble.")
+        return None
+
+    merged = pd.concat(frames, axis=1, join='inner')
+    merged['forecast_close'] = merged.mean(axis=1)
+    out = merged[['forecast_close']].reset_index()
+    out['ticker'] = ticker
+    return out
+
+def fit_and_predict_ensemble(ticker: str, horizon: int = 7, horizons=None, models=None) -> pd.DataFrame:
     """
-    Average any available model forecasts among: xgb, sarimax, lstm.
-    Saves results/{SAFE}_ensemble_{h}d.csv
+    Average any available model forecasts among: xgb, sarimax, lstm (or only `models`,
+    e.g. the ones that finished in this run, so stale result files are never mixed in).
+    Saves results/{SAFE}_ensemble_{h}d.csv (one file per horizon, sliced from the longest).
     """
+    horizons = sorted(set(horizons or [horizon]))
+    horizon = max(horizons)
     safe = safe_ticker(ticker)
 
     paths = {
@@ -21,21 +44,14 @@ def fit_and_predict_ensemble(ticker: str, horizon: int = 7) -> pd.DataFrame:
         'lstm':    os.path.join(RESULTS_DIR, f"{safe}_lstm_{horizon}d.csv"),
     }
 
-    frames = []
-    for model, p in paths.items():
-        if os.path.exists(p):
-            df = pd.read_csv(p)[['date','forecast_close']].rename(columns={'forecast_close': model})
-            frames.append(df.set_index('date'))
-    if not frames:
-        print("[!] No model forecasts found to ensemble.")
-        return None
+    if models is not None:
+        paths = {m: p for m, p in paths.items() if m in models}
 
-    merged = pd.concat(frames, axis=1, join='inner')
-    merged['forecast_close'] = merged.mean(axis=1)
-    out = merged[['forecast_close']].reset_index()
-    out['ticker'] = ticker
+    forecasts = {model: pd.read_csv(p) for model, p in paths.items() if os.path.exists(p)}
+    out = average_forecasts(ticker, forecasts)
+    if out is None:
+        return None
 
-    out_path = os.path.join(RESULTS_DIR, f"{safe}_ensemble_{horizon}d.csv")
-    out.to_csv(out_path, index=False)
-    print(f"[✓] Saved ensemble {horizon}-day forecast to {out_path}")
+    for h, out_path in save_forecast(out, ticker, 'ensemble', horizons).items():
+        log.info(f"[✓] Saved ensemble {h}-day forecast to {out_path}")
     return out
@@ -1,46 +1,165 @@
+import logging
 import os
 import json
 import joblib
+import numpy as np
 import pandas as pd
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 
+from artifacts import load_xgb_bundle
+from features import compute_features
+from fetch_data import read_raw
+from preprocess import clean_last_period, parse_period_to_days
+from utils import unify_features
+
+log = logging.getLogger(__name__)
+
 BASE_DIR      = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 PROCESSED_DIR = os.path.join(BASE_DIR, 'data', 'processed')
 MODELS_DIR    = os.path.join(BASE_DIR, 'models')
 RESULTS_DIR   = os.path.join(BASE_DIR, 'results')
 
-def evaluate_model(ticker: str):
-    eval_df = pd.read_csv(os.path.join(PROCESSED_DIR, f"{ticker}_eval.csv"), index_col='Date', parse_dates=['Date'])
+def score_xgb(ticker: str, bundle: dict, eval_df: pd.DataFrame):
+    """MSE/MAE of an in-memory XGB bundle on the processed eval frame (None without eval rows)."""
     if eval_df.empty:
-        print(f"[!] No eval data for {ticker}")
+        log.warning(f"[!] No eval data for {ticker}")
         return None
     X_eval = eval_df.drop(columns=['Close']).apply(pd.to_numeric, errors='coerce').astype(float)
     y_eval = pd.to_numeric(eval_df['Close'], errors='coerce').astype(float)
-
-    bundle_path = os.path.join(MODELS_DIR, f"{ticker}_model.pkl")
-    if not os.path.exists(bundle_path):
-        print(f"[!] Model not found: {bundle_path}")
-        return None
-    bundle = joblib.load(bundle_path)
     model = bundle["model"]; feature_names = bundle["feature_names"]; scaler = bundle["scaler"]
 
     # align features
-    from utils import unify_features
     X_eval = unify_features(X_eval, feature_names)
     X_eval_scaled = pd.DataFrame(scaler.transform(X_eval), index=X_eval.index, columns=X_eval.columns)
 
     preds = model.predict(X_eval_scaled)
     mse = mean_squared_error(y_eval, preds)
     mae = mean_absolute_error(y_eval, preds)
-    print(f"[✓] Eval results for {ticker} → MSE: {mse:.4f}, MAE: {mae:.4f}")
-
-    os.makedirs(RESULTS_DIR, exist_ok=True)
-    out = {
+    log.info(f"[✓] Eval results for {ticker} → MSE: {mse:.4f}, MAE: {mae:.4f}")
+    return {
         "ticker": ticker,
         "mse": float(mse),
         "mae": float(mae),
         "n": int(len(y_eval))
     }
-    with open(os.path.join(RESULTS_DIR, f"{ticker}_eval_results.json"), "w") as f:
+
+def score_global(ticker: str, bundle: dict, raw: pd.DataFrame):
+    """Next-close MSE/MAE of the global model on this ticker's eval rows (None without any)."""
+    from global_xgb import build_panel, next_close_metrics
+    meta = bundle['meta']
+    _, eval_df = build_panel(period=meta.get('period', '2y'), feature_set=meta['feature_set'], raws={ticker: raw})
+    if eval_df.empty:
+        log.warning(f"[!] No eval data for {ticker}")
+        return None
+    out = {'ticker': ticker, 'model': 'global',
+           **next_close_metrics(eval_df, bundle['model'].predict(eval_df[bundle['feature_names']]))}
+    log.info(f"[✓] Global eval results for {ticker} → MSE: {out['mse']:.4f}, MAE: {out['mae']:.4f}")
+    return out
+
+def save_eval_results(ticker: str, out: dict, model: str = 'ticker') -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    suffix = '' if model == 'ticker' else f'_{model}'
+    path = os.path.join(RESULTS_DIR, f"{ticker}{suffix}_eval_results.json")
+    with open(path, "w") as f:
         json.dump(out, f, indent=2)
+    return path
+
+def evaluate_model(ticker: str, model: str = 'ticker'):
+    """Score the per-ticker model ('ticker') or the shared cross-ticker model ('global') on ticker."""
+    if model == 'global':
+        from global_xgb import load_global_bundle
+        try:
+            bundle = load_global_bundle(models_dir=MODELS_DIR)
+        except (FileNotFoundError, RuntimeError):
+            log.warning(f"[!] Global model not found in {MODELS_DIR}")
+            return None
+        out = score_global(ticker, bundle, read_raw(ticker))
+        if out is not None:
+            save_eval_results(ticker, out, model='global')
+        return out
+    eval_df = pd.read_csv(os.path.join(PROCESSED_DIR, f"{ticker}_eval.csv"), index_col='Date', parse_dates=['Date'])
+    if eval_df.empty:
+        log.warning(f"[!] No eval data for {ticker}")
+        return None
+    try:
+        bundle = load_xgb_bundle(ticker, models_dir=MODELS_DIR)
+    except FileNotFoundError:
+        log.warning(f"[!] Model not found for {ticker} in {MODELS_DIR}")
+        return None
+    out = score_xgb(ticker, bundle, eval_df)
+    save_eval_results(ticker, out)
     return out
+
+def compare_models(tickers):
+    """
+    Per-ticker vs global XGB on the same rows: each ticker's global-model eval dates, scored
+    as one-step-ahead forecasts of the next close (how predict_xgb uses the per-ticker model).
+    A naive last-close forecast is included as the baseline. When a per-ticker model exists,
+    only dates after its training cut-off (meta train_end) are scored, so no model is scored
+    on rows it was fitted on. Returns one row per ticker.
+    """
+    from global_xgb import TARGET, build_panel, load_global_bundle
+    gbundle = load_global_bundle(models_dir=MODELS_DIR)
+    period = gbundle['meta'].get('period', '2y')
+    rows = []
+    for ticker in tickers:
+        raw = read_raw(ticker)
+        _, ev = build_panel(period=period, feature_set=gbundle['meta']['feature_set'], raws={ticker: raw})
+        if ev.empty:
+            log.warning(f"[!] No eval data for {ticker}")
+            continue
+        bundle = None
+        try:
+            bundle = load_xgb_bundle(ticker, models_dir=MODELS_DIR)
+        except FileNotFoundError:
+            log.warning(f"[!] No per-ticker model for {ticker}; comparing global vs naive only")
+        if bundle is not None:
+            train_end = bundle.get('meta', {}).get('train_end')
+            if train_end is None:
+                log.warning(f"[!] {ticker}: per-ticker model has no recorded train_end (retrain it); "
+                            f"comparing global vs naive only")
+                bundle = None
+            elif not (ev.index > pd.Timestamp(train_end)).any():
+                log.warning(f"[!] {ticker}: no eval rows after the per-ticker model's train_end {train_end}; "
+                            f"comparing global vs naive only")
+                bundle = None
+            else:
+                ev = ev[ev.index > pd.Timestamp(train_end)]
+
+        actual = ev['Close'].values * np.exp(ev[TARGET].values)
+        preds = {'naive': ev['Close'].values,
+                 'global': ev['Close'].values * np.exp(gbundle['model'].predict(ev[gbundle['feature_names']]))}
+        if bundle is not None:
+            feat = compute_features(clean_last_period(raw, parse_period_to_days(period)),
+                                    feature_set=bundle['meta'].get('feature_set') or gbundle['meta']['feature_set'])
+            X = feat.drop(columns=['Close']).apply(pd.to_numeric, errors='coerce').astype(float).loc[ev.index]
+            X = unify_features(X, bundle['feature_names'])
+            preds['ticker'] = bundle['model'].predict(
+                pd.DataFrame(bundle['scaler'].transform(X), index=X.index, columns=X.columns))
+        row = {'ticker': ticker, 'n': int(len(ev)), 'from': str(ev.index.min().date())}
+        for name, pred in preds.items():
+            row[f'{name}_mse'] = float(mean_squared_error(actual, pred))
+            row[f'{name}_mae'] = float(mean_absolute_error(actual, pred))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+if __name__ == '__main__':
+    import argparse
+    from utils import setup_logging
+    ap = argparse.ArgumentParser(description="Evaluate per-ticker and/or global XGB models")
+    ap.add_argument('--tickers', nargs='+', required=True)
+    ap.add_argument('--model', choices=['ticker', 'global', 'compare'], default='ticker',
+                    help="compare: both models and a naive baseline on the same next-close rows")
+    args = ap.parse_args()
+    setup_logging()
+    tickers = [t.upper() for t in args.tickers]
+    if args.model == 'compare':
+        table = compare_models(tickers)
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, 'xgb_model_comparison.csv')
+        table.to_csv(path, index=False)
+        log.info(table.to_string(index=False))
+        log.info(f"[✓] Saved {path}")
+    else:
+        for t in tickers:
+            evaluate_model(t, model=args.model)
@@ -1,16 +1,21 @@
 import pandas as pd
 import numpy as np
 
+from indicators import compute_indicators, resolve_feature_set, DEFAULT_FEATURE_SET
+
 # We stick to Close-based indicators so recursive forecasting doesn't need future OHLCV.
 DEFAULT_EMAS = (5, 10, 20)
 RSI_PERIOD = 14
 
 def compute_features(df: pd.DataFrame,
                      ema_windows=DEFAULT_EMAS,
-                     rsi_period: int = RSI_PERIOD) -> pd.DataFrame:
+                     rsi_period: int = RSI_PERIOD,
+                     feature_set: str = None) -> pd.DataFrame:
     """
     Expects df with Date index and a numeric 'Close' column.
     Returns df with engineered features + original 'Close'.
+    feature_set ('base@1', 'extended', ... see indicators.FEATURE_SETS) picks the indicators;
+    without it the legacy ema_windows/rsi_period arguments define the (base) set.
     """
     out = df.copy()
     if 'Close' not in out.columns:
@@ -18,23 +23,16 @@ def compute_features(df: pd.DataFrame,
 
     out['Close'] = pd.to_numeric(out['Close'], errors='coerce')
 
-    # EMAs & SMAs
-    for w in ema_windows:
-        out[f'ema_{w}'] = out['Close'].ewm(span=w, adjust=False).mean()
-        out[f'sma_{w}'] = out['Close'].rolling(window=w, min_periods=1).mean()
-
-    # Returns
-    out['return_1d'] = out['Close'].pct_change(1)
-    out['return_5d'] = out['Close'].pct_change(5)
-
-    # RSI
-    delta = out['Close'].diff()
-    up = delta.clip(lower=0)
-    down = -delta.clip(upper=0)
-    ma_up = up.ewm(com=rsi_period - 1, adjust=False).mean()
-    ma_down = down.ewm(com=rsi_period - 1, adjust=False).mean()
-    rs = ma_up / ma_down.replace(0, np.nan)
-    out[f'rsi_{rsi_period}'] = 100 - (100 / (1 + rs))
+    if feature_set is not None:
+        _, names = resolve_feature_set(feature_set)
+    else:
+        names = [f'{k}_{w}' for w in ema_windows for k in ('ema', 'sma')]
+        names += ['return_1d', 'return_5d', f'rsi_{rsi_period}']
+
+    # All indicators in one plan: shared intermediates (EMAs, SMAs, ...) are computed once
+    feats = compute_indicators({'Close': out['Close'].values}, names)
+    out = out.drop(columns=[c for c in names if c in out.columns])
+    out = pd.concat([out, pd.DataFrame(feats, index=out.index)], axis=1)
 
     # Fill edges reasonably then drop residual NA rows
     out = out.ffill().bfill().dropna()
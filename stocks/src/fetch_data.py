@@ -1,8 +1,12 @@
 # src/fetch_data.py
-import os, io, time
+import logging
+import os, io, time, zlib
 from datetime import timedelta
+import numpy as np
 import pandas as pd
 
+log = logging.getLogger(__name__)
+
 RAW_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'raw'))
 os.makedirs(RAW_DIR, exist_ok=True)
 
@@ -39,7 +43,7 @@ def _normalize(df: pd.DataFrame) -> pd.DataFrame:
     df.index.name = 'Date'
     return df
 
-def _requests_session():
+def _requests_session(retries: int = 5):
     import requests
     from requests.adapters import HTTPAdapter
     from urllib3.util.retry import Retry
@@ -49,7 +53,7 @@ def _requests_session():
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
     })
     retry = Retry(
-        total=5, backoff_factor=0.8,
+        total=retries, backoff_factor=0.8,
         status_forcelist=(429, 500, 502, 503, 504),
         raise_on_status=False
     )
@@ -58,14 +62,22 @@ def _requests_session():
     s.mount('https://', adapter)
     return s
 
-def _fetch_stooq_http(ticker: str) -> pd.DataFrame | None:
+def _time_left(t_end: float | None) -> float:
+    return float('inf') if t_end is None else t_end - time.monotonic()
+
+def _fetch_stooq_http(ticker: str, t_end: float | None = None) -> pd.DataFrame | None:
     import requests
     sym = ticker.upper()
     if '.' not in sym and not sym.startswith('^'):
         sym = f"{sym}.US"  # PLTR -> PLTR.US
     url = f"https://stooq.com/q/d/l/?s={sym}&i=d"
     try:
-        r = _requests_session().get(url, timeout=15)
+        left = _time_left(t_end)
+        if left <= 0:
+            return None
+        # under a deadline: one retry at most and a timeout that fits what's left
+        sess = _requests_session() if t_end is None else _requests_session(retries=1)
+        r = sess.get(url, timeout=min(15, max(1.0, left)))
         txt = (r.text or "").strip()
         if r.status_code != 200 or not txt or txt.startswith('<'):
             return None
@@ -76,49 +88,76 @@ def _fetch_stooq_http(ticker: str) -> pd.DataFrame | None:
         df = df.set_index('Date').sort_index()
         # Standardize column names
         df.columns = [str(c).title() for c in df.columns]
-        print("[i] fetched from Stooq CSV")
+        log.info("[i] fetched from Stooq CSV")
         return df
     except Exception as e:
-        print(f"[stooq http] failed: {e}")
+        log.warning(f"[stooq http] failed: {e}")
         return None
 
-def _fetch_yahoo(ticker: str, period: str) -> pd.DataFrame | None:
+def _fetch_yahoo(ticker: str, period: str, t_end: float | None = None) -> pd.DataFrame | None:
     # Robust yfinance fetch with retries; still subject to 429 throttling
     try:
         import yfinance as yf
-        sess = _requests_session()
+        sess = _requests_session() if t_end is None else _requests_session(retries=1)
 
         # Try download()
         for attempt in range(3):
+            if _time_left(t_end) <= 0:
+                log.warning("[yfinance] out of time budget; giving up")
+                return None
             try:
                 df = yf.download(
                     ticker, period=period, interval="1d",
                     auto_adjust=True, threads=False, progress=False, session=sess
                 )
                 if df is not None and not df.empty:
-                    print("[i] fetched from yfinance.download")
+                    log.info("[i] fetched from yfinance.download")
                     return df
             except Exception as e:
-                print(f"[yfinance.download] attempt {attempt+1} failed: {e}")
-                time.sleep(1.5 * (attempt + 1))
+                log.warning(f"[yfinance.download] attempt {attempt+1} failed: {e}")
+                time.sleep(max(0.0, min(1.5 * (attempt + 1), _time_left(t_end))))
 
         # Fallback to Ticker.history()
+        if _time_left(t_end) <= 0:
+            return None
         try:
             T = yf.Ticker(ticker, session=sess)
             df = T.history(period=period, interval="1d", auto_adjust=True)
             if df is not None and not df.empty:
-                print("[i] fetched from yfinance.Ticker.history")
+                log.info("[i] fetched from yfinance.Ticker.history")
                 return df
         except Exception as e:
-            print(f"[yfinance.history] failed: {e}")
+            log.warning(f"[yfinance.history] failed: {e}")
     except Exception as e:
-        print(f"[yfinance import/use] failed: {e}")
+        log.warning(f"[yfinance import/use] failed: {e}")
     return None
 
+def _fetch_stub(ticker: str, period: str) -> pd.DataFrame:
+    """Deterministic synthetic OHLCV (PREFERRED_SOURCE=stub) for load tests: no network, and the
+       same ticker always gets the same series. STUB_LATENCY_MS adds a fixed fake network delay;
+       STUB_END_DATE moves the last bar (default 2024-12-31)."""
+    delay = float(os.environ.get("STUB_LATENCY_MS", "0")) / 1000.0
+    if delay > 0:
+        time.sleep(delay)
+    end = pd.Timestamp(os.environ.get("STUB_END_DATE", "2024-12-31"))
+    dates = pd.bdate_range(end=end, periods=max(60, int(_period_to_days(period) * 252 / 365)), name='Date')
+    rng = np.random.default_rng(zlib.crc32(ticker.upper().encode()))
+    close = rng.uniform(20, 400) * np.exp(np.cumsum(rng.normal(3e-4, 0.018, len(dates))))
+    spread = np.abs(rng.normal(0, 0.01, len(dates))) * close
+    df = pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.004, len(dates))),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 50_000_000, len(dates)),
+    }, index=dates)
+    log.info("[i] generated by stub source")
+    return df
+
 def _save_csv(ticker: str, df: pd.DataFrame) -> str:
     path = os.path.join(RAW_DIR, f"{ticker.upper()}.csv")
     df.to_csv(path)
-    print(f"[✓] Saved raw {ticker} → {path} ({len(df)} rows)")
+    log.info(f"[✓] Saved raw {ticker} → {path} ({len(df)} rows)")
     return path
 
 def _recent_cached_path(ticker: str, ttl_seconds: int) -> str | None:
@@ -127,17 +166,11 @@ def _recent_cached_path(ticker: str, ttl_seconds: int) -> str | None:
     age = time.time() - os.path.getmtime(path)
     return path if age <= ttl_seconds else None
 
-def fetch_and_save(ticker: str, period: str) -> str:
-    """Fetches daily OHLCV, normalizes columns, crops to 'period', saves CSV to data/raw, returns path.
-       Honors env: PREFERRED_SOURCE (e.g., 'stooq,yahoo' or 'yahoo,stooq'), RAW_TTL_SECONDS (cache)."""
-    # light caching to avoid re-fetch spam in dev/server
-    ttl = int(os.environ.get("RAW_TTL_SECONDS", "0"))  # default off
-    if ttl > 0:
-        cached = _recent_cached_path(ticker, ttl)
-        if cached:
-            print(f"[i] using cached raw for {ticker} (TTL={ttl}s): {cached}")
-            return cached
-
+def fetch_history(ticker: str, period: str, max_seconds: float | None = None) -> pd.DataFrame:
+    """Fetches daily OHLCV from the first source that answers, normalized and cropped to 'period'.
+       Honors env PREFERRED_SOURCE (e.g., 'stooq,yahoo' or 'yahoo,stooq'); nothing is written to disk.
+       max_seconds bounds the whole fetch (fewer HTTP retries, shorter timeouts, no retry past it)."""
+    t_end = None if max_seconds is None else time.monotonic() + max_seconds
     order_env = os.environ.get("PREFERRED_SOURCE", "").strip().lower()
     if not order_env:
         order = ["stooq", "yahoo"]  # default: prefer stooq to avoid 429s
@@ -147,24 +180,74 @@ def fetch_and_save(ticker: str, period: str) -> str:
     days = _period_to_days(period)
     df = None
     for src in order:
+        if _time_left(t_end) <= 0:
+            log.warning(f"[!] fetch time budget ({max_seconds:.1f}s) used up before trying '{src}'")
+            break
         if src == "stooq":
-            df = _fetch_stooq_http(ticker)
+            df = _fetch_stooq_http(ticker, t_end)
         elif src == "yahoo":
-            df = _fetch_yahoo(ticker, period)
+            df = _fetch_yahoo(ticker, period, t_end)
+        elif src == "stub":
+            df = _fetch_stub(ticker, period)
         else:
-            print(f"[!] unknown source '{src}', skipping")
+            log.warning(f"[!] unknown source '{src}', skipping")
             continue
         if df is not None and not df.empty:
             df = _normalize(df)
-            df = _crop_last_days(df, days)
-            return _save_csv(ticker, df)
+            return _crop_last_days(df, days)
 
     raise RuntimeError(f"No data returned for {ticker} (sources tried: {order}, period={period})")
 
+def raw_days(dates) -> np.ndarray:
+    """Raw CSV date column -> datetime64[D]; NaT for yfinance's 'Ticker'/'Date' header rows."""
+    dates = np.asarray(dates)
+    try:
+        # Bulk conversion of the ISO day prefix; parsing value by value dominates large screens.
+        return dates.astype('U10').astype('datetime64[D]')
+    except ValueError:
+        days = pd.to_datetime(pd.Series(dates), errors='coerce', utc=True, format='ISO8601').dt.tz_localize(None)
+        return days.to_numpy().astype('datetime64[D]')
+
+def read_raw_csv(path: str) -> pd.DataFrame:
+    """A raw CSV as a Date-indexed numeric frame. Reads both the flat layout written by
+       fetch_and_save and yfinance's multi-row header (Price/Ticker/Date rows)."""
+    df = pd.read_csv(path)
+    date_col = 'Date' if 'Date' in df.columns else df.columns[0]  # multi-row header: 'Price'
+    days = raw_days(df[date_col].to_numpy())
+    df = df.drop(columns=[date_col]).apply(pd.to_numeric, errors='coerce')
+    df.index = pd.DatetimeIndex(days, name='Date')
+    return df[~np.isnat(days)]
+
+def read_raw(ticker: str, raw_dir: str = RAW_DIR) -> pd.DataFrame:
+    """data/raw/{ticker}.csv via read_raw_csv."""
+    return read_raw_csv(os.path.join(raw_dir, f"{ticker}.csv"))
+
+def load_cached_raw(ticker: str, ttl_seconds: float = float('inf')) -> pd.DataFrame | None:
+    """data/raw/{TICKER}.csv if it is younger than ttl_seconds, else None."""
+    path = _recent_cached_path(ticker, ttl_seconds)
+    if not path:
+        return None
+    log.info(f"[i] using cached raw for {ticker}: {path}")
+    return read_raw_csv(path)
+
+def fetch_and_save(ticker: str, period: str, max_seconds: float | None = None) -> str:
+    """fetch_history, then save CSV to data/raw and return its path.
+       Honors env RAW_TTL_SECONDS: a raw file younger than that is reused as-is."""
+    # light caching to avoid re-fetch spam in dev/server
+    ttl = int(os.environ.get("RAW_TTL_SECONDS", "0"))  # default off
+    if ttl > 0:
+        cached = _recent_cached_path(ticker, ttl)
+        if cached:
+            log.info(f"[i] using cached raw for {ticker} (TTL={ttl}s): {cached}")
+            return cached
+    return _save_csv(ticker, fetch_history(ticker, period, max_seconds))
+
 if __name__ == "__main__":
     import argparse
+    from utils import setup_logging
     ap = argparse.ArgumentParser()
     ap.add_argument("--ticker", required=True)
     ap.add_argument("--period", default="6mo")
     args = ap.parse_args()
+    setup_logging()
     fetch_and_save(args.ticker, args.period)
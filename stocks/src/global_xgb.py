@@ -0,0 +1,286 @@
+"""
+Global cross-ticker XGB: one model trained on a pooled panel of every ticker, served
+from a single artifact (models/_global_xgb/) with one batched predict per forecast step.
+
+Rows are made comparable across symbols by normalising per ticker:
+  - target is the next-day log return, not the price;
+  - price-level indicators (ema/sma/bollinger bands) become ratios to Close - 1,
+    MACD lines are divided by Close; returns, RSI, widths and volatility are unit-free;
+  - ticker-level features describe the symbol (TICKER_FEATURES), so the same trees can
+    treat a quiet large-cap and a volatile small-cap differently.
+"""
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+from artifacts import (AffineScaler, save_xgb_artifact, load_xgb_artifact, read_manifest, artifact_dir,
+                       resolve_artifact)
+from features import compute_features
+from fetch_data import RAW_DIR, read_raw
+from indicators import DEFAULT_FEATURE_SET, parse_feature, resolve_feature_set
+from monte_carlo import PathFeatures
+from preprocess import clean_last_period, parse_period_to_days, split_train_eval_chrono
+from screener import universe
+from train import MODELS_DIR, XGB_AVAILABLE, _XGB_IMPORT_ERROR, _TimeBudget
+from utils import next_trading_days, save_forecast
+
+log = logging.getLogger(__name__)
+
+GLOBAL_TICKER   = '_global'   # artifact name of the pooled model (models/_global_xgb/)
+TARGET          = 'log_return_1d'
+TICKER_FEATURES = ['tk_vol_60', 'tk_mom_60', 'tk_logdv_20']
+MIN_ROWS        = 60          # history a ticker needs to join the panel or be forecast
+
+_PRICE_KINDS  = ('ema', 'sma', 'bb_upper', 'bb_lower')   # price level -> ratio to Close - 1
+_SPREAD_KINDS = ('macd', 'macd_signal', 'macd_hist')     # price difference -> share of Close
+
+
+def normalise(X: np.ndarray, close: np.ndarray, feature_names) -> np.ndarray:
+    """Indicator matrix (rows x features) in price units -> unit-free, using each row's Close."""
+    X = np.array(X, dtype=float)
+    close = np.asarray(close, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for j, name in enumerate(feature_names):
+            try:
+                kind, _ = parse_feature(name)
+            except KeyError:
+                continue
+            if kind in _PRICE_KINDS:
+                X[:, j] = X[:, j] / close - 1.0
+            elif kind in _SPREAD_KINDS:
+                X[:, j] = X[:, j] / close
+    return X
+
+
+def ticker_features(raw: pd.DataFrame) -> pd.DataFrame:
+    """Trailing per-symbol descriptors (no look-ahead): volatility, momentum, dollar volume."""
+    close = pd.to_numeric(raw['Close'], errors='coerce')
+    logc = np.log(close.where(close > 0))
+    out = pd.DataFrame(index=raw.index)
+    out['tk_vol_60'] = logc.diff().rolling(60, min_periods=20).std()
+    out['tk_mom_60'] = logc.diff(60)
+    if 'Volume' in raw.columns:
+        dv = (close * pd.to_numeric(raw['Volume'], errors='coerce')).rolling(20, min_periods=5).mean()
+        out['tk_logdv_20'] = np.log(dv.where(dv > 0))
+    else:
+        out['tk_logdv_20'] = np.nan  # XGB routes missing values; stays NaN at forecast time too
+    return out
+
+
+def ticker_rows(raw: pd.DataFrame, period: str = '2y', feature_set: str = DEFAULT_FEATURE_SET) -> pd.DataFrame:
+    """
+    Model rows for one ticker over the last `period`: normalised indicators, ticker features,
+    Close and the next-day log return target (NaN on the last row).
+    """
+    _, names = resolve_feature_set(feature_set)
+    clean = clean_last_period(raw, parse_period_to_days(period))
+    feat = compute_features(clean[['Close']], feature_set=feature_set)
+    rows = pd.DataFrame(normalise(feat[names].values, feat['Close'].values, names), index=feat.index, columns=names)
+    rows = rows.join(ticker_features(clean)[TICKER_FEATURES])
+    rows['Close'] = feat['Close']
+    rows[TARGET] = np.log(feat['Close'].shift(-1) / feat['Close'])
+    return rows
+
+
+def build_panel(tickers=None, period: str = '2y', feature_set: str = DEFAULT_FEATURE_SET,
+                raw_dir: str = RAW_DIR, raws: dict = None):
+    """
+    Pooled (train, eval) frames with a 'ticker' column. Every ticker is split 80/20
+    chronologically on its own, like preprocess, so eval rows are each ticker's latest.
+    raws ({ticker: raw frame}) skips reading data/raw.
+    """
+    trains, evals = [], []
+    for t in (raws.keys() if raws is not None else (tickers or universe(raw_dir))):
+        try:
+            raw = raws[t] if raws is not None else read_raw(t, raw_dir)
+            rows = ticker_rows(raw, period, feature_set).dropna(subset=[TARGET]) if len(raw) >= MIN_ROWS else raw
+        except (OSError, KeyError, ValueError) as e:
+            log.warning(f"[!] {t}: left out of the global panel ({e})")
+            continue
+        if len(rows) < MIN_ROWS:
+            log.warning(f"[!] {t}: {len(rows)} rows < {MIN_ROWS}; left out of the global panel")
+            continue
+        train_df, eval_df = split_train_eval_chrono(rows, train_frac=0.8)
+        trains.append(train_df.assign(ticker=t))
+        evals.append(eval_df.assign(ticker=t))
+    if not trains:
+        return pd.DataFrame(), pd.DataFrame()
+    return pd.concat(trains), pd.concat(evals)
+
+
+def return_metrics(panel: pd.DataFrame, pred_return: np.ndarray) -> dict:
+    """RMSE/MAE of the predicted log return: unit-free, so tickers can be pooled."""
+    err = panel[TARGET].values - pred_return
+    return {'rmse_return': float(np.sqrt(np.mean(err ** 2))), 'mae_return': float(np.mean(np.abs(err))),
+            'n': int(len(panel))}
+
+
+def next_close_metrics(panel: pd.DataFrame, pred_return: np.ndarray) -> dict:
+    """MSE/MAE of Close * exp(predicted return) against the realised next close (price units:
+    only meaningful for one ticker at a time)."""
+    actual = panel['Close'].values * np.exp(panel[TARGET].values)
+    pred = panel['Close'].values * np.exp(pred_return)
+    return {'mse': float(np.mean((actual - pred) ** 2)), 'mae': float(np.mean(np.abs(actual - pred))),
+            'n': int(len(panel))}
+
+
+def train_global(tickers=None, period: str = '2y', feature_set: str = DEFAULT_FEATURE_SET, n_jobs: int = 4,
+                 n_estimators: int = 400, max_seconds: float = None, raw_dir: str = RAW_DIR,
+                 raws: dict = None, save: bool = True):
+    """
+    Fit one XGBRegressor on the pooled panel. Each ticker carries the same total sample
+    weight, so long histories don't dominate. Returns a bundle shaped like
+    artifacts.load_xgb_bundle (model, scaler, feature_names, meta), or None.
+    """
+    if not XGB_AVAILABLE:
+        log.warning(f"[!] XGBoost unavailable; skipping global training. Reason: {_XGB_IMPORT_ERROR}")
+        return None
+    from xgboost import XGBRegressor
+
+    t0 = time.perf_counter()
+    train_df, eval_df = build_panel(tickers, period, feature_set, raw_dir, raws)
+    if train_df.empty:
+        log.warning("[!] No usable tickers for the global model.")
+        return None
+    _, names = resolve_feature_set(feature_set)
+    cols = names + TICKER_FEATURES
+    counts = train_df['ticker'].map(train_df['ticker'].value_counts())
+    weight = (len(train_df) / train_df['ticker'].nunique()) / counts.values
+
+    budget = _TimeBudget(max_seconds) if max_seconds is not None else None
+    model = XGBRegressor(
+        callbacks=[budget] if budget else None,
+        n_estimators=n_estimators,
+        max_depth=5,
+        learning_rate=0.05,
+        subsample=0.9,
+        colsample_bytree=0.9,
+        reg_lambda=1.0,
+        n_jobs=n_jobs,
+        random_state=42,
+        verbosity=1,
+        tree_method="hist"
+    )
+    tickers_used = sorted(train_df['ticker'].unique())
+    log.info(f"[ ] Training global XGBRegressor on {len(train_df)} rows from {len(tickers_used)} tickers...")
+    model.fit(train_df[cols], train_df[TARGET], sample_weight=weight)
+
+    meta = {'target': TARGET, 'ticker_features': TICKER_FEATURES, 'period': period,
+            'tickers': tickers_used, 'train_rows': int(len(train_df))}
+    if not eval_df.empty:
+        pred = model.predict(eval_df[cols])
+        by_ticker = eval_df['ticker'].values
+        meta['eval'] = {
+            'pooled': return_metrics(eval_df, pred),
+            'per_ticker': {t: next_close_metrics(eval_df[by_ticker == t], pred[by_ticker == t])
+                           for t in tickers_used if (by_ticker == t).any()},
+        }
+        pooled = meta['eval']['pooled']
+        log.info(f"[✓] Global eval (log return, {pooled['n']} rows): "
+                 f"RMSE {pooled['rmse_return']:.5f}, MAE {pooled['mae_return']:.5f}")
+    bundle = {'model': model, 'scaler': AffineScaler.identity(len(cols), cols), 'feature_names': cols,
+              'meta': {'feature_set': resolve_feature_set(feature_set)[0], **meta}}
+    log.info(f"[✓] Global model trained in {time.perf_counter() - t0:.1f}s")
+    if save:
+        out_dir = save_xgb_artifact(GLOBAL_TICKER, model, bundle['scaler'], cols, feature_set=bundle['meta']['feature_set'],
+                                    models_dir=MODELS_DIR, extra_meta=meta)
+        _CACHE.clear()
+        log.info(f"[✓] Saved global model to {out_dir}")
+    return bundle
+
+
+_CACHE = {}
+
+
+def load_global_bundle(models_dir: str = MODELS_DIR, n_jobs: int = None) -> dict:
+    """
+    The saved global bundle, loaded once per process and n_jobs (reloaded when the artifact
+    is replaced). The booster's thread count is fixed at load: callers share the bundle,
+    so nothing may change it afterwards.
+    """
+    created = read_manifest(resolve_artifact(artifact_dir(GLOBAL_TICKER, 'xgb', models_dir)), kind='xgb', verify=False)['created']
+    key = (models_dir, created, n_jobs)
+    if key not in _CACHE:
+        for stale in [k for k in _CACHE if k[:2] != key[:2]]:
+            del _CACHE[stale]
+        bundle = load_xgb_artifact(GLOBAL_TICKER, models_dir=models_dir)
+        bundle['model'].set_params(n_jobs=n_jobs)
+        _CACHE[key] = bundle
+    return _CACHE[key]
+
+
+def forecast_global(raws: dict, horizon: int = 7, bundle: dict = None) -> dict:
+    """
+    Recursive forecast for every ticker in raws ({ticker: raw frame}) at once: indicator
+    states advance incrementally per ticker (monte_carlo.PathFeatures) and each step is a
+    single predict over all tickers. Ticker features are held at their last observed value.
+    Returns {ticker: DataFrame(date, ticker, forecast_close)}.
+    """
+    bundle = bundle or load_global_bundle()
+    model, cols = bundle['model'], bundle['feature_names']
+    names = [c for c in cols if c not in TICKER_FEATURES]
+
+    tickers, states, tk_rows, last_close, last_date = [], [], [], [], []
+    for t, raw in raws.items():
+        close = pd.to_numeric(raw['Close'], errors='coerce').dropna()
+        close = close[close > 0]
+        if len(close) < MIN_ROWS:
+            log.warning(f"[!] {t}: {len(close)} rows < {MIN_ROWS}; no global forecast")
+            continue
+        tickers.append(t)
+        states.append(PathFeatures(close, names, 1, horizon))
+        tk_rows.append(ticker_features(raw.loc[close.index])[TICKER_FEATURES].iloc[-1].values)
+        last_close.append(float(close.iloc[-1]))
+        last_date.append(close.index[-1])
+    if not tickers:
+        return {}
+
+    tk = np.vstack(tk_rows).astype(float)
+    c = np.array(last_close)
+    path = np.empty((len(tickers), horizon))
+    for h in range(horizon):
+        X = normalise(np.vstack([s.matrix() for s in states]), c, names)
+        r = model.predict(pd.DataFrame(np.hstack([X, tk]), columns=cols))
+        c = c * np.exp(r)
+        path[:, h] = c
+        for i, s in enumerate(states):
+            s.push(c[i:i + 1])
+
+    return {t: pd.DataFrame({'date': next_trading_days(last_date[i], horizon), 'ticker': t,
+                             'forecast_close': path[i]})
+            for i, t in enumerate(tickers)}
+
+
+if __name__ == '__main__':
+    import argparse
+    from utils import setup_logging
+    ap = argparse.ArgumentParser(description="Global cross-ticker XGB: train on the pooled panel, forecast many tickers")
+    ap.add_argument('--train', action='store_true', help="Train and save the global model")
+    ap.add_argument('--forecast', action='store_true', help="Forecast --tickers with the saved global model")
+    ap.add_argument('--tickers', nargs='+', default=None, help="Default: every CSV in data/raw")
+    ap.add_argument('--period', default='2y', help="Training window per ticker")
+    ap.add_argument('--feature_set', default=DEFAULT_FEATURE_SET)
+    ap.add_argument('--horizon', type=int, default=7)
+    ap.add_argument('--n_jobs', type=int, default=4)
+    ap.add_argument('--max_seconds', type=float, default=None, help="Wall-clock training budget")
+    args = ap.parse_args()
+    setup_logging()
+
+    tickers = [t.upper() for t in args.tickers] if args.tickers else None
+    if args.train:
+        train_global(tickers, args.period, args.feature_set, n_jobs=args.n_jobs, max_seconds=args.max_seconds)
+    if args.forecast:
+        raws = {}
+        for t in tickers or universe():
+            try:
+                raws[t] = read_raw(t)
+            except (OSError, ValueError) as e:
+                log.warning(f"[!] {t}: no raw data ({e})")
+        t0 = time.perf_counter()
+        outs = forecast_global(raws, args.horizon, load_global_bundle(n_jobs=args.n_jobs))
+        log.info(f"[✓] Global forecast for {len(outs)} tickers in {time.perf_counter() - t0:.2f}s")
+        for t, out in outs.items():
+            save_forecast(out, t, 'xgb_global', [args.horizon])
+        log.info(f"[✓] Saved results/{{TICKER}}_xgb_global_{args.horizon}d.csv for {len(outs)} tickers")
@@ -0,0 +1,235 @@
+import re
+import numpy as np
+from scipy.signal import lfilter
+
+# ────────────────────────────────────────────────────────────────
+# Registry: every indicator declares the columns it reads, its parameters (parsed
+# from the feature name), a warm-up length and a vectorized NumPy kernel.
+# Kernels ask the plan for their intermediates (e.g. MACD asks for two EMAs),
+# so each (kind, params) is computed exactly once per feature set.
+
+INDICATORS = {}
+
+
+class Indicator:
+    def __init__(self, kind, pattern, kernel, warmup, inputs=('Close',), params=()):
+        self.kind = kind
+        self.pattern = re.compile(pattern) if pattern else None  # None = intermediate only
+        self.kernel = kernel
+        self.warmup = warmup
+        self.inputs = tuple(inputs)
+        self.params = tuple(params)
+
+
+def register(kind, pattern=None, warmup=lambda *p: 0, inputs=('Close',), params=()):
+    def deco(kernel):
+        INDICATORS[kind] = Indicator(kind, pattern, kernel, warmup, inputs, params)
+        return kernel
+    return deco
+
+
+def parse_feature(name: str):
+    """Map a feature name like 'ema_10' or 'macd_signal_12_26_9' to (kind, params)."""
+    for ind in INDICATORS.values():
+        if ind.pattern is None:
+            continue
+        m = ind.pattern.match(name)
+        if m:
+            return ind.kind, tuple(int(g) for g in m.groups())
+    raise KeyError(f"Unknown feature '{name}' (no registered indicator matches)")
+
+
+class FeaturePlan:
+    """Memoizes (kind, params) -> array over one input frame; kernels share intermediates through get()."""
+
+    def __init__(self, inputs: dict):
+        self.inputs = inputs
+        self.cache = {}
+
+    def get(self, kind: str, *params) -> np.ndarray:
+        key = (kind, params)
+        if key not in self.cache:
+            ind = INDICATORS[kind]
+            missing = [c for c in ind.inputs if c not in self.inputs]
+            if missing:
+                raise KeyError(f"{kind} needs input columns {missing}")
+            self.cache[key] = ind.kernel(self, *params)
+        return self.cache[key]
+
+
+def compute_indicators(inputs: dict, names) -> dict:
+    """
+    Compute the named features from input arrays ({'Close': ndarray, ...}); returns name -> ndarray.
+    Rows where an input is NaN are skipped, as if the bar were absent, and come back NaN: the
+    recursive EMA and cumulative-sum kernels would otherwise carry one NaN to the end of the series.
+    """
+    arrays = {k: np.asarray(v, dtype=float) for k, v in inputs.items()}
+    ok = np.logical_and.reduce([~np.isnan(a) for a in arrays.values()]) if arrays else None
+    if ok is None or ok.all():
+        plan = FeaturePlan(arrays)
+        return {name: plan.get(*_split(parse_feature(name))) for name in names}
+    plan = FeaturePlan({k: a[ok] for k, a in arrays.items()})
+    out = {}
+    for name in names:
+        full = np.full(ok.shape, np.nan)
+        full[ok] = plan.get(*_split(parse_feature(name)))
+        out[name] = full
+    return out
+
+
+def _split(kind_params):
+    kind, params = kind_params
+    return (kind, *params)
+
+
+def warmup(names) -> int:
+    """Rows needed before every feature in names is fully formed."""
+    out = 0
+    for name in names:
+        kind, params = parse_feature(name)
+        out = max(out, int(INDICATORS[kind].warmup(*params)))
+    return out
+
+
+# ────────────────────────────────────────────────────────────────
+# Kernels (semantics match the pandas versions previously inlined in compute_features)
+
+def _ewm(x: np.ndarray, alpha: float) -> np.ndarray:
+    """pandas ewm(alpha=..., adjust=False).mean() as one IIR filter pass; leading NaNs are kept
+    (interior NaNs never reach the kernels, see compute_indicators)."""
+    out = np.full_like(x, np.nan)
+    ok = np.flatnonzero(~np.isnan(x))
+    if ok.size == 0:
+        return out
+    s = ok[0]
+    y = x[s:]
+    out[s:], _ = lfilter([alpha], [1.0, alpha - 1.0], y, zi=[(1.0 - alpha) * y[0]])
+    return out
+
+
+def _rolling_sum(x: np.ndarray, w: int) -> np.ndarray:
+    c = np.cumsum(x)
+    out = c.copy()
+    out[w:] = c[w:] - c[:-w]
+    return out
+
+
+@register('ema', r'^ema_(\d+)$', warmup=lambda w: w, params=('span',))
+def _ema(plan, w):
+    return _ewm(plan.inputs['Close'], 2.0 / (w + 1.0))
+
+
+@register('sma', r'^sma_(\d+)$', warmup=lambda w: w, params=('window',))
+def _sma(plan, w):
+    # rolling(window=w, min_periods=1).mean()
+    x = plan.inputs['Close']
+    n = np.minimum(np.arange(1, len(x) + 1), w)
+    return _rolling_sum(x, w) / n
+
+
+@register('rstd', warmup=lambda w: w, params=('window',))
+def _rstd(plan, w):
+    # rolling(window=w).std(ddof=1): NaN until the window is full
+    x = plan.inputs['Close']
+    out = np.full_like(x, np.nan)
+    if len(x) >= w and w > 1:
+        mean = _rolling_sum(x, w)[w - 1:] / w
+        sq = _rolling_sum(x * x, w)[w - 1:] / w
+        out[w - 1:] = np.sqrt(np.clip(sq - mean * mean, 0, None) * w / (w - 1))
+    return out
+
+
+@register('return', r'^return_(\d+)d$', warmup=lambda k: k, params=('periods',))
+def _return(plan, k):
+    x = plan.inputs['Close']
+    out = np.full_like(x, np.nan)
+    if len(x) > k:
+        out[k:] = x[k:] / x[:-k] - 1.0
+    return out
+
+
+@register('rsi', r'^rsi_(\d+)$', warmup=lambda p: p, params=('period',))
+def _rsi(plan, p):
+    x = plan.inputs['Close']
+    delta = np.empty_like(x)
+    delta[0] = np.nan
+    delta[1:] = np.diff(x)
+    ma_up = _ewm(np.clip(delta, 0, None), 1.0 / p)     # ewm(com=p-1)
+    ma_down = _ewm(np.clip(-delta, 0, None), 1.0 / p)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = ma_up / np.where(ma_down == 0, np.nan, ma_down)
+    return 100 - (100 / (1 + rs))
+
+
+@register('macd', r'^macd_(\d+)_(\d+)$', warmup=lambda f, s: s, params=('fast', 'slow'))
+def _macd(plan, f, s):
+    return plan.get('ema', f) - plan.get('ema', s)
+
+
+@register('macd_signal', r'^macd_signal_(\d+)_(\d+)_(\d+)$', warmup=lambda f, s, g: s + g,
+          params=('fast', 'slow', 'signal'))
+def _macd_signal(plan, f, s, g):
+    return _ewm(plan.get('macd', f, s), 2.0 / (g + 1.0))
+
+
+@register('macd_hist', r'^macd_hist_(\d+)_(\d+)_(\d+)$', warmup=lambda f, s, g: s + g,
+          params=('fast', 'slow', 'signal'))
+def _macd_hist(plan, f, s, g):
+    return plan.get('macd', f, s) - plan.get('macd_signal', f, s, g)
+
+
+@register('bb_upper', r'^bb_upper_(\d+)$', warmup=lambda w: w, params=('window',))
+def _bb_upper(plan, w, k=2.0):
+    return plan.get('sma', w) + k * plan.get('rstd', w)
+
+
+@register('bb_lower', r'^bb_lower_(\d+)$', warmup=lambda w: w, params=('window',))
+def _bb_lower(plan, w, k=2.0):
+    return plan.get('sma', w) - k * plan.get('rstd', w)
+
+
+@register('bb_width', r'^bb_width_(\d+)$', warmup=lambda w: w, params=('window',))
+def _bb_width(plan, w):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (plan.get('bb_upper', w) - plan.get('bb_lower', w)) / plan.get('sma', w)
+
+
+@register('volatility', r'^volatility_(\d+)$', warmup=lambda w: w + 1, params=('window',))
+def _volatility(plan, w):
+    # rolling std (ddof=1) of 1-day returns
+    r = plan.get('return', 1)
+    out = np.full_like(r, np.nan)
+    rr = r[1:]
+    if len(rr) >= w and w > 1:
+        mean = _rolling_sum(rr, w)[w - 1:] / w
+        sq = _rolling_sum(rr * rr, w)[w - 1:] / w
+        out[w:] = np.sqrt(np.clip(sq - mean * mean, 0, None) * w / (w - 1))
+    return out
+
+
+# ────────────────────────────────────────────────────────────────
+# Named, versioned feature sets. Never edit a published version; add a new one.
+
+FEATURE_SETS = {
+    'base': {
+        1: ['ema_5', 'sma_5', 'ema_10', 'sma_10', 'ema_20', 'sma_20', 'return_1d', 'return_5d', 'rsi_14'],
+    },
+    'extended': {
+        1: ['ema_5', 'sma_5', 'ema_10', 'sma_10', 'ema_20', 'sma_20', 'return_1d', 'return_5d', 'rsi_14',
+            'macd_12_26', 'macd_signal_12_26_9', 'macd_hist_12_26_9',
+            'bb_upper_20', 'bb_lower_20', 'bb_width_20', 'volatility_20'],
+    },
+}
+DEFAULT_FEATURE_SET = 'base@1'
+
+
+def resolve_feature_set(spec: str = DEFAULT_FEATURE_SET):
+    """'name@version' (or bare 'name' for the latest version) -> ('name@version', [feature names])."""
+    name, _, version = str(spec).partition('@')
+    if name not in FEATURE_SETS:
+        raise KeyError(f"Unknown feature set '{name}' (known: {sorted(FEATURE_SETS)})")
+    versions = FEATURE_SETS[name]
+    v = int(version) if version else max(versions)
+    if v not in versions:
+        raise KeyError(f"Feature set '{name}' has no version {v} (known: {sorted(versions)})")
+    return f"{name}@{v}", list(versions[v])
@@ -0,0 +1,333 @@
+"""
+Load / latency harness: N tickers through the pipeline with a fixed concurrency, data
+served by the deterministic stub source (PREFERRED_SOURCE=stub, see fetch_data._fetch_stub)
+so runs are repeatable and never touch Stooq/Yahoo.
+
+Modes
+  inproc  run_pipeline() on a thread pool in this process (in-memory sink by default)
+  cli     one `python main.py` subprocess per ticker, as the server spawns them
+  server  GET {url}/api/run per ticker; start the server with PREFERRED_SOURCE=stub
+
+Reports throughput, p50/p95/p99 latency per stage and end to end, CPU utilisation and
+peak memory, and saves everything to results/loadtest/{label}_{timestamp}.json.
+`--compare A.json B.json` diffs two saved runs (e.g. before/after a change).
+"""
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import threading
+import subprocess
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from utils import RESULTS_DIR, safe_ticker
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SRC_DIR)
+LOADTEST_DIR = os.path.join(RESULTS_DIR, 'loadtest')
+PERCENTILES = (50, 95, 99)
+
+
+class _SystemSampler(threading.Thread):
+    """Samples host CPU utilisation and used memory from /proc every `interval` seconds (Linux)."""
+
+    def __init__(self, interval: float = 0.25):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.cpu = []
+        self.mem_mb = []
+        self._halt = threading.Event()
+
+    @staticmethod
+    def _cpu_times():
+        with open('/proc/stat') as f:
+            vals = [int(v) for v in f.readline().split()[1:]]
+        idle = vals[3] + (vals[4] if len(vals) > 4 else 0)  # idle + iowait
+        return sum(vals), idle
+
+    @staticmethod
+    def _used_mb():
+        info = {}
+        with open('/proc/meminfo') as f:
+            for line in f:
+                k, v = line.split(':', 1)
+                info[k] = int(v.split()[0])
+        return (info['MemTotal'] - info.get('MemAvailable', info['MemFree'])) / 1024
+
+    def run(self):
+        try:
+            prev = self._cpu_times()
+        except OSError:
+            return
+        while not self._halt.wait(self.interval):
+            cur = self._cpu_times()
+            total, idle = cur[0] - prev[0], cur[1] - prev[1]
+            if total > 0:
+                self.cpu.append(100.0 * (1 - idle / total))
+            self.mem_mb.append(self._used_mb())
+            prev = cur
+
+    def stop(self):
+        self._halt.set()
+        self.join(timeout=2)
+
+
+def _rusage():
+    s, c = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    scale = 1 / 1024 if sys.platform != 'darwin' else 1 / 1024 / 1024  # ru_maxrss: KiB on Linux, bytes on macOS
+    return {'cpu_self': s.ru_utime + s.ru_stime, 'cpu_children': c.ru_utime + c.ru_stime,
+            'maxrss_self_mb': s.ru_maxrss * scale, 'maxrss_children_mb': c.ru_maxrss * scale}
+
+
+def _run_inproc(ticker: str, opts: dict) -> dict:
+    from pipeline import run_pipeline, DiskSink
+    res = run_pipeline(ticker, opts['period'], opts['horizons'], use_lstm=opts['use_lstm'],
+                       mc_paths=opts['mc_paths'], sarimax_auto=opts['sarimax_auto'],
+                       deadline_seconds=opts['deadline'], threads=opts['threads'],
+                       sink=DiskSink() if opts['sink'] == 'disk' else None)
+    return {'stages': res.timings, 'errors': {k: str(v) for k, v in res.errors.items()},
+            'degraded': res.degraded}
+
+
+def _run_cli(ticker: str, opts: dict) -> dict:
+    cmd = [sys.executable, os.path.join(SRC_DIR, 'main.py'), '--ticker', ticker, '--period', opts['period'],
+           '--horizons', ','.join(map(str, opts['horizons'])), '--mc_paths', str(opts['mc_paths']),
+           '--run_report']
+    if opts['use_lstm']:
+        cmd.append('--use_lstm')
+    if opts['sarimax_auto']:
+        cmd.append('--sarimax_auto')
+    if opts['deadline'] is not None:
+        cmd += ['--deadline', str(opts['deadline'])]
+    if opts['threads']:
+        cmd += ['--threads', str(opts['threads'])]
+    proc = subprocess.run(cmd, cwd=ROOT_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"main.py exited {proc.returncode}: {proc.stderr.strip()[-500:]}")
+    with open(os.path.join(RESULTS_DIR, f"{safe_ticker(ticker)}_run_report.json")) as f:
+        return _from_report(json.load(f))
+
+
+def _run_server(ticker: str, opts: dict) -> dict:
+    q = {'ticker': ticker, 'period': opts['period'], 'horizons': ','.join(map(str, opts['horizons'])),
+         'use_lstm': str(opts['use_lstm']).lower()}
+    if opts['deadline'] is not None:
+        q['deadline'] = opts['deadline']
+    url = f"{opts['url'].rstrip('/')}/api/run?{urllib.parse.urlencode(q)}"
+    with urllib.request.urlopen(url, timeout=opts['http_timeout']) as r:
+        body = json.load(r)
+    return _from_report(body.get('report') or {})
+
+
+def _from_report(report: dict) -> dict:
+    stages = report.get('stages', {})
+    return {'stages': {k: v['seconds'] for k, v in stages.items() if v.get('status') == 'ok'},
+            'errors': {k: v.get('error', v.get('status')) for k, v in stages.items() if v.get('status') != 'ok'},
+            'degraded': report.get('degraded', [])}
+
+
+RUNNERS = {'inproc': _run_inproc, 'cli': _run_cli, 'server': _run_server}
+
+
+def _timed_run(mode: str, ticker: str, opts: dict, t_start: float) -> dict:
+    t0 = time.perf_counter()
+    rec = {'ticker': ticker, 'start': round(t0 - t_start, 4)}
+    try:
+        rec.update(RUNNERS[mode](ticker, opts))
+        rec['ok'] = True
+    except Exception as e:
+        rec['ok'] = False
+        rec['error'] = f"{type(e).__name__}: {e}"
+    rec['latency'] = time.perf_counter() - t0
+    return rec
+
+
+def _pct(values) -> dict:
+    if not values:
+        return None
+    v = np.asarray(values, dtype=float)
+    out = {f'p{p}': round(float(np.percentile(v, p)), 4) for p in PERCENTILES}
+    out.update(mean=round(float(v.mean()), 4), max=round(float(v.max()), 4), n=int(v.size))
+    return out
+
+
+def summarize(runs: list, wall: float, cpu_seconds: float, sampler: _SystemSampler, usage: dict) -> dict:
+    ok = [r for r in runs if r['ok']]
+    stage_names = sorted({s for r in ok for s in r['stages']})
+    ncpu = os.cpu_count() or 1
+    return {
+        'runs': len(runs),
+        'ok': len(ok),
+        'failed': len(runs) - len(ok),
+        'wall_seconds': round(wall, 3),
+        'throughput_runs_per_min': round(60.0 * len(ok) / wall, 3) if wall > 0 else None,
+        'latency': _pct([r['latency'] for r in ok]),
+        'stages': {s: _pct([r['stages'][s] for r in ok if s in r['stages']]) for s in stage_names},
+        'degraded_runs': sum(1 for r in ok if r.get('degraded')),
+        'cpu': {
+            'seconds': round(cpu_seconds, 3),
+            # process tree (this process + finished children), as a share of all cores
+            'util_pct': round(100.0 * cpu_seconds / (wall * ncpu), 1) if wall > 0 else None,
+            'host_util_pct_mean': round(float(np.mean(sampler.cpu)), 1) if sampler.cpu else None,
+            'host_util_pct_max': round(float(np.max(sampler.cpu)), 1) if sampler.cpu else None,
+        },
+        'memory': {
+            'peak_rss_self_mb': round(usage['maxrss_self_mb'], 1),
+            'peak_rss_child_mb': round(usage['maxrss_children_mb'], 1),  # largest single child
+            'host_used_peak_mb': round(max(sampler.mem_mb), 1) if sampler.mem_mb else None,
+        },
+    }
+
+
+def run_load(mode: str = 'inproc', n_tickers: int = 8, concurrency: int = 4, prefix: str = 'LT',
+             warmup: int = 1, **opts) -> dict:
+    """Drive n_tickers synthetic tickers through `mode` with `concurrency` in flight; returns the full result."""
+    os.environ['PREFERRED_SOURCE'] = 'stub'  # in-process fetches and cli children
+    os.environ.setdefault('RAW_TTL_SECONDS', '0')
+    if opts.get('threads') is None and mode == 'inproc':
+        opts['threads'] = max(1, (os.cpu_count() or 1) // concurrency)
+    tickers = [f"{prefix}{i:04d}" for i in range(n_tickers)]
+    if mode == 'inproc':
+        # BLAS/TF limits are process-wide: set once for all concurrent runs, from one run's shares
+        from pipeline import thread_shares
+        from stage_executor import configure_process
+        _, shares = thread_shares(opts['threads'], opts['use_lstm'])
+        configure_process(blas=shares['sarimax'], tf_intra=shares['lstm'] if opts['use_lstm'] else None)
+
+    for i in range(warmup if mode == 'inproc' else 0):  # imports and first-call costs stay out of the numbers
+        _timed_run(mode, f"{prefix}WARM{i}", opts, time.perf_counter())
+
+    sampler = _SystemSampler()
+    sampler.start()
+    before = _rusage()
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        runs = list(pool.map(lambda t: _timed_run(mode, t, opts, t_start), tickers))
+    wall = time.perf_counter() - t_start
+    after = _rusage()
+    sampler.stop()
+
+    cpu_seconds = (after['cpu_self'] - before['cpu_self']) + (after['cpu_children'] - before['cpu_children'])
+    summary = summarize(runs, wall, cpu_seconds, sampler, after)
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {'mode': mode, 'tickers': n_tickers, 'concurrency': concurrency, 'warmup': warmup,
+                   'stub_latency_ms': float(os.environ.get('STUB_LATENCY_MS', '0')), **opts},
+        'summary': summary,
+        'runs': runs,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save_result(result: dict, label: str = None) -> str:
+    os.makedirs(LOADTEST_DIR, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    label = label or f"{result['config']['mode']}-{result['meta']['git_commit'] or 'nogit'}"
+    path = os.path.join(LOADTEST_DIR, f"{safe_ticker(label)}_{stamp}.json")
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2, default=str)
+    return path
+
+
+def print_summary(result: dict):
+    s, c = result['summary'], result['config']
+    print(f"\n{c['mode']}: {s['ok']}/{s['runs']} ok, concurrency {c['concurrency']}, wall {s['wall_seconds']:.2f}s, "
+          f"throughput {s['throughput_runs_per_min']} runs/min")
+    print(f"  {'':<12s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s}")
+    rows = [('overall', s['latency'])] + sorted(s['stages'].items())
+    for name, p in rows:
+        if p:
+            print(f"  {name:<12s} {p['p50']:8.3f} {p['p95']:8.3f} {p['p99']:8.3f} {p['max']:8.3f}")
+    print(f"  cpu {s['cpu']['seconds']:.1f}s ({s['cpu']['util_pct']}% of {result['meta']['cpu_count']} cores; "
+          f"host mean {s['cpu']['host_util_pct_mean']}%), peak rss {s['memory']['peak_rss_self_mb']:.0f} MB "
+          f"(child {s['memory']['peak_rss_child_mb']:.0f} MB), degraded runs {s['degraded_runs']}")
+    for r in result['runs']:
+        if not r['ok']:
+            print(f"  [!] {r['ticker']}: {r['error']}")
+
+
+def _flatten(summary: dict, prefix: str = '') -> dict:
+    out = {}
+    for k, v in summary.items():
+        if isinstance(v, dict):
+            out.update(_flatten(v, f"{prefix}{k}."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[f"{prefix}{k}"] = v
+    return out
+
+
+def compare(path_a: str, path_b: str):
+    """Side-by-side summary metrics of two saved runs, with the relative change B vs A."""
+    with open(path_a) as f:
+        a = json.load(f)
+    with open(path_b) as f:
+        b = json.load(f)
+    fa, fb = _flatten(a['summary']), _flatten(b['summary'])
+    print(f"A: {path_a} ({a['meta'].get('git_commit')}, {a['config']['mode']})")
+    print(f"B: {path_b} ({b['meta'].get('git_commit')}, {b['config']['mode']})")
+    print(f"{'metric':<32s} {'A':>12s} {'B':>12s} {'change':>9s}")
+    for k in sorted(set(fa) | set(fb)):
+        va, vb = fa.get(k), fb.get(k)
+        change = f"{100.0 * (vb - va) / va:+8.1f}%" if va and vb is not None else ''
+        print(f"{k:<32s} {'' if va is None else f'{va:12.3f}':>12s} {'' if vb is None else f'{vb:12.3f}':>12s} {change:>9s}")
+
+
+if __name__ == '__main__':
+    import argparse
+    from utils import setup_logging
+    ap = argparse.ArgumentParser(description="Concurrent load/latency test of the pipeline on stubbed data")
+    ap.add_argument('--mode', choices=sorted(RUNNERS), default='inproc')
+    ap.add_argument('--tickers', type=int, default=8, help="Synthetic tickers to run")
+    ap.add_argument('--concurrency', type=int, default=4, help="Runs in flight at once")
+    ap.add_argument('--period', default='1y')
+    ap.add_argument('--horizons', default='7', help="Comma-separated horizons")
+    ap.add_argument('--mc_paths', type=int, default=0)
+    ap.add_argument('--use_lstm', action='store_true')
+    ap.add_argument('--sarimax_auto', action='store_true')
+    ap.add_argument('--deadline', type=float, default=None)
+    ap.add_argument('--threads', type=int, default=None, help="Per-run thread budget (inproc default: cores/concurrency)")
+    ap.add_argument('--sink', choices=['memory', 'disk'], default='memory', help="inproc only")
+    ap.add_argument('--url', default=f"http://localhost:{os.environ.get('PORT', '4000')}",
+                    help="server mode base URL (default: PORT, as server.js)")
+    ap.add_argument('--http_timeout', type=float, default=600)
+    ap.add_argument('--warmup', type=int, default=1, help="Unmeasured warm-up runs (inproc)")
+    ap.add_argument('--stub_latency_ms', type=float, default=None, help="Fake fetch latency of the stub source")
+    ap.add_argument('--label', default=None, help="Name for the saved result file")
+    ap.add_argument('--verbose', action='store_true', help="Show pipeline logs (inproc)")
+    ap.add_argument('--compare', nargs=2, metavar=('A', 'B'), help="Compare two saved results and exit")
+    args = ap.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+    if args.verbose:
+        setup_logging()
+    if args.stub_latency_ms is not None:
+        os.environ['STUB_LATENCY_MS'] = str(args.stub_latency_ms)
+    result = run_load(args.mode, args.tickers, args.concurrency, warmup=args.warmup,
+                      period=args.period, horizons=[int(h) for h in args.horizons.split(',') if h.strip()],
+                      mc_paths=args.mc_paths, use_lstm=args.use_lstm, sarimax_auto=args.sarimax_auto,
+                      deadline=args.deadline, threads=args.threads, sink=args.sink, url=args.url,
+                      http_timeout=args.http_timeout)
+    print_summary(result)
+    print(f"[✓] Saved load test result to {save_result(result, args.label)}")
@@ -1,85 +1,62 @@
-import os
 import argparse
+import logging
+import os
+import sys
 
-from fetch_data import fetch_and_save
-from preprocess import process_ticker
-from train import train_and_save, XGB_AVAILABLE, _XGB_IMPORT_ERROR
-from evaluate import evaluate_model
-from predict_xgb import forecast_xgb
-from sarimax_forecast import forecast_sarimax
-from predict_lstm import forecast_lstm
-from ensemble import fit_and_predict_ensemble
-from utils import ensure_dirs
+from indicators import DEFAULT_FEATURE_SET
+from pipeline import run_pipeline, compare_sequential, thread_shares, DiskSink
+from stage_executor import configure_process
+from utils import setup_logging
 
 def main():
     parser = argparse.ArgumentParser(description="End-to-end stock pipeline")
     parser.add_argument('--ticker', required=True)
     parser.add_argument('--period', default='6mo')
     parser.add_argument('--horizon', type=int, default=7)
+    parser.add_argument('--horizons', default=None, help="Comma-separated horizons served from one run, e.g. 1,5,7,30")
     parser.add_argument('--use_lstm', action='store_true')
     parser.add_argument('--skip_xgb', action='store_true', help="Skip XGB train/predict stage")
+    parser.add_argument('--xgb_model', choices=['ticker', 'global'], default='ticker',
+                        help="ticker: train a model for this ticker; global: use the shared global_xgb model")
+    parser.add_argument('--mc_paths', type=int, default=0, help="Monte Carlo paths for XGB quantile bands (0 = off)")
+    parser.add_argument('--sarimax_auto', action='store_true', help="Auto-select SARIMAX order (cached per ticker)")
+    parser.add_argument('--lstm_finetune', action='store_true', help="Fine-tune LSTM from the shared base model")
+    parser.add_argument('--lstm_budget', type=float, default=None, help="Wall-clock LSTM training budget (seconds)")
+    parser.add_argument('--feature_set', default=DEFAULT_FEATURE_SET, help="Indicator set, e.g. base@1, extended@1")
+    parser.add_argument('--deadline', type=float, default=None, help="Wall-clock budget for the whole run (seconds)")
+    parser.add_argument('--threads', type=int, default=None, help="Total CPU thread budget (default: all cores)")
+    parser.add_argument('--sequential', action='store_true', help="Run model stages one after another")
+    parser.add_argument('--compare_sequential', action='store_true',
+                        help="Run concurrently, then sequentially on the same data, and report the wall-clock speedup")
+    parser.add_argument('--run_report', action='store_true', help="Always write results/{TICKER}_run_report.json")
     args = parser.parse_args()
+    setup_logging()
 
     ticker = args.ticker.upper()
-    horizon = args.horizon
-
-    print(f"\n--- Stock Pipeline for {ticker} (period={args.period}, horizon={horizon}d) ---\n")
-    ensure_dirs()
-
-    # 1) Fetch
-    print("[1/7] Fetching raw data...")
-    fetch_and_save(ticker, args.period)
-
-    # 2) Preprocess
-    print("[2/7] Preprocessing data...")
-    process_ticker(ticker, args.period)
-
-    # 3) Train XGB
-    if args.skip_xgb:
-        print("[3/7] Skipping XGB training by flag.")
-        xgb_ok = False
-    else:
-        print("[3/7] Training XGBoost model...")
-        if not XGB_AVAILABLE:
-            print(f"[!] XGBoost not available; skipping. Reason: {_XGB_IMPORT_ERROR}")
-            xgb_ok = False
-        else:
-            xgb_ok = train_and_save(ticker)
-
-    # 4) Evaluate XGB
-    print("[4/7] Evaluating XGBoost model...")
-    if xgb_ok:
-        evaluate_model(ticker)
-    else:
-        print("[ ] Skipped evaluation (no XGB model).")
-
-    # 5) Forecast SARIMAX
-    print("[5/7] Generating SARIMAX forecast...")
-    forecast_sarimax(ticker, args.period, horizon)
-
-    # 6) Forecast XGB (recursive)
-    print("[6/7] Generating XGB forecast...")
-    if xgb_ok:
-        forecast_xgb(ticker, args.period, horizon)
-    else:
-        print("[ ] Skipped XGB forecast (no model).")
-
-    # 7) LSTM (optional) + Ensemble
-    if args.use_lstm:
-        print("[7/7] Training + forecasting LSTM...")
-        ok = True
-        try:
-            from train_lstm import train_lstm_model
-            ok = train_lstm_model(ticker, horizon=horizon)
-        except Exception as e:
-            print(f"[!] LSTM training failed: {e}")
-            ok = False
-        if ok:
-            forecast_lstm(ticker, horizon=horizon)
-
-    # Ensemble (average available models)
-    print("[-->] Creating stacked ensemble forecast...")
-    fit_and_predict_ensemble(ticker, horizon)
+    horizons = sorted({int(h) for h in args.horizons.split(',') if h.strip()}) if args.horizons else [args.horizon]
+
+    # One run per process: size the process-wide BLAS/TF pools to this run's stage shares.
+    _, shares = thread_shares(args.threads, args.use_lstm, args.sequential)
+    configure_process(blas=shares['sarimax'], tf_intra=shares['lstm'] if args.use_lstm else None)
+
+    if args.compare_sequential:
+        compare_sequential(ticker, args.period, horizons=horizons, sink=DiskSink(), skip_xgb=args.skip_xgb,
+                           use_lstm=args.use_lstm, mc_paths=args.mc_paths, sarimax_auto=args.sarimax_auto,
+                           lstm_finetune=args.lstm_finetune, lstm_budget=args.lstm_budget,
+                           feature_set=args.feature_set, threads=args.threads, xgb_model=args.xgb_model)
+        return
+
+    print(f"\n--- Stock Pipeline for {ticker} (period={args.period}, horizons={','.join(map(str, horizons))}d) ---\n")
+    res = run_pipeline(ticker, args.period, horizons, skip_xgb=args.skip_xgb, use_lstm=args.use_lstm,
+                       mc_paths=args.mc_paths, sarimax_auto=args.sarimax_auto, lstm_finetune=args.lstm_finetune,
+                       lstm_budget=args.lstm_budget, feature_set=args.feature_set, deadline_seconds=args.deadline,
+                       threads=args.threads, sequential=args.sequential, sink=DiskSink(),
+                       write_report=args.run_report, xgb_model=args.xgb_model)
+    if any(isinstance(e, TimeoutError) for e in res.errors.values()):
+        # results are written; don't let interpreter shutdown join stages still running past the deadline
+        logging.shutdown()
+        sys.stdout.flush()
+        os._exit(0)
 
 if __name__ == "__main__":
     main()
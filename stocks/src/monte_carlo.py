@@ -0,0 +1,246 @@
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+import deadline
+from features import compute_features
+from fetch_data import read_raw
+from indicators import compute_indicators, parse_feature, warmup, DEFAULT_FEATURE_SET
+
+log = logging.getLogger(__name__)
+
+RAW_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'raw'))
+
+# Output column -> quantile. lower/upper_95ci match the SARIMAX result schema.
+QUANTILES = {
+    'lower_95ci': 0.025,
+    'q10':        0.10,
+    'q50':        0.50,
+    'q90':        0.90,
+    'upper_95ci': 0.975,
+}
+
+
+class PathFeatures:
+    """
+    Incremental, vectorized version of features.compute_features for many paths at once.
+    Keeps a (n_paths, lookback + horizon) close matrix plus EMA/RSI/MACD-signal states, so each
+    step only appends one column instead of recomputing indicators over the whole history.
+    Feature names are parsed with the indicators registry; names it does not know
+    (e.g. OHLCV columns) are 0.0, like unify_features.
+    """
+
+    def __init__(self, close: pd.Series, feature_names, n_paths: int, horizon: int):
+        self.feature_names = list(feature_names)
+        close = pd.to_numeric(close, errors='coerce').dropna()
+        if close.empty:
+            raise ValueError("PathFeatures needs a non-empty Close history")
+
+        self.specs = []  # (column index, kind, params)
+        spans, signals, rsi_periods = set(), set(), set()
+        for j, name in enumerate(self.feature_names):
+            try:
+                kind, params = parse_feature(name)
+            except KeyError:
+                continue
+            self.specs.append((j, kind, params))
+            if kind == 'ema':
+                spans.add(params[0])
+            elif kind == 'macd':
+                spans.update(params)
+            elif kind in ('macd_signal', 'macd_hist'):
+                spans.update(params[:2])
+                signals.add(params)
+            elif kind == 'rsi':
+                rsi_periods.add(params[0])
+
+        # seed the recursive states from the real history
+        hist = compute_indicators({'Close': close.values},
+                                  [f'ema_{w}' for w in spans] +
+                                  [f'macd_signal_{f}_{sl}_{g}' for f, sl, g in signals])
+        self._emas = {w: np.full(n_paths, float(hist[f'ema_{w}'][-1])) for w in spans}
+        self._signals = {k: np.full(n_paths, float(hist['macd_signal_{}_{}_{}'.format(*k)][-1])) for k in signals}
+        self._rsis = {p: self._init_rsi(close, p, n_paths) for p in rsi_periods}
+
+        # history needed to evaluate the longest lookback window at every step: the registry's
+        # warm-up (recursive EMA/RSI states need less, they are carried above)
+        known = [self.feature_names[j] for j, _, _ in self.specs]
+        lookback = min(len(close), max(warmup(known), 1) + 1)
+        self.lookback = lookback
+        self.closes = np.empty((n_paths, lookback + horizon), dtype=float)
+        self.closes[:, :lookback] = close.values[-lookback:]
+        self.t = lookback  # number of filled columns
+
+    @staticmethod
+    def _init_rsi(close: pd.Series, period: int, n_paths: int) -> dict:
+        delta = close.diff()
+        alpha = 1.0 / period  # ewm(com=period-1)
+        ma_up = delta.clip(lower=0).ewm(alpha=alpha, adjust=False).mean().iloc[-1]
+        ma_down = (-delta.clip(upper=0)).ewm(alpha=alpha, adjust=False).mean().iloc[-1]
+        last = 100 - 100 / (1 + ma_up / ma_down) if ma_down > 0 else 100.0
+        return {
+            'alpha': alpha,
+            'up':    np.full(n_paths, float(np.nan_to_num(ma_up))),
+            'down':  np.full(n_paths, float(np.nan_to_num(ma_down))),
+            'value': np.full(n_paths, float(np.nan_to_num(last))),
+        }
+
+    def _window(self, w: int) -> np.ndarray:
+        start = max(0, self.t - w)
+        return self.closes[:, start:self.t]
+
+    def _bands(self, w: int, k: float = 2.0):
+        win = self._window(w)
+        mid = win.mean(axis=1)
+        std = win.std(axis=1, ddof=1) if win.shape[1] > 1 else np.zeros(len(mid))
+        return mid, mid + k * std, mid - k * std
+
+    def matrix(self) -> np.ndarray:
+        """Feature rows (n_paths, n_features) for the latest close of every path."""
+        n_paths = self.closes.shape[0]
+        X = np.zeros((n_paths, len(self.feature_names)), dtype=float)
+        last = self.closes[:, self.t - 1]
+        for j, kind, params in self.specs:
+            if kind == 'ema':
+                X[:, j] = self._emas[params[0]]
+            elif kind == 'sma':
+                X[:, j] = self._window(params[0]).mean(axis=1)
+            elif kind == 'return':
+                prev = self.closes[:, max(0, self.t - 1 - params[0])]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    X[:, j] = np.nan_to_num(last / prev - 1.0)
+            elif kind == 'rsi':
+                X[:, j] = self._rsis[params[0]]['value']
+            elif kind == 'macd':
+                X[:, j] = self._emas[params[0]] - self._emas[params[1]]
+            elif kind == 'macd_signal':
+                X[:, j] = self._signals[params]
+            elif kind == 'macd_hist':
+                X[:, j] = self._emas[params[0]] - self._emas[params[1]] - self._signals[params]
+            elif kind in ('bb_upper', 'bb_lower', 'bb_width'):
+                mid, up, low = self._bands(params[0])
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    X[:, j] = {'bb_upper': up, 'bb_lower': low, 'bb_width': np.nan_to_num((up - low) / mid)}[kind]
+            elif kind == 'volatility':
+                win = self._window(params[0] + 1)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    rets = win[:, 1:] / win[:, :-1] - 1.0
+                X[:, j] = rets.std(axis=1, ddof=1) if rets.shape[1] > 1 else 0.0
+        return X
+
+    def push(self, new_close: np.ndarray):
+        """Append one simulated close per path and roll the indicator states forward."""
+        prev = self.closes[:, self.t - 1]
+        self.closes[:, self.t] = new_close
+        self.t += 1
+
+        for w, ema in self._emas.items():
+            alpha = 2.0 / (w + 1.0)
+            ema += alpha * (new_close - ema)
+
+        for (f, sl, g), sig in self._signals.items():
+            sig += (2.0 / (g + 1.0)) * (self._emas[f] - self._emas[sl] - sig)
+
+        delta = new_close - prev
+        for st in self._rsis.values():
+            a = st['alpha']
+            st['up'] += a * (np.clip(delta, 0, None) - st['up'])
+            st['down'] += a * (np.clip(-delta, 0, None) - st['down'])
+            ok = st['down'] > 0
+            # where there were no down moves compute_features ffills the previous RSI
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rsi = 100 - 100 / (1 + st['up'] / st['down'])
+            st['value'] = np.where(ok, rsi, st['value'])
+
+
+def holdout_residuals(model, scaler, feature_names, X_eval: pd.DataFrame, y_eval: pd.Series,
+                      X_train: pd.DataFrame = None, y_train: pd.Series = None,
+                      min_size: int = 20) -> np.ndarray:
+    """
+    One-step-ahead residuals y_{t+1} - f(X_t) on the holdout window, centred on their median.
+    This is how the recursive forecast uses the model (features of day t -> next close); the
+    same-row residual y_t - f(X_t) is much smaller because X_t already contains Close_t.
+    Falls back to adding training residuals when the holdout is too short to bootstrap
+    from; those are in-sample, so the bands come out too narrow and the run says so.
+    """
+    from utils import unify_features
+
+    def _resid(X, y):
+        if X is None or len(X) < 2:
+            return np.empty(0)
+        Xu = unify_features(X, feature_names)
+        Xs = pd.DataFrame(scaler.transform(Xu), index=Xu.index, columns=Xu.columns)
+        return np.asarray(y, dtype=float)[1:] - model.predict(Xs)[:-1]
+
+    res = _resid(X_eval, y_eval)
+    if len(res) < min_size:
+        deadline.note('xgb', 'train_residuals',
+                      f"{len(res)} holdout residuals < {min_size}; Monte Carlo bands use in-sample "
+                      f"train residuals and are too narrow")
+        res = np.concatenate([res, _resid(X_train, y_train)])
+    res = res[np.isfinite(res)]
+    if res.size == 0:
+        res = np.zeros(1)
+    # median, not mean: the first simulated step's median then equals the point forecast even
+    # for skewed residuals (later steps drift with the recursion either way)
+    return res - np.median(res)
+
+
+def simulate_xgb_paths(model, scaler, feature_names, close: pd.Series, residuals: np.ndarray,
+                       horizon: int, n_paths: int = 10000, seed: int = 42) -> np.ndarray:
+    """
+    Push n_paths bootstrapped residual sequences through the recursive XGB forecast.
+    All paths advance together: one scaler.transform + one model.predict per step.
+    Returns an array of simulated closes with shape (n_paths, horizon).
+    """
+    rng = np.random.default_rng(seed)
+    residuals = np.asarray(residuals, dtype=float)
+    state = PathFeatures(close, feature_names, n_paths, horizon)
+    draws = rng.integers(0, len(residuals), size=(n_paths, horizon))
+
+    paths = np.empty((n_paths, horizon), dtype=float)
+    for k in range(horizon):
+        X = pd.DataFrame(state.matrix(), columns=feature_names)
+        y_hat = model.predict(scaler.transform(X)).astype(float)
+        y_sim = y_hat + residuals[draws[:, k]]
+        paths[:, k] = y_sim
+        state.push(y_sim)
+    return paths
+
+
+def quantile_bands(paths: np.ndarray, quantiles: dict = QUANTILES) -> pd.DataFrame:
+    """Per-step quantiles of simulated paths; one row per horizon step."""
+    qs = np.quantile(paths, list(quantiles.values()), axis=0)
+    return pd.DataFrame(qs.T, columns=list(quantiles.keys()))
+
+
+if __name__ == '__main__':
+    import argparse
+    from utils import setup_logging
+    from artifacts import load_xgb_bundle
+    from train import load_train_eval
+
+    ap = argparse.ArgumentParser(description="Monte Carlo XGB forecast paths")
+    ap.add_argument('--ticker', required=True)
+    ap.add_argument('--horizon', type=int, default=30)
+    ap.add_argument('--paths', type=int, default=10000)
+    args = ap.parse_args()
+    setup_logging()
+
+    ticker = args.ticker.upper()
+    bundle = load_xgb_bundle(ticker)
+    model = bundle['model']; feature_names = bundle['feature_names']; scaler = bundle['scaler']
+    X_train, y_train, X_eval, y_eval = load_train_eval(ticker)
+    res = holdout_residuals(model, scaler, feature_names, X_eval, y_eval, X_train, y_train)
+
+    raw = read_raw(ticker, RAW_DIR)
+    feature_set = bundle.get('meta', {}).get('feature_set') or DEFAULT_FEATURE_SET
+    close = compute_features(raw[['Close']].copy(), feature_set=feature_set)['Close']
+
+    t0 = time.perf_counter()
+    paths = simulate_xgb_paths(model, scaler, feature_names, close, res, args.horizon, args.paths)
+    elapsed = time.perf_counter() - t0
+    log.info(quantile_bands(paths).to_string())
+    log.info(f"[✓] Simulated {args.paths} x {args.horizon} paths in {elapsed:.2f}s")
@@ -0,0 +1,232 @@
+import logging
+import os
+import json
+import time
+import warnings
+import itertools
+import threading
+import contextlib
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, cache updates are last-writer-wins
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+import deadline
+
+log = logging.getLogger(__name__)
+
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models'))
+CACHE_PATH = os.path.join(MODELS_DIR, 'sarimax_orders.json')
+LOCK_PATH  = CACHE_PATH + '.lock'
+
+DEFAULT_ORDER    = (1, 1, 1)
+DEFAULT_SEASONAL = (0, 0, 0, 0)
+
+# Bounded search space. Seasonal terms are only tried on the best non-seasonal orders.
+P_RANGE = (0, 1, 2)
+D_RANGE = (1,)
+Q_RANGE = (0, 1, 2)
+SEASONAL_P  = (0, 1)
+SEASONAL_D  = (0,)
+SEASONAL_Q  = (0, 1)
+SEASONAL_S  = 5           # business-day week
+KEEP_TOP    = 3           # non-seasonal survivors after pruning
+QUICK_ITER  = 25          # maxiter for the screening fits
+RESELECT_DAYS = int(os.environ.get('SARIMAX_RESELECT_DAYS', '7'))
+
+
+def _fit_candidate(y: np.ndarray, order, seasonal_order, criterion: str, maxiter: int, parent_params: dict = None):
+    """
+    Fit one candidate (runs in a worker process). parent_params, the fitted
+    params of a neighbouring order keyed by name (ar.L1, ma.L1, sigma2, ...),
+    seed start_params; terms the parent lacked start at 0.
+    Returns (order, seasonal_order, score, params_by_name) or score=inf on failure.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model = SARIMAX(y, order=order, seasonal_order=seasonal_order,
+                            enforce_stationarity=False, enforce_invertibility=False)
+            start = None
+            if parent_params:
+                start = np.array([parent_params.get(n, 0.0) for n in model.param_names])
+            res = model.fit(start_params=start, disp=False, maxiter=maxiter)
+        score = float(res.aic if criterion == 'aic' else res.bic)
+        if not np.isfinite(score):
+            score = float('inf')
+        return order, seasonal_order, score, dict(zip(model.param_names, map(float, res.params)))
+    except Exception:
+        return order, seasonal_order, float('inf'), {}
+
+
+def process_pool(max_workers: int = None) -> ProcessPoolExecutor:
+    """Worker pool for candidate fits. Spawned, not forked: callers such as the pipeline's
+    SARIMAX stage run in threads next to live BLAS/TF pools, which fork doesn't copy safely."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def search_order(y, criterion: str = 'aic', executor=None, max_workers: int = None) -> dict:
+    """
+    Two-stage bounded grid search by AIC/BIC:
+      1) screen every (p,d,q) with a short fit, in parallel;
+      2) prune to the KEEP_TOP best and try seasonal (P,D,Q,s) extensions of those,
+         warm-started from the parent order's parameters.
+    Without an executor, a pool of max_workers processes (default: all cores) is started;
+    max_workers=1 fits in this process instead.
+    """
+    y = np.asarray(pd.to_numeric(pd.Series(y), errors='coerce').dropna(), dtype=float)
+    own_pool = executor is None and max_workers != 1
+    if own_pool:
+        executor = process_pool(max_workers)
+    run = executor.map if executor is not None else map
+    try:
+        orders = list(itertools.product(P_RANGE, D_RANGE, Q_RANGE))
+        stage1 = list(run(_fit_candidate, *zip(*[
+            (y, o, DEFAULT_SEASONAL, criterion, QUICK_ITER, None) for o in orders
+        ])))
+        stage1 = [r for r in stage1 if np.isfinite(r[2])]
+        if not stage1:
+            return {'order': DEFAULT_ORDER, 'seasonal_order': DEFAULT_SEASONAL, 'score': None,
+                    'criterion': criterion, 'n_candidates': len(orders)}
+        stage1.sort(key=lambda r: r[2])
+        survivors = stage1[:KEEP_TOP]
+
+        jobs = []
+        if len(y) >= SEASONAL_S * 4:
+            for order, _, _, params in survivors:
+                for P, D, Q in itertools.product(SEASONAL_P, SEASONAL_D, SEASONAL_Q):
+                    if P == D == Q == 0:
+                        continue
+                    jobs.append((y, order, (P, D, Q, SEASONAL_S), criterion, QUICK_ITER * 2, params))
+        stage2 = list(run(_fit_candidate, *zip(*jobs))) if jobs else []
+
+        best = min(survivors + [r for r in stage2 if np.isfinite(r[2])], key=lambda r: r[2])
+    finally:
+        if own_pool:
+            executor.shutdown()
+
+    return {'order': tuple(best[0]), 'seasonal_order': tuple(best[1]), 'score': best[2],
+            'criterion': criterion, 'n_candidates': len(orders) + len(jobs)}
+
+
+def cache_key(ticker: str, y) -> str:
+    """Cache entry for ticker's series at its index frequency: callers resample Close
+    differently (business days vs the US holiday calendar) and need separate orders."""
+    freq = getattr(getattr(y, 'index', None), 'freqstr', None)
+    return f"{ticker}@{freq or 'raw'}"
+
+
+@contextlib.contextmanager
+def _cache_lock():
+    """Exclusive lock around a read-modify-write of the cache file (across processes)."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    with open(LOCK_PATH, 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _load_cache() -> dict:
+    if not os.path.exists(CACHE_PATH):
+        return {}
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache: dict):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    tmp = f"{CACHE_PATH}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp, CACHE_PATH)
+
+
+def _is_due(entry: dict, criterion: str, reselect_days: int) -> bool:
+    if not entry or entry.get('criterion') != criterion:
+        return True
+    selected = pd.Timestamp(entry['selected_at'])
+    return (pd.Timestamp.now(tz='UTC') - selected) >= pd.Timedelta(days=reselect_days)
+
+
+def select_order(ticker: str, y, criterion: str = 'aic', force: bool = False,
+                 reselect_days: int = RESELECT_DAYS, executor=None, max_workers: int = None,
+                 allow_search: bool = True):
+    """
+    Cached order for ticker's series (see cache_key); searches again when forced, when the
+    criterion changed or once reselect_days have passed since the last selection. With allow_search=False
+    (no time for a search) a stale cached order, or the default, is used instead.
+    Returns (order, seasonal_order).
+    """
+    key = cache_key(ticker, y)
+    entry = _load_cache().get(key)
+    if not force and not _is_due(entry, criterion, reselect_days):
+        return tuple(entry['order']), tuple(entry['seasonal_order'])
+    if not allow_search:
+        if entry:
+            deadline.note('sarimax', 'cached_order', f"stale order {entry['order']}x{entry['seasonal_order']}")
+            return tuple(entry['order']), tuple(entry['seasonal_order'])
+        deadline.note('sarimax', 'default_order', f"{DEFAULT_ORDER}x{DEFAULT_SEASONAL}")
+        return DEFAULT_ORDER, DEFAULT_SEASONAL
+
+    t0 = time.perf_counter()
+    found = search_order(y, criterion=criterion, executor=executor, max_workers=max_workers)
+    elapsed = time.perf_counter() - t0
+    log.info(f"[✓] SARIMAX order for {key}: {found['order']}x{found['seasonal_order']} "
+             f"({criterion}={found['score']}, {found['n_candidates']} candidates, {elapsed:.1f}s)")
+
+    with _cache_lock():
+        cache = _load_cache()  # re-read under the lock: other runs may have written meanwhile
+        cache[key] = {
+            'order': list(found['order']),
+            'seasonal_order': list(found['seasonal_order']),
+            'criterion': criterion,
+            'score': found['score'],
+            'n_obs': int(len(y)),
+            'selected_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        _save_cache(cache)
+    return found['order'], found['seasonal_order']
+
+
+def select_orders_watchlist(tickers, criterion: str = 'aic', force: bool = False, max_workers: int = None) -> dict:
+    """Nightly job: one shared process pool across the watchlist; only due tickers are searched."""
+    from preprocess import load_last_period
+    out = {}
+    with process_pool(max_workers) as pool:
+        for t in tickers:
+            try:
+                y = load_last_period(t, 365 * 50)['Close']
+            except FileNotFoundError:
+                log.warning(f"[!] No raw data for {t}; skip order selection.")
+                continue
+            out[t] = select_order(t, y, criterion=criterion, force=force, executor=pool)
+    return out
+
+
+if __name__ == '__main__':
+    import argparse
+    from utils import setup_logging
+    ap = argparse.ArgumentParser(description="SARIMAX order selection (cached per ticker)")
+    ap.add_argument('--tickers', nargs='+', required=True)
+    ap.add_argument('--criterion', choices=['aic', 'bic'], default='aic')
+    ap.add_argument('--force', action='store_true', help="Ignore the re-selection schedule")
+    ap.add_argument('--workers', type=int, default=None)
+    args = ap.parse_args()
+    setup_logging()
+    select_orders_watchlist([t.upper() for t in args.tickers], args.criterion, args.force, args.workers)
@@ -0,0 +1,379 @@
+"""
+In-process pipeline: run_pipeline(ticker, ...) -> PipelineResult.
+
+Stages hand DataFrames and fitted models to each other in memory; nothing is serialized
+unless a sink asks for it. DiskSink writes the files the CLI always has (data/raw,
+data/processed, models/, results/), so main.py is a thin wrapper:
+
+    from pipeline import run_pipeline
+    res = run_pipeline('AAPL', period='1y', horizons=[1, 5, 7])
+    res.forecast('ensemble', 5)
+
+Saved models are still read back when a deadline leaves no time to retrain, and the
+SARIMAX order cache and shared base LSTM live under models/ as before.
+"""
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+import deadline
+from fetch_data import fetch_history, load_cached_raw, _save_csv
+from preprocess import build_train_eval, save_train_eval
+from train import fit_xgb, save_xgb_bundle, split_xy, XGB_AVAILABLE, _XGB_IMPORT_ERROR
+from evaluate import score_xgb, save_eval_results
+from predict_xgb import xgb_forecast_frame
+from sarimax_forecast import sarimax_forecast_frame
+from ensemble import average_forecasts
+from utils import ensure_dirs, save_forecast
+from indicators import DEFAULT_FEATURE_SET
+from stage_executor import ThreadBudget, run_stages, report_stage_overlap
+from deadline import Deadline, DegradationLog, MIN_SECONDS
+from artifacts import has_model, load_xgb_bundle
+from global_xgb import GLOBAL_TICKER, load_global_bundle, forecast_global
+
+log = logging.getLogger(__name__)
+
+MODELS = ('xgb', 'sarimax', 'lstm')
+
+
+class Sink:
+    """Where a run persists its intermediates. The base class keeps everything in memory."""
+
+    def cached_raw(self, ticker: str, ttl_seconds: float = None):
+        """Previously stored raw frame to reuse instead of fetching, or None."""
+        return None
+
+    def raw(self, ticker: str, df: pd.DataFrame):
+        pass
+
+    def processed(self, ticker: str, train_df: pd.DataFrame, eval_df: pd.DataFrame):
+        pass
+
+    def xgb_model(self, ticker: str, bundle: dict):
+        pass
+
+    def lstm_model(self, ticker: str, model, scaler, meta: dict):
+        pass
+
+    def metrics(self, ticker: str, metrics: dict):
+        pass
+
+    def forecast(self, ticker: str, model: str, out: pd.DataFrame, horizons):
+        pass
+
+    def report(self, ticker: str, report: dict):
+        pass
+
+
+class DiskSink(Sink):
+    """The CLI's on-disk layout. RAW_TTL_SECONDS > 0 reuses a raw CSV younger than that."""
+
+    def __init__(self):
+        ensure_dirs()
+
+    def cached_raw(self, ticker, ttl_seconds=None):
+        if ttl_seconds is None:
+            ttl_seconds = int(os.environ.get("RAW_TTL_SECONDS", "0"))  # default off
+            if ttl_seconds <= 0:
+                return None
+        return load_cached_raw(ticker, ttl_seconds)
+
+    def raw(self, ticker, df):
+        _save_csv(ticker, df)
+
+    def processed(self, ticker, train_df, eval_df):
+        save_train_eval(ticker, train_df, eval_df)
+
+    def xgb_model(self, ticker, bundle):
+        save_xgb_bundle(ticker, bundle)
+
+    def lstm_model(self, ticker, model, scaler, meta):
+        from train_lstm import save_lstm_model
+        save_lstm_model(ticker, model, scaler, meta)
+
+    def metrics(self, ticker, metrics):
+        save_eval_results(ticker, metrics)
+
+    def forecast(self, ticker, model, out, horizons):
+        for h, path in save_forecast(out, ticker, model, horizons).items():
+            log.info(f"[✓] {model} {h}-day forecast saved to {path}")
+
+    def report(self, ticker, report):
+        path = deadline.write_run_report(ticker, report)
+        log.info(f"[✓] Run report ({len(report['degraded'])} degradations) saved to {path}")
+
+
+@dataclass
+class PipelineResult:
+    """Everything one run produced, in memory. Forecasts run out to max(horizons)."""
+    ticker: str
+    horizons: list
+    raw: pd.DataFrame = None
+    train: pd.DataFrame = None
+    eval: pd.DataFrame = None
+    models: dict = field(default_factory=dict)      # 'xgb' -> bundle, 'lstm' -> (model, scaler, meta)
+    metrics: dict = None                            # XGB holdout MSE/MAE
+    forecasts: dict = field(default_factory=dict)   # model -> DataFrame (date, ticker, forecast_close, ...)
+    ensemble: pd.DataFrame = None
+    timings: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    report: dict = None
+
+    @property
+    def degraded(self) -> list:
+        return self.report['degraded'] if self.report else []
+
+    def forecast(self, model: str = 'ensemble', horizon: int = None) -> pd.DataFrame:
+        """First `horizon` rows of a model's forecast (default: the longest horizon)."""
+        out = self.ensemble if model == 'ensemble' else self.forecasts.get(model)
+        if out is None:
+            return None
+        return out.iloc[:horizon or max(self.horizons)].reset_index(drop=True)
+
+
+def thread_shares(threads: int = None, use_lstm: bool = False, sequential: bool = False):
+    """(ThreadBudget, threads per model stage) for one run."""
+    budget = ThreadBudget(threads)
+    if sequential:
+        return budget, {'sarimax': budget.total, 'xgb': budget.total, 'lstm': budget.total}
+    return budget, budget.split({'sarimax': 1, 'xgb': 2, 'lstm': 2 if use_lstm else 0})
+
+
+def run_pipeline(ticker: str, period: str = '6mo', horizons=(7,), raw: pd.DataFrame = None,
+                 skip_xgb: bool = False, use_lstm: bool = False, mc_paths: int = 0,
+                 sarimax_auto: bool = False, lstm_finetune: bool = False, lstm_budget: float = None,
+                 feature_set: str = DEFAULT_FEATURE_SET, deadline_seconds: float = None,
+                 threads: int = None, sequential: bool = False, sink: Sink = None,
+                 write_report: bool = False, xgb_model: str = 'ticker') -> PipelineResult:
+    """
+    Fetch (or take `raw`), preprocess, train/forecast XGB, SARIMAX and optionally LSTM,
+    and average them. xgb_model='global' forecasts XGB with the shared cross-ticker
+    model (global_xgb.py) instead of training one for this ticker. Every stage reads its inputs from the previous stage's return value;
+    `sink` (e.g. DiskSink()) decides what, if anything, is written along the way; the run
+    report goes to the sink when a deadline is set, something degraded, or write_report.
+    Raises if the raw data can't be obtained; any other stage failure is recorded in
+    result.errors and the run continues without it.
+    """
+    sink = sink or Sink()
+    # Fit/train once at the longest horizon; every shorter horizon is a slice of it.
+    horizons = sorted({int(h) for h in horizons})
+    horizon = max(horizons)
+    res = PipelineResult(ticker=ticker, horizons=horizons)
+
+    # One thread budget for the whole run; concurrent stages split it instead of each
+    # grabbing every core (XGB n_jobs, order-search workers). Process-wide BLAS/TF limits
+    # are the entry point's job (stage_executor.configure_process), not this function's.
+    budget, shares = thread_shares(threads, use_lstm, sequential)
+    log.info(f"[i] Thread budget {budget.total}: {shares}{' (sequential)' if sequential else ''}")
+
+    # Time budget: each stage gets a share of the deadline; over-budget stages are skipped,
+    # cut short or served from cache, and every such decision lands in the run report.
+    dl = Deadline(deadline_seconds)
+    dlog = DegradationLog()
+    token = deadline.activate(dlog)
+
+    closed = threading.Event()  # set once the ensemble is built; late (timed-out) stages publish nothing
+
+    def publish(model, out):
+        if closed.is_set():
+            log.info(f"[i] {model} finished after the deadline; forecast discarded")
+            return
+        res.forecasts[model] = out
+        sink.forecast(ticker, model, out, horizons)
+
+    def fetch():
+        log.info("[1/7] Fetching raw data...")
+        if raw is not None:
+            res.raw = raw
+            return True
+        res.raw = sink.cached_raw(ticker)
+        if res.raw is not None:
+            return True
+        try:
+            res.raw = fetch_history(ticker, period, max_seconds=dl.stage_budget('fetch'))
+        except Exception as e:
+            stale = sink.cached_raw(ticker, float('inf')) if deadline_seconds is not None else None
+            if stale is None:
+                raise
+            dlog.note('fetch', 'cached_raw', f"fetch failed within budget ({e}); using stored raw")
+            res.raw = stale
+            return True
+        sink.raw(ticker, res.raw)
+        return True
+
+    def preprocess():
+        log.info("[2/7] Preprocessing data...")
+        res.train, res.eval = build_train_eval(res.raw, period, feature_set=feature_set)
+        sink.processed(ticker, res.train, res.eval)
+        return True
+
+    def xgb():
+        # 3) Train XGB
+        if skip_xgb:
+            log.info("[3/7] Skipping XGB training by flag.")
+            return False
+        if not XGB_AVAILABLE:
+            log.warning(f"[!] XGBoost not available; skipping. Reason: {_XGB_IMPORT_ERROR}")
+            return False
+        if xgb_model == 'global':
+            log.info("[3/7] Using the global XGB model (no per-ticker training).")
+            if not has_model(GLOBAL_TICKER, 'xgb'):
+                dlog.note('xgb', 'skipped', "no global model; run global_xgb.py --train")
+                return False
+            bundle = res.models['xgb'] = load_global_bundle(n_jobs=shares['xgb'])
+            if mc_paths:
+                log.info("[i] Monte Carlo bands need a per-ticker model; global forecast is a point forecast.")
+            log.info("[6/7] Generating global XGB forecast...")
+            out = forecast_global({ticker: res.raw}, horizon, bundle).get(ticker)
+            if out is None:
+                return False
+            publish('xgb', out)
+            return True
+        log.info("[3/7] Training XGBoost model...")
+        xy = split_xy(res.train, res.eval)
+        if dl.stage_remaining('xgb') < MIN_SECONDS['xgb_train']:
+            if not has_model(ticker, 'xgb'):
+                dlog.note('xgb', 'skipped', "no time to train and no cached model")
+                return False
+            dlog.note('xgb', 'cached_model', "no time to retrain")
+            bundle = load_xgb_bundle(ticker)
+        else:
+            bundle = fit_xgb(ticker, *xy, n_jobs=shares['xgb'], feature_set=feature_set,
+                             max_seconds=dl.stage_budget('xgb'))
+            if bundle is None:
+                log.info("[ ] Skipped evaluation (no XGB model).")
+                return False
+            sink.xgb_model(ticker, bundle)
+
+            # 4) Evaluate XGB
+            log.info("[4/7] Evaluating XGBoost model...")
+            if dl.stage_remaining('xgb') < MIN_SECONDS['xgb_eval']:
+                dlog.note('xgb', 'skipped_eval', "out of stage budget")
+            else:
+                res.metrics = score_xgb(ticker, bundle, res.eval)
+                if res.metrics:
+                    sink.metrics(ticker, res.metrics)
+        res.models['xgb'] = bundle
+
+        # 6) Forecast XGB (recursive)
+        log.info("[6/7] Generating XGB forecast...")
+        n_paths = mc_paths
+        if n_paths and dl.stage_remaining('xgb') < MIN_SECONDS['mc']:
+            dlog.note('xgb', 'skipped_mc', f"{n_paths} Monte Carlo paths dropped, point forecast only")
+            n_paths = 0
+        publish('xgb', xgb_forecast_frame(ticker, res.raw, bundle, horizon, n_paths=n_paths,
+                                          n_jobs=shares['xgb'], train_eval=xy))
+        return True
+
+    def sarimax():
+        # 5) Forecast SARIMAX
+        log.info("[5/7] Generating SARIMAX forecast...")
+        publish('sarimax', sarimax_forecast_frame(ticker, res.raw, horizon, auto_order=sarimax_auto,
+                                                  max_seconds=dl.stage_budget('sarimax'), n_jobs=shares['sarimax']))
+        return True
+
+    def lstm():
+        # 7) LSTM (optional)
+        log.info("[7/7] Training + forecasting LSTM...")
+        try:
+            from train_lstm import fit_lstm, close_frame
+            from predict_lstm import load_lstm, lstm_forecast_frame
+        except Exception as e:
+            log.warning(f"[!] LSTM unavailable: {e}")
+            return False
+        left = dl.stage_remaining('lstm')
+        if left < MIN_SECONDS['lstm_train']:
+            if not has_model(ticker, 'lstm'):
+                dlog.note('lstm', 'skipped', "no time to train and no cached model")
+                return False
+            fitted = load_lstm(ticker)
+            cached_horizon = int(fitted[2]['horizon']) if fitted is not None else 0
+            if fitted is not None and cached_horizon < horizon:
+                # its forecast would cut the ensemble (an inner join on dates) to cached_horizon rows
+                dlog.note('lstm', 'skipped', f"no time to train; cached model forecasts {cached_horizon} "
+                                             f"days < {horizon}")
+                return False
+            dlog.note('lstm', 'cached_model', "no time to retrain")
+        else:
+            # leave a slice of the stage budget for the forecast itself
+            max_seconds = None if left == float('inf') else left * 0.8
+            if lstm_budget is not None:
+                max_seconds = lstm_budget if max_seconds is None else min(max_seconds, lstm_budget)
+            try:
+                fitted = fit_lstm(ticker, close_frame(res.raw), horizon=horizon, finetune=lstm_finetune,
+                                  max_seconds=max_seconds)
+            except Exception as e:
+                log.warning(f"[!] LSTM training failed: {e}")
+                fitted = None
+            if fitted is not None:
+                sink.lstm_model(ticker, *fitted)
+        if fitted is None:
+            return False
+        res.models['lstm'] = fitted
+        publish('lstm', lstm_forecast_frame(ticker, res.raw, *fitted))
+        return True
+
+    # SARIMAX, XGB and LSTM only share the raw input, so they run side by side.
+    stages = {
+        'fetch':      (fetch, ()),
+        'preprocess': (preprocess, ('fetch',)),
+        'sarimax':    (sarimax, ('fetch',)),
+        'xgb':        (xgb, ('preprocess',)),
+    }
+    if use_lstm:
+        stages['lstm'] = (lstm, ('fetch',))
+
+    try:
+        t0 = time.perf_counter()
+        results, res.timings, res.errors = run_stages(stages, sequential=sequential, deadline=dl)
+        if 'fetch' in res.errors:
+            raise res.errors['fetch']
+        for name, err in res.errors.items():
+            if str(err).startswith('skipped: deadline'):
+                dlog.note(name, 'skipped', str(err))
+            elif isinstance(err, TimeoutError):
+                dlog.note(name, 'timed_out', str(err))
+
+        # Ensemble (average the models that produced a forecast in this run)
+        log.info("[-->] Creating stacked ensemble forecast...")
+        closed.set()
+        finished = [m for m in MODELS if results.get(m)]
+        res.ensemble = average_forecasts(ticker, {m: res.forecasts[m] for m in finished})
+        if res.ensemble is not None:
+            sink.forecast(ticker, 'ensemble', res.ensemble, horizons)
+        report_stage_overlap(ticker, res.timings, time.perf_counter() - t0)
+        res.report = deadline.build_run_report(ticker, dl, dlog, res.timings, res.errors, finished, horizons)
+        if write_report or deadline_seconds is not None or dlog.events:
+            sink.report(ticker, res.report)
+    finally:
+        deadline.deactivate(token)
+    return res
+
+
+def compare_sequential(ticker: str, period: str = '6mo', raw: pd.DataFrame = None, sink: Sink = None,
+                       **kwargs) -> dict:
+    """
+    Per-ticker wall-clock speedup of running the model stages concurrently: the same run (same
+    raw input and options) once concurrently and once with sequential=True. Raw is fetched once
+    up front so neither run pays for the network. The concurrent run goes first and writes to
+    `sink`; the sequential run keeps its outputs in memory. Whichever runs second gets warm
+    caches (imports, the SARIMAX order cache), so the reported speedup is a lower bound.
+    """
+    sink = sink or Sink()
+    if raw is None:
+        raw = fetch_history(ticker, period)
+        sink.raw(ticker, raw)
+    walls = {}
+    for mode, sequential, run_sink in (('concurrent', False, sink), ('sequential', True, Sink())):
+        t0 = time.perf_counter()
+        run_pipeline(ticker, period, raw=raw, sequential=sequential, sink=run_sink, **kwargs)
+        walls[mode] = time.perf_counter() - t0
+    speedup = walls['sequential'] / walls['concurrent'] if walls['concurrent'] > 0 else 1.0
+    log.info(f"[✓] {ticker}: sequential {walls['sequential']:.2f}s / concurrent {walls['concurrent']:.2f}s "
+             f"= {speedup:.2f}x speedup")
+    return {'ticker': ticker, 'sequential_seconds': walls['sequential'],
+            'concurrent_seconds': walls['concurrent'], 'speedup': speedup}
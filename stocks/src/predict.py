@@ -10,13 +10,15 @@ from pandas.tseries.holiday import USFederalHolidayCalendar
 from pandas.tseries.offsets import CustomBusinessDay
 
 from preprocess import parse_period_to_days, load_last_period
+from order_selection import select_order
+from utils import setup_logging
 
 # Paths
 BASE_DIR    = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 RESULTS_DIR = os.path.join(BASE_DIR, 'results')
 
 
-def forecast_sarimax(ticker: str, period: str, horizon: int):
+def forecast_sarimax(ticker: str, period: str, horizon: int, auto_order: bool = False):
     # 1) Load raw history (no weekends/holidays) and get Close series
     days = parse_period_to_days(period)
     df = load_last_period(ticker, days)
@@ -41,10 +43,14 @@ def forecast_sarimax(ticker: str, period: str, horizon: int):
     else:
         seasonal = (1, 1, 1, seasonal_period)
 
+    order = (1, 1, 1)
+    if auto_order:
+        order, seasonal = select_order(ticker, ts)
+
     # 4) Fit the SARIMAX (or ARIMA) model
     model = SARIMAX(
         ts,
-        order=(1, 1, 1),
+        order=order,
         seasonal_order=seasonal,
         enforce_stationarity=False,
         enforce_invertibility=False
@@ -82,5 +88,7 @@ if __name__ == '__main__':
     p.add_argument('--ticker',  required=True, help="Ticker symbol (e.g. AAPL)")
     p.add_argument('--period',  default='6mo',  help="Look-back window (e.g. 6mo, 1y)")
     p.add_argument('--horizon', type=int, default=7,    help="Days to forecast")
+    p.add_argument('--auto_order', action='store_true', help="Use cached/auto-selected SARIMAX order")
     args = p.parse_args()
-    forecast_sarimax(args.ticker, args.period, args.horizon)
+    setup_logging()
+    forecast_sarimax(args.ticker, args.period, args.horizon, auto_order=args.auto_order)
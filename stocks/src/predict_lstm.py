@@ -1,26 +1,40 @@
+import logging
 import os
 import joblib
 import numpy as np
 import pandas as pd
 from tensorflow.keras.models import load_model
 
-from utils import RESULTS_DIR, safe_ticker, next_trading_days
+from fetch_data import read_raw
+from utils import RESULTS_DIR, safe_ticker, next_trading_days, save_forecast
+from artifacts import artifact_exists, load_lstm_artifact, warn_legacy
+
+log = logging.getLogger(__name__)
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 RAW_DIR  = os.path.join(BASE_DIR, 'data', 'raw')
 
-def forecast_lstm(ticker: str, horizon: int = 7) -> pd.DataFrame:
+def load_lstm(ticker: str):
+    """Saved (model, scaler, meta) for ticker, or None when missing or too old to forecast with."""
     model_path = os.path.join(BASE_DIR, 'models', f"{ticker}_lstm.keras")
     meta_path  = os.path.join(BASE_DIR, 'models', f"{ticker}_lstm.pkl")
-    if not (os.path.exists(model_path) and os.path.exists(meta_path)):
-        print("[!] LSTM model or meta not found; skip.")
+    if artifact_exists(ticker, 'lstm'):
+        data = load_lstm_artifact(ticker)
+        model_path = data['model_path']
+    elif os.path.exists(model_path) and os.path.exists(meta_path):
+        warn_legacy(meta_path)
+        data = joblib.load(meta_path)
+    else:
+        log.warning("[!] LSTM model or meta not found; skip.")
         return None
+    if 'window' not in data['meta']:
+        log.warning("[!] Legacy LSTM artifact without window/horizon meta; retrain it. Skip.")
+        return None
+    return load_model(model_path), data['scaler'], data['meta']
 
-    model = load_model(model_path)
-    data = joblib.load(meta_path)
-    scaler = data['scaler']; window = int(data['meta']['window']); horizon = int(data['meta']['horizon'])
-
-    raw = pd.read_csv(os.path.join(RAW_DIR, f"{ticker}.csv"), parse_dates=['Date'], index_col='Date')
+def lstm_forecast_frame(ticker: str, raw: pd.DataFrame, model, scaler, meta: dict) -> pd.DataFrame:
+    """Forecast the model's own horizon from the last `window` closes of raw."""
+    window = int(meta['window']); horizon = int(meta['horizon'])
     close = pd.to_numeric(raw['Close'], errors='coerce').dropna().to_frame('Close')
     scaled = scaler.transform(close.values)
 
@@ -39,9 +53,16 @@ def forecast_lstm(ticker: str, horizon: int = 7) -> pd.DataFrame:
     dates = next_trading_days(last_date, horizon)
     out = pd.DataFrame({'date': dates, 'ticker': ticker, 'lstm_pred': y_hat})
     out.rename(columns={'lstm_pred':'forecast_close'}, inplace=True)
+    return out
+
+def forecast_lstm(ticker: str, horizon: int = 7, horizons=None) -> pd.DataFrame:
+    """Forecast with the model's own horizon head; with horizons, write one sliced file per horizon."""
+    loaded = load_lstm(ticker)
+    if loaded is None:
+        return None
+    raw = read_raw(ticker, RAW_DIR)
+    out = lstm_forecast_frame(ticker, raw, *loaded)
 
-    safe = safe_ticker(ticker)
-    out_path = os.path.join(RESULTS_DIR, f"{safe}_lstm_{horizon}d.csv")
-    out.to_csv(out_path, index=False)
-    print(f"[✓] LSTM {horizon}-day forecast saved to {out_path}")
+    for h, out_path in save_forecast(out, ticker, 'lstm', horizons or [len(out)]).items():
+        log.info(f"[✓] LSTM {h}-day forecast saved to {out_path}")
     return out
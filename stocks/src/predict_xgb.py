@@ -1,26 +1,34 @@
+import logging
 import os
 import joblib
 import numpy as np
 import pandas as pd
 
 from features import compute_features, feature_columns
-from utils import RESULTS_DIR, safe_ticker, unify_features, next_trading_days
+from fetch_data import read_raw_csv
+from indicators import DEFAULT_FEATURE_SET
+from utils import RESULTS_DIR, safe_ticker, unify_features, next_trading_days, save_forecast
+from artifacts import load_xgb_bundle
+from monte_carlo import holdout_residuals, simulate_xgb_paths, quantile_bands
+
+log = logging.getLogger(__name__)
 
 RAW_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'raw'))
 
-def forecast_xgb(ticker: str, period: str, horizon: int = 7) -> pd.DataFrame:
+def xgb_forecast_frame(ticker: str, raw: pd.DataFrame, bundle: dict, horizon: int = 7, n_paths: int = 0,
+                       n_jobs: int = None, train_eval=None) -> pd.DataFrame:
     """
-    Recompute features on the latest raw window, then recursively predict Close for next N trading days.
-    Saves results/{SAFE_TICKER}_xgb_{horizon}d.csv and returns the DataFrame.
+    Recompute features on raw (needs a Close column), then recursively predict Close for the next
+    `horizon` trading days with an in-memory bundle. With n_paths > 0, also simulates that many
+    residual-bootstrapped paths and adds quantile bands; the residuals come from train_eval
+    ((X_train, y_train, X_eval, y_eval), read from data/processed when not given).
     """
-    raw_path = os.path.join(RAW_DIR, f"{ticker}.csv")
-    df_raw = pd.read_csv(raw_path, parse_dates=['Date'], index_col='Date')
-    df_raw = df_raw[['Close']].copy()
-    feat = compute_features(df_raw)
-
-    # Load model bundle
-    bundle = joblib.load(os.path.join(os.path.dirname(RESULTS_DIR), 'models', f"{ticker}_model.pkl"))
+    df_raw = raw[['Close']].copy()
     model = bundle['model']; feature_names = bundle['feature_names']; scaler = bundle['scaler']
+    feature_set = bundle.get('meta', {}).get('feature_set') or DEFAULT_FEATURE_SET
+    feat = compute_features(df_raw, feature_set=feature_set)
+    if n_jobs is not None:
+        model.set_params(n_jobs=n_jobs)
 
     last_date = feat.index[-1]
     pred_dates = next_trading_days(last_date, horizon)
@@ -37,12 +45,35 @@ def forecast_xgb(ticker: str, period: str, horizon: int = 7) -> pd.DataFrame:
         # append synthetic row with predicted close to continue features
         new_row = pd.DataFrame({'Close': [y_hat]}, index=[d])
         working = pd.concat([working[['Close']], new_row]).sort_index()
-        working = compute_features(working)  # recompute indicators with appended close
+        working = compute_features(working, feature_set=feature_set)  # recompute indicators with appended close
 
     out = pd.DataFrame(preds, columns=['date','forecast_close'])
     out['ticker'] = ticker
-    safe = safe_ticker(ticker)
-    out_path = os.path.join(RESULTS_DIR, f"{safe}_xgb_{horizon}d.csv")
-    out.to_csv(out_path, index=False)
-    print(f"[✓] XGB {horizon}-day forecast saved to {out_path}")
+
+    if n_paths > 0:
+        if train_eval is None:
+            from train import load_train_eval
+            train_eval = load_train_eval(ticker)
+        X_train, y_train, X_eval, y_eval = train_eval
+        residuals = holdout_residuals(model, scaler, feature_names, X_eval, y_eval, X_train, y_train)
+        paths = simulate_xgb_paths(model, scaler, feature_names, feat['Close'], residuals, horizon, n_paths)
+        bands = quantile_bands(paths)
+        out = pd.concat([out, bands], axis=1)
+        log.info(f"[✓] Simulated {n_paths} XGB paths ({len(residuals)} bootstrapped residuals)")
+    return out
+
+def forecast_xgb(ticker: str, period: str, horizon: int = 7, n_paths: int = 0, n_jobs: int = None,
+                 horizons=None) -> pd.DataFrame:
+    """
+    xgb_forecast_frame on data/raw with the saved model bundle.
+    Saves results/{SAFE_TICKER}_xgb_{horizon}d.csv and returns the DataFrame. With horizons,
+    runs the recursion once to max(horizons) and saves one file per horizon.
+    """
+    horizons = sorted(set(horizons or [horizon]))
+    raw_path = os.path.join(RAW_DIR, f"{ticker}.csv")
+    df_raw = read_raw_csv(raw_path)
+    out = xgb_forecast_frame(ticker, df_raw, load_xgb_bundle(ticker), max(horizons), n_paths=n_paths, n_jobs=n_jobs)
+
+    for h, out_path in save_forecast(out, ticker, 'xgb', horizons).items():
+        log.info(f"[✓] XGB {h}-day forecast saved to {out_path}")
     return out
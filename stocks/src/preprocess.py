@@ -1,8 +1,13 @@
+import logging
 import os
 from datetime import timedelta
 import pandas as pd
 
 from features import compute_features
+from fetch_data import read_raw, read_raw_csv
+from indicators import DEFAULT_FEATURE_SET
+
+log = logging.getLogger(__name__)
 
 RAW_DIR  = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'raw'))
 PROC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'processed'))
@@ -16,12 +21,11 @@ def parse_period_to_days(period: str) -> int:
         return int(p[:-1]) * 365
     return int(p)
 
-def load_last_period(ticker: str, period_days: int) -> pd.DataFrame:
-    path = os.path.join(RAW_DIR, f"{ticker}.csv")
-    df = pd.read_csv(path, parse_dates=['Date'], index_col='Date')
+def clean_last_period(df: pd.DataFrame, period_days: int) -> pd.DataFrame:
+    """OHLCV columns as numbers, NA rows dropped, cropped to the last period_days."""
     # keep only needed columns
     keep = [c for c in ['Open','High','Low','Close','Volume'] if c in df.columns]
-    df = df[keep]
+    df = df[keep].copy()
     # numeric
     for c in keep:
         df[c] = pd.to_numeric(df[c], errors='coerce')
@@ -30,6 +34,11 @@ def load_last_period(ticker: str, period_days: int) -> pd.DataFrame:
     start = end - timedelta(days=period_days)
     return df.loc[start:end]
 
+def load_last_period(ticker: str, period_days: int) -> pd.DataFrame:
+    path = os.path.join(RAW_DIR, f"{ticker}.csv")
+    df = read_raw_csv(path)
+    return clean_last_period(df, period_days)
+
 def split_train_eval_chrono(df: pd.DataFrame, train_frac: float = 0.8):
     """Chronological split: first 80% train, last 20% eval."""
     if df.empty:
@@ -40,25 +49,34 @@ def split_train_eval_chrono(df: pd.DataFrame, train_frac: float = 0.8):
     eval_ = df.iloc[cut:].copy()
     return train, eval_
 
-def process_ticker(ticker: str, period: str = '6mo'):
-    period_days = parse_period_to_days(period)
-    raw = load_last_period(ticker, period_days)
-    feat = compute_features(raw)
-
-    train_df, eval_df = split_train_eval_chrono(feat, train_frac=0.8)
+def build_train_eval(raw: pd.DataFrame, period: str = '6mo', feature_set: str = DEFAULT_FEATURE_SET):
+    """In-memory preprocessing: features on the last `period` of raw, split 80/20 chronologically."""
+    feat = compute_features(clean_last_period(raw, parse_period_to_days(period)), feature_set=feature_set)
+    return split_train_eval_chrono(feat, train_frac=0.8)
 
+def save_train_eval(ticker: str, train_df: pd.DataFrame, eval_df: pd.DataFrame):
     train_path = os.path.join(PROC_DIR, f"{ticker}_train.csv")
     eval_path  = os.path.join(PROC_DIR, f"{ticker}_eval.csv")
     train_df.to_csv(train_path)
     eval_df.to_csv(eval_path)
 
-    print(f"[✓] {ticker}: train rows={len(train_df)} → {train_path}")
-    print(f"[✓] {ticker}: eval rows ={len(eval_df)} → {eval_path}")
+    log.info(f"[✓] {ticker}: train rows={len(train_df)} → {train_path}")
+    log.info(f"[✓] {ticker}: eval rows ={len(eval_df)} → {eval_path}")
+    return train_path, eval_path
+
+def process_ticker(ticker: str, period: str = '6mo', feature_set: str = DEFAULT_FEATURE_SET):
+    raw = read_raw(ticker, RAW_DIR)
+    train_df, eval_df = build_train_eval(raw, period, feature_set)
+    save_train_eval(ticker, train_df, eval_df)
+    return train_df, eval_df
 
 if __name__ == '__main__':
     import argparse
+    from utils import setup_logging
     ap = argparse.ArgumentParser(description="Preprocess data and split 80/20")
     ap.add_argument('--ticker', required=True)
     ap.add_argument('--period', default='6mo')
+    ap.add_argument('--feature_set', default=DEFAULT_FEATURE_SET)
     args = ap.parse_args()
-    process_ticker(args.ticker, args.period)
+    setup_logging()
+    process_ticker(args.ticker, args.period, args.feature_set)
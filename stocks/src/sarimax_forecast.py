@@ -1,48 +1,72 @@
+import logging
 import os
 import warnings
 import numpy as np
 import pandas as pd
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 
-from utils import RESULTS_DIR, safe_ticker, next_trading_days
+from fetch_data import read_raw_csv
+from utils import RESULTS_DIR, safe_ticker, next_trading_days, save_forecast
+from order_selection import select_order
+
+log = logging.getLogger(__name__)
+
+SEARCH_MIN_SECONDS = 15  # rough cost of a full order search on one CPU
 
 RAW_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'raw'))
 
-def forecast_sarimax(ticker: str, period: str, horizon: int = 7) -> pd.DataFrame:
+def sarimax_forecast_frame(ticker: str, raw: pd.DataFrame, horizon: int = 7, auto_order: bool = False,
+                           max_seconds: float = None, n_jobs: int = None) -> pd.DataFrame:
     """
-    Fit a simple SARIMAX on Close and forecast next N trading days.
+    Fit a simple SARIMAX on raw Close and forecast next N trading days.
+    With auto_order, use the cached per-ticker order from order_selection (searching if due).
+    With max_seconds, skip the order search when it can't fit (see SEARCH_MIN_SECONDS).
+    n_jobs caps the order search's worker processes (default: all cores).
     """
-    path = os.path.join(RAW_DIR, f"{ticker}.csv")
-    df = pd.read_csv(path, parse_dates=['Date'], index_col='Date')
+    df = raw
     y = pd.to_numeric(df['Close'], errors='coerce').dropna()
 
     if len(y) < 15:
         warnings.warn("Too few rows for SARIMAX; returning flat forecast.")
         last = float(y.iloc[-1]) if len(y) else 0.0
         dates = next_trading_days(df.index.max(), horizon)
-        out = pd.DataFrame({'date': dates, 'ticker': ticker, 'forecast_close': [last]*horizon})
-    else:
-        # make index have freq so statsmodels won't warn
-        y = y.asfreq('B')  # business daily
-        y = y.ffill()
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            model = SARIMAX(y, order=(1,1,1), seasonal_order=(0,0,0,0), enforce_stationarity=False, enforce_invertibility=False)
-            res = model.fit(disp=False)
-            fcast = res.get_forecast(steps=horizon)
-            mean = fcast.predicted_mean
-            conf = fcast.conf_int(alpha=0.05)
-        dates = next_trading_days(df.index.max(), horizon)
-        out = pd.DataFrame({
-            'date': dates,
-            'ticker': ticker,
-            'forecast_close': mean.values
-        })
-        out['lower_95ci'] = conf.iloc[:,0].values
-        out['upper_95ci'] = conf.iloc[:,1].values
-
-    safe = safe_ticker(ticker)
-    out_path = os.path.join(RESULTS_DIR, f"{safe}_sarimax_{horizon}d.csv")
-    out.to_csv(out_path, index=False)
-    print(f"[✓] SARIMAX {horizon}-day forecast saved to {out_path}")
+        return pd.DataFrame({'date': dates, 'ticker': ticker, 'forecast_close': [last]*horizon})
+
+    # make index have freq so statsmodels won't warn
+    y = y.asfreq('B')  # business daily
+    y = y.ffill()
+    order, seasonal = (1,1,1), (0,0,0,0)
+    if auto_order:
+        allow_search = max_seconds is None or max_seconds >= SEARCH_MIN_SECONDS
+        order, seasonal = select_order(ticker, y, allow_search=allow_search, max_workers=n_jobs)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = SARIMAX(y, order=order, seasonal_order=seasonal, enforce_stationarity=False, enforce_invertibility=False)
+        res = model.fit(disp=False)
+        fcast = res.get_forecast(steps=horizon)
+        mean = fcast.predicted_mean
+        conf = fcast.conf_int(alpha=0.05)
+    dates = next_trading_days(df.index.max(), horizon)
+    out = pd.DataFrame({
+        'date': dates,
+        'ticker': ticker,
+        'forecast_close': mean.values
+    })
+    out['lower_95ci'] = conf.iloc[:,0].values
+    out['upper_95ci'] = conf.iloc[:,1].values
+    return out
+
+def forecast_sarimax(ticker: str, period: str, horizon: int = 7, auto_order: bool = False,
+                     horizons=None, max_seconds: float = None) -> pd.DataFrame:
+    """
+    sarimax_forecast_frame on data/raw. With horizons, forecast max(horizons) once and write
+    one result file per horizon.
+    """
+    horizons = sorted(set(horizons or [horizon]))
+    path = os.path.join(RAW_DIR, f"{ticker}.csv")
+    df = read_raw_csv(path)
+    out = sarimax_forecast_frame(ticker, df, max(horizons), auto_order=auto_order, max_seconds=max_seconds)
+
+    for h, out_path in save_forecast(out, ticker, 'sarimax', horizons).items():
+        log.info(f"[✓] SARIMAX {h}-day forecast saved to {out_path}")
     return out
@@ -0,0 +1,242 @@
+"""
+Panel screener: rank a whole universe from the raw history store in one pass, then run
+the full per-ticker pipeline on the top-K only.
+
+Every ticker gets an AR(p) model with drift on daily log returns (i.e. ARIMA(p,1,0) on
+log price). All of them are fitted at once: returns are stacked into one (tickers x days)
+matrix and the per-ticker least-squares problems are solved as a batch of small normal
+equations, so a few thousand symbols take well under a second after loading.
+"""
+import os
+import glob
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+from fetch_data import RAW_DIR, raw_days, read_raw
+from utils import RESULTS_DIR, ensure_dirs, next_trading_days, save_forecast
+
+log = logging.getLogger(__name__)
+
+AR_ORDER  = 5      # lags per model
+LOOKBACK  = 252    # return observations per ticker used for the fit
+MIN_OBS   = 60     # usable regression rows below which a ticker is not ranked
+RIDGE     = 1e-6   # relative to the lag variance; keeps flat/illiquid series solvable
+Z_95      = 1.959964
+
+
+def universe(raw_dir: str = RAW_DIR) -> list:
+    """Every ticker with a raw CSV in the history store."""
+    return sorted(os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(raw_dir, '*.csv')))
+
+
+def _read_close(path: str):
+    """(days as datetime64[D], Close as float) from one raw CSV (either layout, see fetch_data.read_raw_csv)."""
+    df = pd.read_csv(path)
+    date_col = 'Date' if 'Date' in df.columns else df.columns[0]  # yfinance multi-row header: 'Price'
+    return raw_days(df[date_col].to_numpy()), pd.to_numeric(df['Close'], errors='coerce').to_numpy(dtype=float)
+
+
+def load_close_panel(tickers=None, lookback: int = LOOKBACK, raw_dir: str = RAW_DIR) -> pd.DataFrame:
+    """Close prices, one column per ticker on the union of dates (NaN where a ticker has no row)."""
+    series = {}
+    for t in tickers or universe(raw_dir):
+        try:
+            days, close = _read_close(os.path.join(raw_dir, f"{t}.csv"))
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"[!] {t}: no usable raw history ({e})")
+            continue
+        ok = np.isfinite(close) & (close > 0) & ~np.isnat(days)
+        days, close = days[ok], close[ok]
+        order = np.argsort(days, kind='stable')
+        series[t] = (days[order][-(lookback + 1):], close[order][-(lookback + 1):])
+    if not series:
+        return pd.DataFrame()
+
+    calendar = np.unique(np.concatenate([d for d, _ in series.values()]))
+    mat = np.full((len(calendar), len(series)), np.nan)
+    for j, (days, close) in enumerate(series.values()):
+        mat[np.searchsorted(calendar, days), j] = close          # duplicate days: last row wins
+    return pd.DataFrame(mat, index=pd.DatetimeIndex(calendar, name='Date'), columns=list(series))
+
+
+def _right_align(a: np.ndarray) -> np.ndarray:
+    """Shift each row so its last finite value sits in the last column (stale tickers line up)."""
+    n, T = a.shape
+    finite = np.isfinite(a)
+    last = T - 1 - np.argmax(finite[:, ::-1], axis=1)
+    src = np.arange(T)[None, :] - (T - 1 - last)[:, None]
+    out = np.take_along_axis(a, np.clip(src, 0, None), axis=1)
+    out[src < 0] = np.nan
+    return out
+
+
+def fit_ar_panel(returns: np.ndarray, order: int = AR_ORDER, ridge: float = RIDGE):
+    """
+    Batched least squares for r_t = c + phi_1 r_{t-1} + ... + phi_p r_{t-p} + e_t, one
+    model per row of `returns` (tickers x days, NaN = missing; rows containing one are
+    dropped for that ticker only). Returns (coef (n, p+1) as [c, phi_1..phi_p],
+    sigma (n,), n_obs (n,)).
+    """
+    n, T = returns.shape
+    p = order
+    y = returns[:, p:]                                                     # (n, T-p)
+    X = np.stack([np.ones_like(y)] + [returns[:, p - k:T - k] for k in range(1, p + 1)], axis=2)
+    mask = np.isfinite(y) & np.isfinite(X).all(axis=2)
+    y = np.where(mask, y, 0.0)
+    X = np.where(mask[..., None], X, 0.0)
+
+    XtX = np.einsum('ntk,ntj->nkj', X, X)
+    lag_diag = XtX[:, np.arange(1, p + 1), np.arange(1, p + 1)]
+    lag_diag += ridge * lag_diag.mean(axis=1, keepdims=True) + 1e-12      # drift is not shrunk
+    XtX[:, np.arange(1, p + 1), np.arange(1, p + 1)] = lag_diag
+    Xty = np.einsum('ntk,nt->nk', X, y)
+    n_obs = mask.sum(axis=1)
+    ok = n_obs > p + 1
+    XtX[~ok] = np.eye(p + 1)                                               # placeholder, masked out below
+    coef = np.linalg.solve(XtX, Xty[..., None])[..., 0]
+
+    resid = np.where(mask, y - np.einsum('ntk,nk->nt', X, coef), 0.0)
+    dof = np.maximum(n_obs - (p + 1), 1)
+    sigma = np.sqrt((resid ** 2).sum(axis=1) / dof)
+    coef[~ok] = np.nan
+    sigma[~ok] = np.nan
+    return coef, sigma, n_obs
+
+
+def forecast_ar_panel(returns: np.ndarray, coef: np.ndarray, sigma: np.ndarray, horizon: int):
+    """
+    Iterate every model `horizon` steps from its last p returns. Returns (mean, sd), both
+    (n, horizon): expected cumulative log return and its standard deviation at each step
+    (from the MA(inf) psi weights, so bands widen with the AR dynamics, not just sqrt(h)).
+    """
+    n, p1 = coef.shape
+    p = p1 - 1
+    c, phi = coef[:, 0], coef[:, 1:]
+    lags = returns[:, ::-1][:, :p].copy()                                  # most recent first
+    step = np.empty((n, horizon))
+    psi = np.zeros((n, horizon))
+    psi[:, 0] = 1.0
+    for h in range(horizon):
+        step[:, h] = c + (phi * lags).sum(axis=1)
+        lags = np.concatenate([step[:, h:h + 1], lags[:, :-1]], axis=1)
+        if h:
+            k = min(p, h)
+            psi[:, h] = (phi[:, :k] * psi[:, h - 1::-1][:, :k]).sum(axis=1)
+    mean = np.cumsum(step, axis=1)
+    sd = sigma[:, None] * np.sqrt(np.cumsum(np.cumsum(psi, axis=1) ** 2, axis=1))
+    return mean, sd
+
+
+def screen(tickers=None, horizon: int = 5, order: int = AR_ORDER, lookback: int = LOOKBACK,
+           min_obs: int = MIN_OBS, raw_dir: str = RAW_DIR):
+    """
+    Fit, forecast and score the whole universe. Returns (ranking, forecasts):
+      ranking:   one row per ranked ticker, best first; score = expected horizon log
+                 return / its standard deviation.
+      forecasts: long frame in the forecast result schema (date, ticker, forecast_close,
+                 lower_95ci, upper_95ci) for every ranked ticker.
+    """
+    t0 = time.perf_counter()
+    panel = load_close_panel(tickers, lookback, raw_dir)
+    if panel.empty:
+        log.warning("[!] Screener: no raw history to screen.")
+        return pd.DataFrame(), pd.DataFrame()
+    t_load = time.perf_counter() - t0
+
+    names = np.array(panel.columns)
+    logp = np.log(panel.to_numpy(dtype=float).T)                           # (n, T)
+    last_dates = np.array([panel[t].last_valid_index() for t in names])
+    last_close = np.exp(_right_align(logp)[:, -1])
+    returns = _right_align(np.diff(logp, axis=1))
+
+    coef, sigma, n_obs = fit_ar_panel(returns, order)
+    mean, sd = forecast_ar_panel(returns, coef, sigma, horizon)
+    keep = (n_obs >= min_obs) & np.isfinite(mean[:, -1]) & (sd[:, -1] > 0)
+    score = np.where(keep, mean[:, -1] / np.where(sd[:, -1] > 0, sd[:, -1], np.nan), np.nan)
+
+    ranking = pd.DataFrame({
+        'ticker': names,
+        'last_date': last_dates,
+        'last_close': last_close,
+        'exp_return': np.expm1(mean[:, -1]),
+        'sd_log_return': sd[:, -1],
+        'score': score,
+        'n_obs': n_obs,
+    })[keep].sort_values('score', ascending=False).reset_index(drop=True)
+    ranking.insert(0, 'rank', np.arange(1, len(ranking) + 1))
+
+    idx = np.flatnonzero(keep)
+    calendar = {d: next_trading_days(d, horizon) for d in set(last_dates[idx])}  # few distinct last dates
+    base = last_close[idx, None]
+    forecasts = pd.DataFrame({
+        'date': [d for i in idx for d in calendar[last_dates[i]]],
+        'ticker': np.repeat(names[idx], horizon),
+        'forecast_close': (base * np.exp(mean[idx])).ravel(),
+        'lower_95ci': (base * np.exp(mean[idx] - Z_95 * sd[idx])).ravel(),
+        'upper_95ci': (base * np.exp(mean[idx] + Z_95 * sd[idx])).ravel(),
+    })
+
+    log.info(f"[✓] Screened {len(names)} tickers ({len(ranking)} ranked) in {time.perf_counter() - t0:.2f}s "
+             f"(load {t_load:.2f}s, AR({order}) fit+forecast {time.perf_counter() - t0 - t_load:.2f}s)")
+    return ranking, forecasts
+
+
+def save_screen(ranking: pd.DataFrame, forecasts: pd.DataFrame, horizon: int):
+    """
+    results/screener_rank_{h}d.csv, plus each ranked ticker's AR forecast in the usual result
+    layout, results/{SAFE}_ar_{h}d.csv. Returns (ranking path, {ticker: forecast path}).
+    """
+    ensure_dirs()
+    rank_path = os.path.join(RESULTS_DIR, f"screener_rank_{horizon}d.csv")
+    ranking.to_csv(rank_path, index=False)
+    log.info(f"[✓] Screener ranking saved to {rank_path}")
+    paths = {}
+    for t, out in forecasts.groupby('ticker', sort=False):
+        paths[t] = save_forecast(out.reset_index(drop=True), t, 'ar', [horizon])[horizon]
+    log.info(f"[✓] Screener AR {horizon}-day forecasts saved for {len(paths)} tickers in {RESULTS_DIR}")
+    return rank_path, paths
+
+
+def run_top_k(ranking: pd.DataFrame, k: int, raw_dir: str = RAW_DIR, **pipeline_kwargs) -> dict:
+    """
+    Full pipeline (written to disk like main.py) for the k best-ranked tickers only, on the
+    same history the screener ranked (no re-fetch, data/raw left as is).
+    """
+    from pipeline import run_pipeline, DiskSink
+    out = {}
+    sink = DiskSink()
+    for t in ranking['ticker'].head(k):
+        log.info(f"\n--- Stock Pipeline for {t} (screener rank {len(out) + 1}/{k}) ---\n")
+        try:
+            out[t] = run_pipeline(t, raw=read_raw(t, raw_dir), sink=sink, **pipeline_kwargs)
+        except Exception as e:
+            log.warning(f"[!] Pipeline for {t} failed: {e}")
+    return out
+
+
+if __name__ == '__main__':
+    import argparse
+    from utils import setup_logging
+    ap = argparse.ArgumentParser(description="Screen the raw history store with batched AR models; run the full pipeline on the top-K")
+    ap.add_argument('--tickers', nargs='+', default=None, help="Universe (default: every CSV in data/raw)")
+    ap.add_argument('--horizon', type=int, default=5)
+    ap.add_argument('--order', type=int, default=AR_ORDER, help="AR lags")
+    ap.add_argument('--lookback', type=int, default=LOOKBACK, help="Return observations per ticker")
+    ap.add_argument('--top_k', type=int, default=0, help="Run the full pipeline on this many top tickers (0 = screen only)")
+    ap.add_argument('--period', default='6mo', help="Pipeline look-back for the top-K runs")
+    ap.add_argument('--use_lstm', action='store_true')
+    ap.add_argument('--sarimax_auto', action='store_true')
+    args = ap.parse_args()
+    setup_logging()
+
+    tickers = [t.upper() for t in args.tickers] if args.tickers else None
+    ranking, forecasts = screen(tickers, args.horizon, args.order, args.lookback)
+    if not ranking.empty:
+        save_screen(ranking, forecasts, args.horizon)
+        print(ranking.head(max(10, args.top_k)).to_string(index=False))
+        if args.top_k > 0:
+            run_top_k(ranking, args.top_k, period=args.period, horizons=[args.horizon],
+                      use_lstm=args.use_lstm, sarimax_auto=args.sarimax_auto)
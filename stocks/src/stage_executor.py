@@ -0,0 +1,171 @@
+import logging
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+log = logging.getLogger(__name__)
+
+
+class ThreadBudget:
+    """
+    Central CPU thread budget for one pipeline run.
+    Splits the box between concurrently running stages so XGB (OpenMP), TensorFlow
+    and BLAS (statsmodels) don't each assume they own every core.
+    """
+
+    def __init__(self, total: int = None):
+        self.total = max(1, int(total or os.cpu_count() or 1))
+
+    def split(self, weights: dict) -> dict:
+        """Integer share per stage proportional to weight; every stage gets at least 1."""
+        weights = {k: float(w) for k, w in weights.items() if w > 0}
+        if not weights:
+            return {}
+        wsum = sum(weights.values())
+        shares = {k: max(1, int(self.total * w / wsum)) for k, w in weights.items()}
+        # hand out threads lost to rounding, heaviest stage first
+        spare = self.total - sum(shares.values())
+        for k in sorted(weights, key=weights.get, reverse=True):
+            if spare <= 0:
+                break
+            shares[k] += 1
+            spare -= 1
+        return shares
+
+    @staticmethod
+    def limit_blas(n: int):
+        """
+        Cap BLAS threads process-wide (threadpoolctl ships with scikit-learn).
+        Returns the limiter so callers can restore it; env vars cover late-loaded libs.
+        """
+        for var in ('OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'BLIS_NUM_THREADS'):
+            os.environ[var] = str(n)
+        try:
+            from threadpoolctl import threadpool_limits
+            return threadpool_limits(limits=n, user_api='blas')
+        except Exception:
+            return None
+
+    @staticmethod
+    def configure_tensorflow(intra: int, inter: int = 1):
+        """Must run before TensorFlow creates its thread pools (i.e. before first use)."""
+        os.environ['TF_NUM_INTRAOP_THREADS'] = str(intra)
+        os.environ['TF_NUM_INTEROP_THREADS'] = str(inter)
+        try:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(intra)
+            tf.config.threading.set_inter_op_parallelism_threads(inter)
+        except (ImportError, RuntimeError):
+            # not installed, or already initialised: env vars are the best we can do
+            pass
+
+
+_PROCESS_LIMITS = {}
+_PROCESS_LOCK = threading.Lock()
+
+
+def configure_process(blas: int = None, tf_intra: int = None, tf_inter: int = 1) -> dict:
+    """
+    Process-wide thread limits for BLAS and TensorFlow. Call once from the entry point
+    (main.py, a load-test worker), never per run: concurrent in-process runs would overwrite
+    each other, and TensorFlow rejects changes once its pools exist. Later calls are ignored.
+    Returns the limits in force.
+    """
+    with _PROCESS_LOCK:
+        if _PROCESS_LIMITS:
+            if (blas, tf_intra, tf_inter) != _PROCESS_LIMITS['requested']:
+                log.info(f"[i] Process thread limits already set {_PROCESS_LIMITS['requested']}; ignoring")
+            return dict(_PROCESS_LIMITS)
+        if blas is not None:
+            ThreadBudget.limit_blas(blas)
+        if tf_intra is not None:
+            ThreadBudget.configure_tensorflow(intra=tf_intra, inter=tf_inter)
+        _PROCESS_LIMITS.update({'requested': (blas, tf_intra, tf_inter), 'blas': blas, 'tf_intra': tf_intra})
+        return dict(_PROCESS_LIMITS)
+
+
+def run_stages(stages: dict, max_workers: int = None, sequential: bool = False, deadline=None):
+    """
+    Run a small DAG of stages. `stages` maps name -> (fn, deps); fn takes no args.
+    Independent stages run concurrently on a thread pool (XGB, TF and the statsmodels
+    Kalman filter release the GIL in their hot loops); sequential=True runs one at a time.
+    A failed stage is reported and its dependents are skipped; the rest of the graph still
+    runs. With a deadline (anything with expired() and remaining()), stages not yet started
+    once it passes are skipped, and stages still running are recorded as timed out and left
+    behind unwaited: a thread can't be stopped, but the caller gets what finished in time.
+
+    Returns (results, timings, errors): name -> return value / wall seconds / exception.
+    """
+    results, timings, errors = {}, {}, {}
+    pending = dict(stages)
+    started = {}
+
+    def _timed(name, fn):
+        t0 = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            # a timed-out stage already has its time (up to the deadline) recorded
+            timings.setdefault(name, time.perf_counter() - t0)
+
+    def _ready():
+        out = []
+        for name, (_, deps) in list(pending.items()):
+            if deadline is not None and deadline.expired():
+                errors[name] = RuntimeError("skipped: deadline passed before stage started")
+                del pending[name]
+            elif any(d in errors for d in deps):
+                errors[name] = RuntimeError(f"skipped: dependency failed ({', '.join(d for d in deps if d in errors)})")
+                del pending[name]
+            elif all(d in results for d in deps):
+                out.append(name)
+        return out
+
+    limit = 1 if sequential else (max_workers or max(1, len(stages)))
+    pool = ThreadPoolExecutor(max_workers=limit)
+    running = {}
+    try:
+        while pending or running:
+            for name in _ready()[:limit - len(running)]:
+                fn, _ = pending.pop(name)
+                started[name] = time.perf_counter()
+                # each stage runs in a copy of the caller's context (see deadline.activate)
+                running[pool.submit(contextvars.copy_context().run, _timed, name, fn)] = name
+            if not running:
+                break
+            timeout = deadline.remaining() if deadline is not None else None
+            done, _ = wait(running, timeout=None if timeout == float('inf') else timeout,
+                           return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    results[name] = fut.result()
+                except Exception as e:
+                    log.warning(f"[!] Stage '{name}' failed: {e}")
+                    errors[name] = e
+            if not done and deadline is not None and deadline.expired():
+                for fut, name in running.items():
+                    timings[name] = time.perf_counter() - started[name]
+                    errors[name] = TimeoutError("timed out: still running when the deadline passed")
+                    log.warning(f"[!] Stage '{name}' still running at the deadline; continuing without it")
+                running.clear()
+    finally:
+        # don't join stages left running past the deadline
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results, timings, errors
+
+
+def report_stage_overlap(ticker: str, timings: dict, wall: float) -> dict:
+    """
+    Sum of stage time / wall-clock: how much the stages overlapped. Not a speedup: stages
+    sharing cores run slower than they would alone, so the sum overstates what a sequential
+    run costs. For the speedup, see pipeline.compare_sequential (main.py --compare_sequential).
+    """
+    stage_seconds = sum(timings.values())
+    overlap = stage_seconds / wall if wall > 0 else 1.0
+    for name, t in sorted(timings.items(), key=lambda kv: -kv[1]):
+        log.info(f"    {name:<10s} {t:7.2f}s")
+    log.info(f"[✓] {ticker}: sum of stage time {stage_seconds:.2f}s / wall-clock {wall:.2f}s = {overlap:.2f}")
+    return {'ticker': ticker, 'stage_seconds': stage_seconds, 'wall_seconds': wall, 'stage_overlap': overlap}
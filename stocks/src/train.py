@@ -1,5 +1,7 @@
+import logging
 import os
 import json
+import time
 import numpy as np
 import pandas as pd
 from sklearn.metrics import mean_squared_error
@@ -7,9 +9,16 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import RobustScaler
 import joblib
 
+import deadline
+from artifacts import save_xgb_artifact
+from indicators import DEFAULT_FEATURE_SET, resolve_feature_set
+
+log = logging.getLogger(__name__)
+
 # safe import for macOS users without libomp
 try:
     from xgboost import XGBRegressor
+    from xgboost import callback as xgb_callback
     XGB_AVAILABLE = True
     _XGB_IMPORT_ERROR = None
 except Exception as e:
@@ -21,9 +30,8 @@ PROCESSED_DIR = os.path.join(BASE_DIR, 'data', 'processed')
 MODELS_DIR    = os.path.join(BASE_DIR, 'models')
 os.makedirs(MODELS_DIR, exist_ok=True)
 
-def load_train_eval(ticker: str):
-    train_df = pd.read_csv(os.path.join(PROCESSED_DIR, f"{ticker}_train.csv"), index_col='Date', parse_dates=['Date'])
-    eval_df  = pd.read_csv(os.path.join(PROCESSED_DIR, f"{ticker}_eval.csv"),  index_col='Date', parse_dates=['Date'])
+def split_xy(train_df: pd.DataFrame, eval_df: pd.DataFrame):
+    """Processed train/eval frames -> numeric (X_train, y_train, X_eval, y_eval); target is Close."""
     X_train = train_df.drop(columns=['Close'])
     y_train = train_df['Close']
     X_eval  = eval_df.drop(columns=['Close'])
@@ -37,6 +45,11 @@ def load_train_eval(ticker: str):
     X_eval,  y_eval  = X_eval.dropna(),  y_eval.loc[X_eval.index]
     return X_train, y_train, X_eval, y_eval
 
+def load_train_eval(ticker: str):
+    train_df = pd.read_csv(os.path.join(PROCESSED_DIR, f"{ticker}_train.csv"), index_col='Date', parse_dates=['Date'])
+    eval_df  = pd.read_csv(os.path.join(PROCESSED_DIR, f"{ticker}_eval.csv"),  index_col='Date', parse_dates=['Date'])
+    return split_xy(train_df, eval_df)
+
 def remove_outliers_robust(X: pd.DataFrame, y: pd.Series, z=4.0):
     """
     Winsorize targets via robust z-score and mask extreme target outliers.
@@ -47,7 +60,7 @@ def remove_outliers_robust(X: pd.DataFrame, y: pd.Series, z=4.0):
     mask = np.abs(rz) < z
     removed = int((~mask).sum())
     if removed:
-        print(f"[ ] Removed {removed} outlier rows from training data")
+        log.info(f"[ ] Removed {removed} outlier rows from training data")
     return X.loc[mask], y.loc[mask]
 
 def recency_weights(index: pd.Index, recent_window: int = 7, base_weight: float = 1.0, recent_weight: float = 3.0):
@@ -61,15 +74,35 @@ def recency_weights(index: pd.Index, recent_window: int = 7, base_weight: float
     w[-recent_window:] = recent_weight
     return w
 
-def train_and_save(ticker: str):
-    if not XGB_AVAILABLE:
-        print(f"[!] XGBoost unavailable; skipping XGB training. Reason: {_XGB_IMPORT_ERROR}")
-        return False
+class _TimeBudget(xgb_callback.TrainingCallback if XGB_AVAILABLE else object):
+    """Stop boosting once max_seconds have passed; keeps the trees built so far."""
+
+    def __init__(self, max_seconds: float):
+        super().__init__()
+        self.max_seconds = max_seconds
+        self.start = time.perf_counter()
+        self.rounds = 0
+        self.exhausted = False
 
-    X_train, y_train, X_eval, y_eval = load_train_eval(ticker)
+    def after_iteration(self, model, epoch, evals_log):
+        self.rounds = epoch + 1
+        self.exhausted = time.perf_counter() - self.start >= self.max_seconds
+        return self.exhausted
+
+def fit_xgb(ticker: str, X_train, y_train, X_eval, y_eval, n_jobs: int = 4,
+            feature_set: str = DEFAULT_FEATURE_SET, max_seconds: float = None):
+    """
+    Fit the XGB regressor in memory. Returns a bundle shaped like artifacts.load_xgb_bundle
+    (model, scaler, feature_names, meta), or None when there is nothing to train.
+    """
+    if not XGB_AVAILABLE:
+        log.warning(f"[!] XGBoost unavailable; skipping XGB training. Reason: {_XGB_IMPORT_ERROR}")
+        return None
     if X_train.empty:
-        print(f"[!] No training data for {ticker}")
-        return False
+        log.warning(f"[!] No training data for {ticker}")
+        return None
+
+    train_end = str(pd.Timestamp(X_train.index.max()).date())  # evaluate.compare_models scores after this
 
     # Outlier removal on target
     X_train, y_train = remove_outliers_robust(X_train, y_train, z=4.0)
@@ -82,33 +115,50 @@ def train_and_save(ticker: str):
     # Recency weights
     sample_weight = recency_weights(X_train_scaled.index, recent_window=min(7, len(X_train_scaled)))
 
+    budget = _TimeBudget(max_seconds) if max_seconds is not None else None
     model = XGBRegressor(
+        callbacks=[budget] if budget else None,
         n_estimators=300,
         max_depth=5,
         learning_rate=0.05,
         subsample=0.9,
         colsample_bytree=0.9,
         reg_lambda=1.0,
-        n_jobs=4,
+        n_jobs=n_jobs,
         random_state=42,
         verbosity=1,
         tree_method="hist"
     )
-    print(f"[ ] Training XGBRegressor on {len(X_train_scaled)} samples with recency weighting...")
+    log.info(f"[ ] Training XGBRegressor on {len(X_train_scaled)} samples with recency weighting...")
     model.fit(X_train_scaled, y_train, sample_weight=sample_weight)
+    if budget and budget.exhausted:
+        deadline.note('xgb', 'cut_short', f"{budget.rounds}/300 trees within {max_seconds:.1f}s")
 
     if not X_eval_scaled.empty:
         preds = model.predict(X_eval_scaled)
         mse = mean_squared_error(y_eval, preds)
-        print(f"[✓] Eval MSE for {ticker}: {mse:.4f}")
-
-    # Save model bundle with feature names + scaler
-    bundle = {
-        "model": model,
-        "feature_names": list(X_train.columns),
-        "scaler": scaler
-    }
-    out_path = os.path.join(MODELS_DIR, f"{ticker}_model.pkl")
-    joblib.dump(bundle, out_path)
-    print(f"[✓] Saved model to {out_path}")
+        log.info(f"[✓] Eval MSE for {ticker}: {mse:.4f}")
+
+    # feature_set is recorded so forecasting recomputes exactly the indicators trained on
+    return {'model': model, 'scaler': scaler, 'feature_names': list(X_train.columns),
+            'meta': {'feature_set': resolve_feature_set(feature_set)[0], 'train_end': train_end}}
+
+def save_xgb_bundle(ticker: str, bundle: dict) -> str:
+    """Persist an in-memory bundle: native booster + scaler arrays + feature names."""
+    out_path = save_xgb_artifact(ticker, bundle['model'], bundle['scaler'], bundle['feature_names'],
+                                 feature_set=bundle['meta']['feature_set'], models_dir=MODELS_DIR,
+                                 extra_meta={k: v for k, v in bundle['meta'].items() if k != 'feature_set'})
+    log.info(f"[✓] Saved model to {out_path}")
+    return out_path
+
+def train_and_save(ticker: str, n_jobs: int = 4, feature_set: str = DEFAULT_FEATURE_SET,
+                   max_seconds: float = None):
+    if not XGB_AVAILABLE:
+        log.warning(f"[!] XGBoost unavailable; skipping XGB training. Reason: {_XGB_IMPORT_ERROR}")
+        return False
+    bundle = fit_xgb(ticker, *load_train_eval(ticker), n_jobs=n_jobs, feature_set=feature_set,
+                     max_seconds=max_seconds)
+    if bundle is None:
+        return False
+    save_xgb_bundle(ticker, bundle)
     return True
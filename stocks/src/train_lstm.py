@@ -1,5 +1,7 @@
+import logging
 import os
 import json
+import time
 import joblib
 import numpy as np
 import pandas as pd
@@ -8,7 +10,12 @@ from sklearn.preprocessing import MinMaxScaler
 from tensorflow import keras
 from tensorflow.keras import layers
 
+import deadline
 from features import compute_features
+from fetch_data import read_raw
+from artifacts import save_lstm_artifact, load_lstm_artifact, ArtifactError
+
+log = logging.getLogger(__name__)
 
 BASE_DIR    = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 RAW_DIR     = os.path.join(BASE_DIR, 'data', 'raw')
@@ -39,38 +46,211 @@ def make_supervised(series: np.ndarray, window: int, horizon: int):
         y.append(series[i+window:i+window+horizon, 0])
     return np.array(X), np.array(y)
 
-def train_lstm_model(ticker: str, horizon: int = 7, base_window: int = 60, epochs: int = 50, batch_size: int = 32):
-    # Load Close only for LSTM
-    raw = pd.read_csv(os.path.join(RAW_DIR, f"{ticker}.csv"), parse_dates=['Date'], index_col='Date')
-    close = pd.to_numeric(raw['Close'], errors='coerce').dropna().to_frame('Close')
-    if close.shape[0] < 30:
-        print("[!] Too little data for LSTM, skipping.")
+BASE_TICKER = '_base'  # artifact name of the shared pre-trained model (models/_base_lstm/)
+
+
+class WallClockBudget(keras.callbacks.Callback):
+    """Stop training once an epoch ends past the time budget (seconds)."""
+
+    def __init__(self, max_seconds: float):
+        super().__init__()
+        self.max_seconds = max_seconds
+        self.start = None
+        self.exhausted = False
+
+    def on_train_begin(self, logs=None):
+        self.start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        if time.perf_counter() - self.start >= self.max_seconds:
+            self.exhausted = True
+            self.model.stop_training = True
+
+
+def close_frame(raw: pd.DataFrame) -> pd.DataFrame:
+    return pd.to_numeric(raw['Close'], errors='coerce').dropna().to_frame('Close')
+
+
+def _load_close(ticker: str) -> pd.DataFrame:
+    return close_frame(read_raw(ticker, RAW_DIR))
+
+
+def _fit(model, X, y, epochs: int, batch_size: int, patience: int, max_seconds: float = None):
+    """Fit with early stopping (best weights restored) and an optional wall-clock budget."""
+    # If too few samples, avoid validation split
+    val_split = 0.1 if X.shape[0] >= 20 else 0.0
+    callbacks = [keras.callbacks.EarlyStopping(monitor='val_loss' if val_split else 'loss',
+                                               patience=patience, restore_best_weights=True)]
+    budget = None
+    if max_seconds:
+        budget = WallClockBudget(max_seconds)
+        callbacks.append(budget)
+    t0 = time.perf_counter()
+    hist = model.fit(X, y, epochs=epochs, batch_size=batch_size, validation_split=val_split,
+                     callbacks=callbacks, verbose=2)
+    stats = {
+        "fit_seconds": round(time.perf_counter() - t0, 3),
+        "epochs_run": len(hist.history.get('loss', [])),
+        "budget_exhausted": bool(budget and budget.exhausted),
+    }
+    if stats["epochs_run"]:
+        stats["sec_per_epoch"] = round(stats["fit_seconds"] / stats["epochs_run"], 3)
+    return stats
+
+
+def pretrain_base_model(tickers, horizon: int = 7, window: int = 60, epochs: int = 50,
+                        batch_size: int = 64, patience: int = 5, max_seconds: float = None):
+    """
+    Pre-train the shared base LSTM on a pooled dataset: each ticker's Close is MinMax-scaled
+    on its own, so all series live on [0, 1] and windows from different tickers can be stacked.
+    """
+    Xs, ys, used = [], [], []
+    for t in tickers:
+        try:
+            close = _load_close(t)
+        except FileNotFoundError:
+            log.warning(f"[!] No raw data for {t}; left out of base pre-training.")
+            continue
+        if len(close) < window + horizon + 1:
+            log.warning(f"[!] {t}: {len(close)} rows < window+horizon; left out of base pre-training.")
+            continue
+        scaled = MinMaxScaler(feature_range=(0, 1)).fit_transform(close.values)
+        X, y = make_supervised(scaled, window, horizon)
+        Xs.append(X); ys.append(y); used.append(t)
+    if not Xs:
+        log.warning("[!] No usable tickers for base LSTM pre-training.")
         return False
 
+    X, y = np.concatenate(Xs), np.concatenate(ys)
+    log.info(f"[LSTM] Pre-training base model on {len(used)} tickers, {X.shape[0]} samples, window={window}")
+    model = _build_model(window, 1, horizon)
+    stats = _fit(model, X, y, epochs, batch_size, patience, max_seconds)
+
+    model_path = os.path.join(MODELS_DIR, f"{BASE_TICKER}_lstm.keras")
+    model.save(model_path)
+    meta = {"window": int(window), "horizon": int(horizon), "mode": "base", "tickers": used, **stats}
+    out_dir = save_lstm_artifact(BASE_TICKER, model_path, None, meta, models_dir=MODELS_DIR)
+    os.remove(model_path)
+    log.info(f"[LSTM] Saved base model to {out_dir} ({stats['epochs_run']} epochs, {stats['fit_seconds']:.1f}s)")
+    return True
+
+
+def _load_base(horizon: int, n: int):
+    """Base model + window if a compatible one exists (same horizon, enough rows to fine-tune)."""
+    try:
+        base = load_lstm_artifact(BASE_TICKER, models_dir=MODELS_DIR)
+    except ArtifactError:
+        return None, None
+    window = int(base['meta']['window'])
+    if int(base['meta']['horizon']) != horizon:
+        log.warning(f"[!] Base LSTM horizon {base['meta']['horizon']} != {horizon}; training from scratch.")
+        return None, None
+    if n - window - horizon < 1:
+        log.warning(f"[!] Too few rows to fine-tune base LSTM (window={window}); training from scratch.")
+        return None, None
+    return keras.models.load_model(base['model_path']), window
+
+
+def fit_lstm(ticker: str, close: pd.DataFrame, horizon: int = 7, base_window: int = 60, epochs: int = 50,
+             batch_size: int = 32, finetune: bool = False, finetune_epochs: int = 5, patience: int = 5,
+             max_seconds: float = None):
+    """
+    Train the per-ticker LSTM on an in-memory Close frame. With finetune=True and a compatible
+    base model in models/_base_lstm/, start from the pre-trained weights and run at most
+    finetune_epochs at a lower learning rate; otherwise train from random init.
+    Both modes use early stopping and the optional wall-clock budget (max_seconds).
+    Returns (model, scaler, meta), or None when there are too few rows.
+    """
+    if close.shape[0] < 30:
+        log.warning("[!] Too little data for LSTM, skipping.")
+        return None
+
     scaler = MinMaxScaler(feature_range=(0, 1))
     scaled = scaler.fit_transform(close.values)
     n = len(scaled)
 
-    window = min(base_window, max(10, n // 4))
-    if n - window - horizon < 3:
-        window = max(10, n - horizon - 2)
-    if n - window - horizon < 1:
-        print("[!] Still not enough rows to form sequences, skipping LSTM.")
-        return False
+    model, window = _load_base(horizon, n) if finetune else (None, None)
+    mode = "finetune" if model is not None else "scratch"
+    if model is None:
+        window = min(base_window, max(10, n // 4))
+        if n - window - horizon < 3:
+            window = max(10, n - horizon - 2)
+        if n - window - horizon < 1:
+            log.warning("[!] Still not enough rows to form sequences, skipping LSTM.")
+            return None
 
     X, y = make_supervised(scaled.reshape(-1,1), window, horizon)
-    print(f"[LSTM] Training samples: {X.shape[0]}, window={window}, features=1")
+    log.info(f"[LSTM] Training samples: {X.shape[0]}, window={window}, features=1, mode={mode}")
 
-    model = _build_model(window, 1, horizon)
+    if mode == "finetune":
+        model.compile(optimizer=keras.optimizers.Adam(learning_rate=1e-4), loss='mse')
+        stats = _fit(model, X, y, finetune_epochs, batch_size, min(patience, finetune_epochs), max_seconds)
+    else:
+        model = _build_model(window, 1, horizon)
+        stats = _fit(model, X, y, epochs, batch_size, patience, max_seconds)
+    log.info(f"[LSTM] {mode}: {stats['epochs_run']} epochs in {stats['fit_seconds']:.1f}s"
+             f"{' (time budget hit)' if stats['budget_exhausted'] else ''}")
+    if stats['budget_exhausted']:
+        deadline.note('lstm', 'cut_short', f"{stats['epochs_run']} epochs within {max_seconds:.1f}s")
+
+    meta = {"window": int(window), "horizon": int(horizon), "mode": mode, **stats}
+    return model, scaler, meta
 
-    # If too few samples, avoid validation split
-    val_split = 0.1 if X.shape[0] >= 20 else 0.0
-    model.fit(X, y, epochs=epochs, batch_size=batch_size, validation_split=val_split, verbose=2)
 
-    # Save model & meta (scaler + window + horizon)
+def save_lstm_model(ticker: str, model, scaler, meta: dict) -> str:
+    """Save model & meta (scaler + window + horizon) as an artifact directory."""
     model_path = os.path.join(MODELS_DIR, f"{ticker}_lstm.keras")
     model.save(model_path)
-    meta = {"window": int(window), "horizon": int(horizon)}
-    joblib.dump({"scaler": scaler, "meta": meta}, os.path.join(MODELS_DIR, f"{ticker}_lstm.pkl"))
-    print(f"[LSTM] Saved model to {model_path}")
+    out_dir = save_lstm_artifact(ticker, model_path, scaler, meta, models_dir=MODELS_DIR)
+    os.remove(model_path)
+    log.info(f"[LSTM] Saved model to {out_dir}")
+    return out_dir
+
+
+def train_lstm_model(ticker: str, horizon: int = 7, base_window: int = 60, epochs: int = 50, batch_size: int = 32,
+                     finetune: bool = False, finetune_epochs: int = 5, patience: int = 5,
+                     max_seconds: float = None):
+    """fit_lstm on data/raw Close, then save the artifact. Returns True when a model was saved."""
+    fitted = fit_lstm(ticker, _load_close(ticker), horizon=horizon, base_window=base_window, epochs=epochs,
+                      batch_size=batch_size, finetune=finetune, finetune_epochs=finetune_epochs,
+                      patience=patience, max_seconds=max_seconds)
+    if fitted is None:
+        return False
+    save_lstm_model(ticker, *fitted)
     return True
+
+
+def compare_finetune(ticker: str, horizon: int = 7, **kwargs) -> dict:
+    """Train the ticker from scratch and by fine-tuning; report wall-clock cost of each."""
+    costs = {}
+    for mode in ("scratch", "finetune"):
+        if not train_lstm_model(ticker, horizon=horizon, finetune=(mode == "finetune"), **kwargs):
+            return costs
+        meta = load_lstm_artifact(ticker, models_dir=MODELS_DIR)['meta']
+        costs[meta['mode']] = {k: meta.get(k) for k in ("fit_seconds", "epochs_run", "sec_per_epoch")}
+    if "scratch" in costs and "finetune" in costs and costs["finetune"]["fit_seconds"]:
+        ratio = costs["scratch"]["fit_seconds"] / costs["finetune"]["fit_seconds"]
+        log.info(f"[✓] {ticker}: scratch {costs['scratch']['fit_seconds']:.1f}s vs "
+                 f"fine-tune {costs['finetune']['fit_seconds']:.1f}s → {ratio:.1f}x cheaper")
+    return costs
+
+
+if __name__ == '__main__':
+    import argparse
+    from utils import setup_logging
+    ap = argparse.ArgumentParser(description="Train LSTM models (scratch, shared base, fine-tune)")
+    ap.add_argument('--pretrain', nargs='+', metavar='TICKER', help="Pre-train the shared base model on these tickers")
+    ap.add_argument('--ticker', help="Train one ticker")
+    ap.add_argument('--horizon', type=int, default=7)
+    ap.add_argument('--finetune', action='store_true', help="Fine-tune from the shared base model")
+    ap.add_argument('--compare', action='store_true', help="Train from scratch and fine-tune; report cost")
+    ap.add_argument('--max_seconds', type=float, default=None, help="Wall-clock training budget")
+    args = ap.parse_args()
+    setup_logging()
+
+    if args.pretrain:
+        pretrain_base_model([t.upper() for t in args.pretrain], horizon=args.horizon, max_seconds=args.max_seconds)
+    if args.ticker and args.compare:
+        compare_finetune(args.ticker.upper(), horizon=args.horizon, max_seconds=args.max_seconds)
+    elif args.ticker:
+        train_lstm_model(args.ticker.upper(), horizon=args.horizon, finetune=args.finetune, max_seconds=args.max_seconds)
@@ -1,14 +1,22 @@
+import logging
 import os
 import re
+import sys
 from datetime import datetime
-from typing import Iterable, List
+from typing import Dict, Iterable, List
 
 import numpy as np
 import pandas as pd
 
+log = logging.getLogger(__name__)
+
 RESULTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'results'))
 MODELS_DIR  = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models'))
 
+def setup_logging(level: int = logging.INFO):
+    """For CLI entry points: library modules log through `logging`; show records as plain lines on stdout."""
+    logging.basicConfig(level=level, format='%(message)s', stream=sys.stdout)
+
 def ensure_dirs():
     os.makedirs(RESULTS_DIR, exist_ok=True)
     os.makedirs(MODELS_DIR, exist_ok=True)
@@ -47,3 +55,19 @@ def unify_features(X: pd.DataFrame, feature_names: Iterable[str]) -> pd.DataFram
         if c in X.columns:
             out[c] = pd.to_numeric(X[c], errors='coerce').astype(float)
     return out
+
+def save_forecast(out: pd.DataFrame, ticker: str, model: str, horizons: Iterable[int]) -> Dict[int, str]:
+    """
+    Write results/{SAFE}_{model}_{h}d.csv for every h in horizons, each holding the first h rows
+    of `out` (one forecast run out to the longest horizon). Returns {h: path}.
+    """
+    safe = safe_ticker(ticker)
+    paths = {}
+    for h in sorted(set(int(h) for h in horizons)):
+        if h > len(out):
+            log.warning(f"[!] {model} forecast has only {len(out)} steps; no {h}-day result written.")
+            continue
+        path = os.path.join(RESULTS_DIR, f"{safe}_{model}_{h}d.csv")
+        out.iloc[:h].to_csv(path, index=False)
+        paths[h] = path
+    return paths
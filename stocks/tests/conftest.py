@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# The pipeline modules import each other as top-level modules (scripts run from src/).
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+
+@pytest.fixture
+def stub_raw():
+    """Deterministic synthetic OHLCV from the stub data source: stub_raw('AAA', '2y')."""
+    from fetch_data import _fetch_stub
+    return _fetch_stub
@@ -0,0 +1,114 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+xgboost = pytest.importorskip('xgboost')
+from sklearn.preprocessing import RobustScaler
+
+import artifacts
+from artifacts import artifact_dir, has_model, load_xgb_artifact, load_xgb_bundle, save_xgb_artifact
+
+
+@pytest.fixture
+def fitted():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(200, 3)), columns=['a', 'b', 'c'])
+    y = X['a'] * 2 - X['c'] + rng.normal(0, 0.1, 200)
+    scaler = RobustScaler().fit(X)
+    model = xgboost.XGBRegressor(n_estimators=20, max_depth=3, n_jobs=1)
+    model.fit(scaler.transform(X), y)
+    return model, scaler, X
+
+
+def test_xgb_round_trip(tmp_path, fitted):
+    model, scaler, X = fitted
+    save_xgb_artifact('AAA', model, scaler, list(X.columns), feature_set='base@1',
+                      models_dir=str(tmp_path), extra_meta={'train_end': '2024-12-31'})
+    b = load_xgb_artifact('AAA', models_dir=str(tmp_path))
+    assert b['feature_names'] == ['a', 'b', 'c']
+    assert b['meta']['feature_set'] == 'base@1' and b['meta']['train_end'] == '2024-12-31'
+    np.testing.assert_allclose(b['scaler'].transform(X), scaler.transform(X))
+    np.testing.assert_allclose(b['model'].predict(b['scaler'].transform(X)), model.predict(scaler.transform(X)),
+                               rtol=1e-6)
+    assert has_model('AAA', 'xgb', models_dir=str(tmp_path))
+
+
+def test_resave_swaps_link_and_keeps_previous_version(tmp_path, fitted):
+    model, scaler, X = fitted
+    out = artifact_dir('AAA', 'xgb', str(tmp_path))
+    os.makedirs(out)  # directory written before versioning: migrated on first save
+    open(os.path.join(out, 'stale.txt'), 'w').close()
+    for _ in range(4):
+        save_xgb_artifact('AAA', model, scaler, list(X.columns), models_dir=str(tmp_path))
+    assert os.path.islink(out)
+    assert len(os.listdir(f"{out}.versions")) == artifacts.KEEP_VERSIONS
+    assert not [n for n in os.listdir(tmp_path) if n.startswith('.')]  # no leftover temp links
+    load_xgb_artifact('AAA', models_dir=str(tmp_path))
+
+
+@pytest.fixture
+def no_symlinks(monkeypatch):
+    """A platform without symlinks (Windows without developer mode)."""
+    def refuse(*args, **kwargs):
+        raise OSError(1314, 'A required privilege is not held by the client')
+    monkeypatch.setattr(os, 'symlink', refuse)
+    monkeypatch.setattr(artifacts, '_SYMLINKS', None)
+
+
+def test_pointer_file_fallback_without_symlinks(tmp_path, fitted, no_symlinks):
+    model, scaler, X = fitted
+    out = artifact_dir('AAA', 'xgb', str(tmp_path))
+    os.makedirs(out)  # pre-versioning directory: moved aside on first save
+    for i in range(3):
+        save_xgb_artifact('AAA', model, scaler, list(X.columns), models_dir=str(tmp_path),
+                          extra_meta={'train_end': f'2024-12-0{i + 1}'})
+    assert not os.path.exists(out)
+    with open(os.path.join(f"{out}.versions", artifacts.CURRENT_NAME)) as f:
+        current = f.read().strip()
+    assert os.path.isdir(os.path.join(f"{out}.versions", current))
+    assert len([n for n in os.listdir(f"{out}.versions") if n != artifacts.CURRENT_NAME]) == artifacts.KEEP_VERSIONS
+    assert has_model('AAA', 'xgb', models_dir=str(tmp_path))
+    assert load_xgb_bundle('AAA', models_dir=str(tmp_path))['meta']['train_end'] == '2024-12-03'
+
+
+@pytest.mark.parametrize('symlinks', [True, False])
+def test_readers_never_miss_during_saves(tmp_path, fitted, request, symlinks):
+    if not symlinks:
+        request.getfixturevalue('no_symlinks')
+    model, scaler, X = fitted
+    save_xgb_artifact('AAA', model, scaler, list(X.columns), models_dir=str(tmp_path))
+    errors, done = [], threading.Event()
+
+    def reader():
+        while not done.is_set():
+            try:
+                load_xgb_artifact('AAA', models_dir=str(tmp_path))
+            except Exception as e:  # noqa: BLE001 - any failure is the bug
+                errors.append(e)
+
+    t = threading.Thread(target=reader)
+    t.start()
+    for _ in range(15):
+        save_xgb_artifact('AAA', model, scaler, list(X.columns), models_dir=str(tmp_path))
+    done.set()
+    t.join()
+    assert not errors
+
+
+def test_legacy_pickle_fallback(tmp_path, fitted, caplog):
+    import joblib
+    model, scaler, X = fitted
+    joblib.dump({'model': model, 'scaler': scaler, 'feature_names': list(X.columns)},
+                os.path.join(tmp_path, 'OLD_model.pkl'))
+    assert has_model('OLD', 'xgb', models_dir=str(tmp_path))
+    with caplog.at_level('WARNING', logger='artifacts'):
+        b = load_xgb_bundle('OLD', models_dir=str(tmp_path))
+    np.testing.assert_allclose(b['model'].predict(b['scaler'].transform(X)), model.predict(scaler.transform(X)))
+    assert 'deprecated' in caplog.text and 'artifacts.py --convert' in caplog.text
+
+    joblib.dump(model, os.path.join(tmp_path, 'BARE_model.pkl'))  # oldest format: bare regressor
+    b = load_xgb_bundle('BARE', models_dir=str(tmp_path))
+    assert b['model'] is not None and len(b['feature_names']) == b['scaler'].center.size
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+import deadline
+from deadline import Deadline, DegradationLog, build_run_report, ENSEMBLE_RESERVE, STAGE_SHARES
+
+
+def test_unlimited_deadline():
+    dl = Deadline(None)
+    assert not dl.expired()
+    assert dl.remaining() == float('inf') and dl.stage_budget('xgb') is None
+
+
+def test_stage_shares_are_capped_by_the_ensemble_reserve():
+    dl = Deadline(10)
+    assert dl.stage_remaining('fetch') == pytest.approx(10 * STAGE_SHARES['fetch'], abs=0.1)
+    assert dl.stage_remaining('unknown') == pytest.approx(10 * (1 - ENSEMBLE_RESERVE), abs=0.1)
+    assert dl.remaining() == pytest.approx(10 * (1 - ENSEMBLE_RESERVE), abs=0.1)
+
+
+def test_tiny_deadline_expires():
+    dl = Deadline(0.05)
+    time.sleep(0.06)
+    assert dl.expired() and dl.remaining() == 0.0 and dl.stage_budget('sarimax') == 0.0
+
+
+def test_run_report_statuses():
+    dlog = DegradationLog()
+    token = deadline.activate(dlog)
+    try:
+        deadline.note('xgb', 'cached_model', 'no time to retrain')
+    finally:
+        deadline.deactivate(token)
+    errors = {'sarimax': TimeoutError('timed out: still running when the deadline passed'),
+              'lstm': RuntimeError('skipped: deadline passed before stage started'),
+              'preprocess': ValueError('bad frame')}
+    report = build_run_report('AAA', Deadline(30), dlog, {'xgb': 0.5, 'sarimax': 2.0, 'preprocess': 0.1},
+                              errors, ['xgb'], [1, 7])
+
+    assert {k: v['status'] for k, v in report['stages'].items()} == {
+        'xgb': 'ok', 'sarimax': 'timed_out', 'lstm': 'skipped', 'preprocess': 'failed'}
+    assert report['stages']['lstm']['seconds'] == 0.0
+    assert report['degraded'] == [{'stage': 'xgb', 'action': 'cached_model', 'detail': 'no time to retrain'}]
+    assert report['ensemble_models'] == ['xgb'] and report['horizons'] == [1, 7]
+    assert report['deadline_seconds'] == 30
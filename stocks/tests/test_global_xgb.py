@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fetch_data import read_raw_csv
+from global_xgb import TICKER_FEATURES, forecast_global, normalise, ticker_rows, train_global
+from indicators import resolve_feature_set
+from monte_carlo import PathFeatures
+
+
+def test_read_raw_csv_reads_flat_and_yfinance_layouts(tmp_path, stub_raw):
+    raw = stub_raw('AAA', '6mo')
+    flat = tmp_path / 'flat.csv'
+    raw.to_csv(flat)
+    multi = tmp_path / 'multi.csv'
+    cols = ['Close', 'High', 'Low', 'Open', 'Volume']
+    with open(multi, 'w') as f:
+        f.write('Price,' + ','.join(cols) + '\n')
+        f.write('Ticker,' + ','.join(['AAA'] * len(cols)) + '\n')
+        f.write('Date' + ',' * len(cols) + '\n')
+    raw[cols].to_csv(multi, mode='a', header=False)
+
+    a, b = read_raw_csv(flat), read_raw_csv(multi)
+    assert len(a) == len(b) == len(raw)
+    pd.testing.assert_frame_equal(a[cols], b[cols], check_dtype=False)
+    assert (a.index == raw.index).all()
+
+
+def test_path_features_match_ticker_rows(stub_raw):
+    raw = stub_raw('AAA', '3y')
+    _, names = resolve_feature_set('extended@1')
+    rows = ticker_rows(raw, '100y', 'extended@1')
+    state = PathFeatures(raw['Close'], names, 1, 3)
+    x = normalise(state.matrix(), [raw['Close'].iloc[-1]], names)[0]
+    np.testing.assert_allclose(x, rows[names].iloc[-1].values, rtol=0, atol=1e-9)
+
+
+def test_batched_forecast_matches_single_ticker():
+    pytest.importorskip('xgboost')
+    from fetch_data import _fetch_stub
+    raws = {t: _fetch_stub(t, '3y') for t in ('AAA', 'BBB', 'CCC')}
+    bundle = train_global(raws=raws, n_estimators=20, n_jobs=1, save=False)
+    assert bundle['feature_names'][-len(TICKER_FEATURES):] == TICKER_FEATURES
+    assert set(bundle['meta']['eval']['per_ticker']) == set(raws)
+
+    batched = forecast_global(raws, 5, bundle)
+    for t, raw in raws.items():
+        single = forecast_global({t: raw}, 5, bundle)[t]
+        np.testing.assert_allclose(batched[t]['forecast_close'], single['forecast_close'])
+        assert len(single) == 5 and (single['forecast_close'] > 0).all()
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import compute_features
+from indicators import compute_indicators, resolve_feature_set, warmup
+from monte_carlo import PathFeatures
+
+
+def _pandas_reference(close: pd.Series) -> dict:
+    """The pandas definitions the kernels replace (extended@1)."""
+    ema = {w: close.ewm(span=w, adjust=False).mean() for w in (5, 10, 12, 20, 26)}
+    ref = {}
+    for w in (5, 10, 20):
+        ref[f'ema_{w}'] = ema[w]
+        ref[f'sma_{w}'] = close.rolling(window=w, min_periods=1).mean()
+    ref['return_1d'] = close.pct_change(1)
+    ref['return_5d'] = close.pct_change(5)
+    delta = close.diff()
+    ma_up = delta.clip(lower=0).ewm(com=13, adjust=False).mean()
+    ma_down = (-delta.clip(upper=0)).ewm(com=13, adjust=False).mean()
+    ref['rsi_14'] = 100 - (100 / (1 + ma_up / ma_down.replace(0, np.nan)))
+    macd = ema[12] - ema[26]
+    signal = macd.ewm(span=9, adjust=False).mean()
+    ref['macd_12_26'], ref['macd_signal_12_26_9'], ref['macd_hist_12_26_9'] = macd, signal, macd - signal
+    sma, std = ref['sma_20'], close.rolling(window=20).std()
+    ref['bb_upper_20'], ref['bb_lower_20'] = sma + 2 * std, sma - 2 * std
+    ref['bb_width_20'] = (ref['bb_upper_20'] - ref['bb_lower_20']) / sma
+    ref['volatility_20'] = ref['return_1d'].rolling(window=20).std()
+    return ref
+
+
+@pytest.fixture
+def close(stub_raw):
+    return stub_raw('AAA', '2y')['Close']
+
+
+def test_kernels_match_pandas(close):
+    _, names = resolve_feature_set('extended@1')
+    got = compute_indicators({'Close': close.values}, names)
+    ref = _pandas_reference(close)
+    for name in names:
+        np.testing.assert_allclose(got[name], ref[name].values, rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+def test_nan_in_close_is_skipped_not_carried(close):
+    _, names = resolve_feature_set('extended@1')
+    holey = close.copy()
+    holey.iloc[[100, 101, 250]] = np.nan
+    got = compute_indicators({'Close': holey.values}, names)
+    ref = _pandas_reference(holey.dropna())
+    ok = holey.notna().values
+    for name in names:
+        assert np.isnan(got[name][~ok]).all(), name
+        np.testing.assert_allclose(got[name][ok], ref[name].values, rtol=1e-9, atol=1e-9, err_msg=name)
+        assert np.isfinite(got[name][-50:]).all(), name  # recovers after the gap
+
+    feat = compute_features(holey.to_frame(), feature_set='extended@1')
+    assert np.isfinite(feat[names].values).all()
+
+
+def test_warmup_sizes_path_feature_lookback(close):
+    _, names = resolve_feature_set('extended@1')
+    assert warmup(names) == 35  # macd_signal_12_26_9: 26 + 9
+    state = PathFeatures(close, names, n_paths=2, horizon=3)
+    assert state.lookback == warmup(names) + 1
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+import deadline
+from artifacts import AffineScaler
+from features import compute_features
+from indicators import resolve_feature_set
+from monte_carlo import PathFeatures, holdout_residuals, quantile_bands, simulate_xgb_paths
+
+
+def test_path_features_track_compute_features(stub_raw):
+    close = stub_raw('AAA', '2y')['Close']
+    _, names = resolve_feature_set('extended@1')
+    state = PathFeatures(close, names, n_paths=3, horizon=4)
+    pushed = close.copy()
+    for step in range(4):
+        new = float(pushed.iloc[-1]) * (1.01 if step % 2 else 0.98)
+        state.push(np.full(3, new))
+        pushed.loc[pushed.index[-1] + pd.offsets.BDay()] = new
+        want = compute_features(pushed.to_frame(), feature_set='extended@1')[names].iloc[-1].values
+        got = state.matrix()
+        for row in got:
+            np.testing.assert_allclose(row, want, rtol=1e-9, atol=1e-9)
+
+
+class _Zero:
+    def predict(self, X):
+        return np.zeros(len(X))
+
+
+def _frame(n):
+    return pd.DataFrame({'x': np.arange(n, dtype=float)})
+
+
+def test_residuals_are_median_centred():
+    y = pd.Series(np.r_[np.zeros(20), np.full(10, 5.0)])  # skewed
+    res = holdout_residuals(_Zero(), AffineScaler.identity(1, ['x']), ['x'], _frame(30), y)
+    assert np.median(res) == 0.0
+
+
+def test_short_holdout_falls_back_to_train_residuals_and_notes_it():
+    dlog = deadline.DegradationLog()
+    token = deadline.activate(dlog)
+    try:
+        res = holdout_residuals(_Zero(), AffineScaler.identity(1, ['x']), ['x'], _frame(5), pd.Series(np.ones(5)),
+                                _frame(40), pd.Series(np.arange(40.0)))
+    finally:
+        deadline.deactivate(token)
+    assert res.size == 4 + 39  # one-step-ahead: the last row of each window has no next close
+    assert [e['action'] for e in dlog.events] == ['train_residuals']
+
+
+class _LastClose:
+    """Random-walk 'model': predicts the row's own close (feature sma_1)."""
+
+    def predict(self, X):
+        return np.asarray(X, dtype=float)[:, 0]
+
+
+def test_residuals_are_next_close_errors():
+    y = pd.Series(np.cumsum(np.r_[100.0, np.tile([1.0, -2.0, 3.0], 10)]))
+    X = pd.DataFrame({'sma_1': y.values})
+    res = holdout_residuals(_LastClose(), AffineScaler.identity(1, ['sma_1']), ['sma_1'], X, y)
+    # same-row residuals would all be 0; next-close residuals are the daily moves
+    np.testing.assert_allclose(np.sort(res), np.sort(np.diff(y.values) - np.median(np.diff(y.values))))
+
+
+def test_band_width_grows_with_step(stub_raw):
+    close = stub_raw('AAA', '2y')['Close']
+    X = pd.DataFrame({'sma_1': close.values}, index=close.index)
+    scaler = AffineScaler.identity(1, ['sma_1'])
+    res = holdout_residuals(_LastClose(), scaler, ['sma_1'], X.iloc[-100:], close.iloc[-100:])
+    bands = quantile_bands(simulate_xgb_paths(_LastClose(), scaler, ['sma_1'], close, res, 30, n_paths=2000))
+    width = (bands['upper_95ci'] - bands['lower_95ci']).values
+    assert width[0] > 0
+    assert width[29] > 3 * width[0]
+    assert width[9] > width[0] and width[29] > width[9]
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+import order_selection
+
+
+def _series(freq):
+    rng = np.random.default_rng(0)
+    idx = pd.date_range('2024-01-01', periods=80, freq=freq)
+    return pd.Series(100 + np.cumsum(rng.normal(0, 1, len(idx))), index=idx)
+
+
+def test_cache_keeps_one_entry_per_series_frequency(tmp_path, monkeypatch):
+    monkeypatch.setattr(order_selection, 'MODELS_DIR', str(tmp_path))
+    monkeypatch.setattr(order_selection, 'CACHE_PATH', str(tmp_path / 'orders.json'))
+    monkeypatch.setattr(order_selection, 'LOCK_PATH', str(tmp_path / 'orders.json.lock'))
+    monkeypatch.setattr(order_selection, 'P_RANGE', (0, 1))
+    monkeypatch.setattr(order_selection, 'Q_RANGE', (0,))
+
+    daily, business = _series('D'), _series('B')
+    order_selection.select_order('AAA', daily, max_workers=1)
+    order_selection.select_order('AAA', business, max_workers=1)
+    cache = order_selection._load_cache()
+    assert set(cache) == {'AAA@D', 'AAA@B'}
+
+
+def test_inline_search_matches_spawned_pool():
+    y = _series('B')
+    inline = order_selection.search_order(y, max_workers=1)
+    pooled = order_selection.search_order(y, max_workers=2)
+    assert inline['order'] == pooled['order'] and inline['seasonal_order'] == pooled['seasonal_order']
+    assert np.isclose(inline['score'], pooled['score'])
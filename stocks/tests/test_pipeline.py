@@ -0,0 +1,127 @@
+import sys
+import time
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+import stage_executor
+from pipeline import Sink, compare_sequential, run_pipeline
+
+
+class RecordingSink(Sink):
+    def __init__(self):
+        self.calls = []
+
+    def processed(self, ticker, train_df, eval_df):
+        self.calls.append(('processed', ticker))
+
+    def xgb_model(self, ticker, bundle):
+        self.calls.append(('xgb_model', ticker))
+
+    def forecast(self, ticker, model, out, horizons):
+        self.calls.append(('forecast', model, len(out), tuple(horizons)))
+
+    def report(self, ticker, report):
+        self.calls.append(('report', ticker))
+
+
+def test_run_pipeline_in_memory(stub_raw, monkeypatch):
+    pytest.importorskip('xgboost')
+    # per-run code must not touch process-wide thread limits
+    monkeypatch.setattr(stage_executor.ThreadBudget, 'limit_blas', staticmethod(lambda n: pytest.fail('limit_blas')))
+    sink = RecordingSink()
+    res = run_pipeline('AAA', '6mo', horizons=(3, 7), raw=stub_raw('AAA', '1y'), threads=2, sink=sink,
+                       write_report=True)
+
+    assert not res.errors and not res.degraded
+    assert set(res.forecasts) == {'xgb', 'sarimax'}
+    assert len(res.forecast('ensemble')) == 7 and len(res.forecast('xgb', 3)) == 3
+    assert ('processed', 'AAA') in sink.calls and ('xgb_model', 'AAA') in sink.calls
+    assert {c[1] for c in sink.calls if c[0] == 'forecast'} == {'xgb', 'sarimax', 'ensemble'}
+    assert ('report', 'AAA') in sink.calls
+    assert res.report['ensemble_models'] == ['xgb', 'sarimax']
+
+
+def test_configure_process_applies_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(stage_executor, '_PROCESS_LIMITS', {})
+    monkeypatch.setattr(stage_executor.ThreadBudget, 'limit_blas', staticmethod(calls.append))
+    stage_executor.configure_process(blas=2)
+    stage_executor.configure_process(blas=8)
+    assert calls == [2]
+
+
+@pytest.fixture
+def cached_models(stub_raw, monkeypatch):
+    """Serve a pre-fitted XGB bundle as the 'saved' model: cached_models['xgb'] = bundle."""
+    pytest.importorskip('xgboost')
+    from preprocess import build_train_eval
+    from train import fit_xgb, split_xy
+    cache = {'xgb': fit_xgb('AAA', *split_xy(*build_train_eval(stub_raw('AAA', '1y'))), n_jobs=1)}
+    monkeypatch.setattr(pipeline, 'has_model', lambda ticker, kind: kind in cache)
+    monkeypatch.setattr(pipeline, 'load_xgb_bundle', lambda ticker: cache['xgb'])
+    return cache
+
+
+def test_stage_running_past_the_deadline_is_left_behind(stub_raw, cached_models, monkeypatch):
+    def slow_sarimax(*args, **kwargs):
+        time.sleep(4)  # no budget of its own, like a fixed-order fit on a long history
+    monkeypatch.setattr(pipeline, 'sarimax_forecast_frame', slow_sarimax)
+    sink = RecordingSink()
+    t0 = time.perf_counter()
+    res = run_pipeline('AAA', '6mo', horizons=(7,), raw=stub_raw('AAA', '1y'), threads=2, sink=sink,
+                       deadline_seconds=1.5)
+
+    assert time.perf_counter() - t0 < 3
+    assert res.report['stages']['sarimax']['status'] == 'timed_out'
+    assert res.report['ensemble_models'] == ['xgb'] and len(res.forecast('ensemble')) == 7
+    assert {(e['stage'], e['action']) for e in res.degraded} >= {('xgb', 'cached_model'), ('sarimax', 'timed_out')}
+    assert ('report', 'AAA') in sink.calls
+
+
+def test_tiny_deadline_without_cached_models_skips_training(stub_raw, monkeypatch):
+    pytest.importorskip('xgboost')
+    monkeypatch.setattr(pipeline, 'has_model', lambda ticker, kind: False)
+    res = run_pipeline('AAA', '6mo', horizons=(7,), raw=stub_raw('AAA', '1y'), threads=2, deadline_seconds=2)
+
+    assert ('xgb', 'skipped') in {(e['stage'], e['action']) for e in res.degraded}
+    assert res.report['ensemble_models'] == ['sarimax'] and len(res.forecast('ensemble')) == 7
+
+
+def _fake_lstm_modules(monkeypatch, cached_horizon):
+    """train_lstm/predict_lstm stand-ins (no TensorFlow): a saved LSTM forecasting cached_horizon days."""
+    def lstm_forecast_frame(ticker, raw, model, scaler, meta):
+        from utils import next_trading_days
+        dates = next_trading_days(raw.index.max(), meta['horizon'])
+        return pd.DataFrame({'date': dates, 'ticker': ticker, 'forecast_close': np.full(len(dates), 100.0)})
+    monkeypatch.setitem(sys.modules, 'train_lstm', types.SimpleNamespace(
+        fit_lstm=lambda *a, **k: pytest.fail('no time to train'), close_frame=lambda raw: raw))
+    monkeypatch.setitem(sys.modules, 'predict_lstm', types.SimpleNamespace(
+        load_lstm=lambda ticker: ('model', 'scaler', {'window': 20, 'horizon': cached_horizon}),
+        lstm_forecast_frame=lstm_forecast_frame))
+
+
+@pytest.mark.parametrize('cached_horizon, used', [(7, False), (30, True)])
+def test_cached_lstm_must_cover_the_longest_horizon(stub_raw, cached_models, monkeypatch, cached_horizon, used):
+    cached_models['lstm'] = True
+    _fake_lstm_modules(monkeypatch, cached_horizon)
+    res = run_pipeline('AAA', '6mo', horizons=(7, 30), raw=stub_raw('AAA', '1y'), threads=2, use_lstm=True,
+                       deadline_seconds=3)
+
+    actions = {(e['stage'], e['action']) for e in res.degraded}
+    assert (('lstm', 'cached_model') in actions) is used
+    assert (('lstm', 'skipped') in actions) is not used
+    assert ('lstm' in res.report['ensemble_models']) is used
+    assert len(res.forecast('ensemble')) == 30
+
+
+def test_compare_sequential_reports_the_wall_clock_speedup(stub_raw):
+    sink = RecordingSink()
+    out = compare_sequential('AAA', '6mo', raw=stub_raw('AAA', '1y'), sink=sink, horizons=(7,), skip_xgb=True)
+    assert out['speedup'] == pytest.approx(out['sequential_seconds'] / out['concurrent_seconds'])
+    # only the concurrent run writes
+    assert [c for c in sink.calls if c[0] == 'forecast'] == [('forecast', 'sarimax', 7, (7,)),
+                                                             ('forecast', 'ensemble', 7, (7,))]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from screener import fit_ar_panel
+
+
+def _design(r, p):
+    """Per-ticker AR(p) regression rows without NaNs, for np.linalg.lstsq."""
+    T = len(r)
+    X = np.column_stack([np.ones(T - p)] + [r[p - k:T - k] for k in range(1, p + 1)])
+    y = r[p:]
+    ok = np.isfinite(y) & np.isfinite(X).all(axis=1)
+    return X[ok], y[ok]
+
+
+def test_batched_ar_fit_matches_lstsq():
+    rng = np.random.default_rng(0)
+    n, T, p = 6, 300, 5
+    returns = rng.normal(0, 0.02, (n, T))
+    returns[1, :40] = np.nan          # late listing
+    returns[2, 150] = np.nan          # one missing day
+    returns[4, :T - 5] = np.nan       # too short to fit
+
+    coef, sigma, n_obs = fit_ar_panel(returns, order=p, ridge=0.0)
+    for i in range(n):
+        X, y = _design(returns[i], p)
+        assert n_obs[i] == len(y)
+        if len(y) <= p + 1:
+            assert np.isnan(coef[i]).all() and np.isnan(sigma[i])
+            continue
+        want, *_ = np.linalg.lstsq(X, y, rcond=None)
+        np.testing.assert_allclose(coef[i], want, rtol=1e-6, atol=1e-10)
+        resid = y - X @ want
+        np.testing.assert_allclose(sigma[i], np.sqrt(resid @ resid / (len(y) - p - 1)), rtol=1e-6)
+
+
+def test_default_ridge_barely_moves_coefficients():
+    rng = np.random.default_rng(1)
+    returns = rng.normal(0, 0.02, (3, 252))
+    plain, _, _ = fit_ar_panel(returns, ridge=0.0)
+    shrunk, _, _ = fit_ar_panel(returns)
+    np.testing.assert_allclose(shrunk, plain, atol=1e-4)
+
+
+def test_close_panel_reads_both_raw_layouts(tmp_path, stub_raw):
+    from screener import load_close_panel
+    a, b = stub_raw('AAA', '6mo'), stub_raw('BBB', '6mo')
+    a.to_csv(tmp_path / 'AAA.csv')
+    with open(tmp_path / 'BBB.csv', 'w') as f:  # yfinance multi-row header
+        f.write('Price,Close,High,Low,Open,Volume\nTicker,BBB,BBB,BBB,BBB,BBB\nDate,,,,,\n')
+    b[['Close', 'High', 'Low', 'Open', 'Volume']].to_csv(tmp_path / 'BBB.csv', mode='a', header=False)
+
+    panel = load_close_panel(raw_dir=str(tmp_path))
+    assert list(panel.columns) == ['AAA', 'BBB']
+    np.testing.assert_allclose(panel['AAA'].values[-20:], a['Close'].values[-20:])
+    np.testing.assert_allclose(panel['BBB'].values[-20:], b['Close'].values[-20:])
+
+
+def test_screen_results_and_top_k_use_the_history_store(tmp_path, stub_raw, monkeypatch):
+    import pipeline
+    import screener
+    import utils
+    raw_dir, results = tmp_path / 'raw', tmp_path / 'results'
+    raw_dir.mkdir()
+    for t in ('AAA', 'BBB', 'CCC'):
+        stub_raw(t, '1y').to_csv(raw_dir / f'{t}.csv')
+    monkeypatch.setattr(screener, 'RESULTS_DIR', str(results))
+    monkeypatch.setattr(utils, 'RESULTS_DIR', str(results))
+    monkeypatch.setattr(screener, 'ensure_dirs', lambda: results.mkdir(exist_ok=True))
+
+    ranking, forecasts = screener.screen(horizon=5, raw_dir=str(raw_dir))
+    rank_path, paths = screener.save_screen(ranking, forecasts, 5)
+    assert sorted(p.name for p in results.iterdir()) == ['AAA_ar_5d.csv', 'BBB_ar_5d.csv', 'CCC_ar_5d.csv',
+                                                        'screener_rank_5d.csv']
+    aaa = pd.read_csv(paths['AAA'])
+    assert len(aaa) == 5 and set(aaa['ticker']) == {'AAA'}
+    assert {'date', 'forecast_close', 'lower_95ci', 'upper_95ci'} <= set(aaa.columns)
+
+    calls = {}
+    monkeypatch.setattr(pipeline, 'run_pipeline', lambda t, raw=None, **kw: calls.setdefault(t, raw))
+    monkeypatch.setattr(pipeline, 'DiskSink', pipeline.Sink)
+    screener.run_top_k(ranking, 2, raw_dir=str(raw_dir), period='6mo')
+    assert list(calls) == list(ranking['ticker'].head(2))
+    for t, raw in calls.items():
+        assert raw is not None and len(raw) == len(stub_raw(t, '1y'))
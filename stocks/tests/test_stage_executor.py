@@ -0,0 +1,52 @@
+import time
+
+from deadline import Deadline
+from stage_executor import run_stages
+
+
+def test_overrunning_stage_times_out_and_is_not_waited_for():
+    stages = {
+        'fast': (lambda: 'ok', ()),
+        'slow': (lambda: time.sleep(3) or 'late', ()),
+        'after_slow': (lambda: 'never', ('slow',)),
+    }
+    t0 = time.perf_counter()
+    results, timings, errors = run_stages(stages, deadline=Deadline(0.5))
+    wall = time.perf_counter() - t0
+
+    assert wall < 1.5
+    assert results == {'fast': 'ok'}
+    assert isinstance(errors['slow'], TimeoutError)
+    assert str(errors['after_slow']).startswith('skipped')
+    assert 0.3 < timings['slow'] < 1.5
+
+
+def test_stages_not_started_by_the_deadline_are_skipped():
+    dl = Deadline(0.01)
+    time.sleep(0.02)
+    results, _, errors = run_stages({'a': (lambda: 1, ()), 'b': (lambda: 2, ('a',))}, deadline=dl)
+    assert results == {}
+    assert all(str(e).startswith('skipped: deadline') for e in errors.values()) and set(errors) == {'a', 'b'}
+
+
+def test_failed_stage_skips_only_its_dependents():
+    def boom():
+        raise ValueError('boom')
+    stages = {'a': (boom, ()), 'b': (lambda: 'b', ('a',)), 'c': (lambda: 'c', ('b',)), 'd': (lambda: 'd', ())}
+    results, _, errors = run_stages(stages)
+    assert results == {'d': 'd'}
+    assert isinstance(errors['a'], ValueError)
+    assert str(errors['b']) == 'skipped: dependency failed (a)' and str(errors['c']).startswith('skipped')
+
+
+def test_independent_stages_overlap():
+    def stages():
+        return {'root': (lambda: 0, ()),
+                **{k: (lambda: time.sleep(0.3) or k, ('root',)) for k in ('x', 'y', 'z')}}
+    walls = {}
+    for sequential in (False, True):
+        t0 = time.perf_counter()
+        results, timings, errors = run_stages(stages(), sequential=sequential)
+        walls[sequential] = time.perf_counter() - t0
+        assert not errors and set(results) == {'root', 'x', 'y', 'z'}
+    assert walls[False] < 0.6 <= walls[True]
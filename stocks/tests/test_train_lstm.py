@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+
+import train_lstm
+from artifacts import save_lstm_artifact
+
+
+@pytest.fixture
+def base_model(tmp_path, monkeypatch):
+    """A shared base LSTM (window 20, horizon 5) saved under a temporary models/."""
+    monkeypatch.setattr(train_lstm, 'MODELS_DIR', str(tmp_path))
+    model = train_lstm._build_model(20, 1, 5)
+    path = os.path.join(tmp_path, 'base.keras')
+    model.save(path)
+    save_lstm_artifact(train_lstm.BASE_TICKER, path, None, {'window': 20, 'horizon': 5, 'mode': 'base'},
+                       models_dir=str(tmp_path))
+    return model
+
+
+def test_load_base_checks_horizon_and_rows(base_model):
+    model, window = train_lstm._load_base(5, 200)
+    assert window == 20
+    for got, want in zip(model.get_weights(), base_model.get_weights()):
+        np.testing.assert_array_equal(got, want)
+    assert train_lstm._load_base(7, 200) == (None, None)   # other horizon
+    assert train_lstm._load_base(5, 25) == (None, None)    # window + horizon leaves no sample
+
+
+def test_finetune_starts_from_base_weights_and_stops_within_budget(base_model, stub_raw, monkeypatch):
+    start_weights = []
+    real_fit = train_lstm._fit
+
+    def recording_fit(model, X, y, epochs, *args, **kwargs):
+        start_weights.append(model.get_weights())
+        return real_fit(model, X, y, epochs, *args, **kwargs)
+    monkeypatch.setattr(train_lstm, '_fit', recording_fit)
+
+    close = train_lstm.close_frame(stub_raw('AAA', '1y'))
+    model, scaler, meta = train_lstm.fit_lstm('AAA', close, horizon=5, epochs=50, finetune=True, finetune_epochs=2)
+
+    assert meta['mode'] == 'finetune' and meta['window'] == 20 and meta['horizon'] == 5
+    assert 1 <= meta['epochs_run'] <= 2
+    for got, want in zip(start_weights[0], base_model.get_weights()):
+        np.testing.assert_array_equal(got, want)
+    assert model.output_shape == (None, 5)